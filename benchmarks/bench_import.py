@@ -0,0 +1,73 @@
+"""
+Benchmark of the time it takes to `import ebmlite` in a fresh interpreter,
+the overhead paid by every short-lived process that uses the library.
+
+Each measurement spawns a new Python process; the time taken to start an
+interpreter that imports nothing is measured the same way and subtracted.
+Modules are compiled (and their bytecode cached) before timing, so results
+reflect typical use rather than the first run after installation.
+
+Usage::
+
+    python benchmarks/bench_import.py [-n RUNS] [-m MODULE ...]
+"""
+
+import argparse
+import os.path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timeCommand(code: str, runs: int, env: dict) -> list:
+    """ Time running a bit of Python code in new interpreter processes.
+
+        :param code: The Python source to run (via `python -c`).
+        :param runs: The number of times to run the code.
+        :param env: The environment for the subprocesses.
+        :return: A list of times, in seconds.
+    """
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], env=env, check=True)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    argparser.add_argument('-n', '--runs', type=int, default=30,
+                           help="The number of times to run each import.")
+    argparser.add_argument('-m', '--module', action='append',
+                           help=("A module to import (may be used more than once; "
+                                 "default: ebmlite)."))
+    args = argparser.parse_args(argv)
+    modules = args.module or ['ebmlite']
+
+    with tempfile.TemporaryDirectory() as pycache:
+        env = dict(os.environ)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        env['PYTHONPYCACHEPREFIX'] = pycache
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, (ROOT, env.get('PYTHONPATH'))))
+
+        # Warm up: write bytecode caches and load files into the OS cache.
+        for mod in modules:
+            timeCommand('import %s' % mod, 2, env)
+
+        base = statistics.median(timeCommand('pass', args.runs, env))
+        print("Interpreter startup: %.2f ms (median of %d)" % (base * 1000, args.runs))
+
+        for mod in modules:
+            times = timeCommand('import %s' % mod, args.runs, env)
+            med = statistics.median(times)
+            print("import %s: %.2f ms (median, startup excluded; min %.2f ms)"
+                  % (mod, (med - base) * 1000, (min(times) - base) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Benchmark suite for the main operations of `ebmlite`: scanning and parsing
+documents, dumping and encoding them, converting to and from XML, and
+loading schemata. Benchmarks use the files bundled with the tests, plus
+larger synthetic files generated in a temporary directory.
+
+Results are written as JSON, and can be compared against a previous run
+(e.g., one made before a change); the comparison exits with a non-zero
+status if any benchmark got slower than the given threshold.
+
+Usage::
+
+    python benchmarks/run.py [-n REPEAT] [-k NAME] [-o RESULTS.json]
+        [--compare BASELINE.json] [--threshold PERCENT]
+"""
+
+import argparse
+import glob
+from io import BytesIO
+import json
+import os.path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ebmlite  # noqa: E402
+from ebmlite import core, util  # noqa: E402
+
+# The bundled test files: (name, schema, path). Copies made by the tests
+# (e.g., `video-1-copy.mkv`) are excluded.
+FILES = [(os.path.splitext(os.path.basename(path))[0], 'matroska.xml', path)
+         for path in sorted(glob.glob(os.path.join(ROOT, 'tests', 'video-*.mkv')))
+         if not path.endswith('-copy.mkv')]
+FILES.append(('ide', 'mide_ide.xml', os.path.join(ROOT, 'tests', 'SSX46714-doesnot.IDE')))
+
+# All benchmarks: (name, function, files). See `benchmark()`.
+BENCHMARKS = []
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+def benchmark(name: str, files: bool = True):
+    """ Decorator to register a benchmark function. Benchmark functions take
+        no arguments (if `files` is `False`), or a loaded `Document`, and
+        return a function that performs the operation to be timed (allowing
+        any setup to be excluded from the timing).
+
+        :param name: The benchmark's name. If `files` is `True`, the name of
+            each test file is appended.
+        :param files: If `True`, the benchmark is run once per test file.
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func, files))
+        return func
+    return decorator
+
+
+def walk(el, values: bool = False):
+    """ Recursively iterate an element's children, optionally reading each
+        (non-master) element's value.
+    """
+    for child in el.__iter__(nocache=not values):
+        if isinstance(child, core.MasterElement):
+            walk(child, values)
+        elif values:
+            child.value
+
+
+@benchmark('scan')
+def benchScan(doc):
+    """ Iterate all elements without reading their values (i.e., headers
+        only).
+    """
+    return lambda: walk(doc)
+
+
+@benchmark('iterate')
+def benchIterate(doc):
+    """ Iterate all elements, reading all values. """
+    return lambda: walk(doc, values=True)
+
+
+@benchmark('dump')
+def benchDump(doc):
+    """ Convert the whole document to a dictionary. """
+    return doc.dump
+
+
+@benchmark('encode')
+def benchEncode(doc):
+    """ Encode the dumped document. """
+    data = doc.dump()
+    return lambda: doc.schema.encodes(data)
+
+
+@benchmark('toXml')
+def benchToXml(doc):
+    """ Convert the document to an XML tree. """
+    return lambda: util.toXml(doc)
+
+
+@benchmark('toXmlFile')
+def benchToXmlFile(doc):
+    """ Write the document as XML (streaming). """
+    return lambda: util.toXmlFile(doc, BytesIO())
+
+
+@benchmark('xml2ebml')
+def benchXml2Ebml(doc):
+    """ Convert XML (from the document) back to EBML. """
+    xml = BytesIO()
+    util.toXmlFile(doc, xml)
+
+    def _run():
+        xml.seek(0)
+        util.xml2ebml(xml, BytesIO(), doc.schema)
+    return _run
+
+
+@benchmark('loadSchema', files=False)
+def benchLoadSchema():
+    """ Load the Matroska schema (not previously loaded, but possibly
+        cached on disk; see `ebmlite.core.CACHE_PATH`).
+    """
+    def _run():
+        core.SCHEMATA.clear()
+        core.loadSchema('matroska.xml')
+    return _run
+
+
+@benchmark('loadSchema-nocache', files=False)
+def benchLoadSchemaNoCache():
+    """ Load the Matroska schema from its XML, bypassing the on-disk cache
+        (which `loadSchema` uses after its first run).
+    """
+    def _run():
+        core.SCHEMATA.clear()
+        core.loadSchema('matroska.xml', cache=False)
+    return _run
+
+
+@benchmark('loadSchema-lazy', files=False)
+def benchLoadSchemaLazy():
+    """ Load the Matroska schema, creating element classes as needed. """
+    def _run():
+        core.SCHEMATA.clear()
+        core.loadSchema('matroska.xml', lazy=True)
+    return _run
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+def makeSyntheticFile(path: str, clusters: int = 200, blocks: int = 100,
+                      blockSize: int = 256):
+    """ Generate a large, structurally simple Matroska file: a number of
+        clusters, each containing a number of `SimpleBlock` elements.
+
+        :param path: The name of the file to write.
+        :param clusters: The number of `Cluster` elements.
+        :param blocks: The number of `SimpleBlock` elements per cluster.
+        :param blockSize: The size of each `SimpleBlock`'s payload.
+    """
+    schema = core.loadSchema('matroska.xml')
+    block = bytes(range(256)) * (blockSize // 256 + 1)
+    with open(path, 'wb') as f:
+        f.write(schema.encodes({'EBML': {'DocType': 'matroska',
+                                         'DocTypeVersion': 4,
+                                         'DocTypeReadVersion': 2}}))
+        with util.Writer(f, schema) as writer:
+            writer.startMaster('Segment')
+            writer.write('Info', {'TimecodeScale': 1000000,
+                                  'MuxingApp': 'ebmlite', 'WritingApp': 'ebmlite'})
+            writer.write('Tracks', {'TrackEntry': {'TrackNumber': 1,
+                                                   'TrackUID': 1,
+                                                   'TrackType': 1,
+                                                   'CodecID': 'V_UNCOMPRESSED'}})
+            for c in range(clusters):
+                writer.write('Cluster', {'Timecode': c * 1000,
+                                         'SimpleBlock': [block[:blockSize]] * blocks})
+            writer.endMaster()
+
+
+def timeIt(func, repeat: int) -> list:
+    """ Time a function, calling it at least `repeat` times (and for at
+        least 0.2 seconds).
+
+        :return: A list of times, in seconds.
+    """
+    times = []
+    total = 0
+    while len(times) < repeat or total < 0.2:
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+        total += times[-1]
+        if len(times) >= repeat * 10:
+            break
+    return times
+
+
+def getMetadata() -> dict:
+    """ Get information about the environment the benchmarks ran in. """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'ebmlite': ebmlite.__version__,
+            'commit': commit,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def runBenchmarks(repeat: int = 5, keyword: str = None, out=sys.stderr) -> dict:
+    """ Run all benchmarks.
+
+        :param repeat: The minimum number of times to run each benchmark.
+        :param keyword: If not `None`, run only the benchmarks with names
+            containing this string.
+        :param out: A stream to which to write progress.
+        :return: A dictionary of results, keyed by benchmark name.
+    """
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        files = list(FILES)
+        if not keyword or any(keyword in name and useFiles for name, _, useFiles in BENCHMARKS):
+            synthetic = os.path.join(tempdir, 'synthetic.mkv')
+            makeSyntheticFile(synthetic)
+            files.append(('synthetic-mkv', 'matroska.xml', synthetic))
+
+        tasks = []
+        for name, func, useFiles in BENCHMARKS:
+            if useFiles:
+                for fileName, schemaName, path in files:
+                    tasks.append(('%s[%s]' % (name, fileName), func, schemaName, path))
+            else:
+                tasks.append((name, func, None, None))
+
+        for name, func, schemaName, path in tasks:
+            if keyword and keyword not in name:
+                continue
+            if path:
+                doc = core.loadSchema(schemaName).load(path, headers=True)
+                run = func(doc)
+            else:
+                doc = None
+                run = func()
+
+            times = timeIt(run, repeat)
+            results[name] = {'min': min(times),
+                             'median': statistics.median(times),
+                             'runs': len(times)}
+            if path:
+                results[name]['bytes'] = os.path.getsize(path)
+                doc.close()
+            out.write("%-32s %10.3f ms (median %.3f ms, %d runs)\n"
+                      % (name, min(times) * 1000, statistics.median(times) * 1000,
+                         len(times)))
+            out.flush()
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, out=sys.stdout) -> bool:
+    """ Compare benchmark results to a baseline.
+
+        :param results: The current benchmark results.
+        :param baseline: The baseline results (as written by this script).
+        :param threshold: The percentage by which a benchmark must be slower
+            to count as a regression.
+        :param out: A stream to which to write the comparison.
+        :return: `True` if no benchmark regressed.
+    """
+    ok = True
+    out.write("%-32s %12s %12s %9s\n" % ("benchmark", "baseline ms", "current ms", "change"))
+    for name, result in results.items():
+        if name not in baseline:
+            out.write("%-32s %12s %12.3f %9s\n" % (name, '-', result['min'] * 1000, 'new'))
+            continue
+        before = baseline[name]['min']
+        change = (result['min'] - before) / before * 100
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            ok = False
+        elif change < -threshold:
+            flag = '  faster'
+        out.write("%-32s %12.3f %12.3f %+8.1f%%%s\n"
+                  % (name, before * 1000, result['min'] * 1000, change, flag))
+    return ok
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    argparser.add_argument('-n', '--repeat', type=int, default=5,
+                           help="The minimum number of times to run each benchmark.")
+    argparser.add_argument('-k', '--keyword',
+                           help="Run only benchmarks with names containing this string.")
+    argparser.add_argument('-o', '--output', metavar="RESULTS.json",
+                           help="The file to which to write the results (default: stdout).")
+    argparser.add_argument('--compare', metavar="BASELINE.json",
+                           help="Compare the results against those of a previous run.")
+    argparser.add_argument('--threshold', type=float, default=10,
+                           help=("The percentage by which a benchmark must be slower "
+                                 "than the baseline to fail the comparison (default: 10)."))
+    args = argparser.parse_args(argv)
+
+    results = runBenchmarks(args.repeat, args.keyword)
+    report = {'meta': getMetadata(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        if not compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,8 @@ EBML files quickly and efficiently, and that's about it.
 
 from .core import *
 from .core import SCHEMA_PATH, SCHEMATA, __all__
+from .registry import open, probe
+from .stats import profile
 
 name = "ebmlite"
 __version__ = "3.4.1"
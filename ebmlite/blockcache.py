@@ -0,0 +1,236 @@
+"""
+A read cache for file-like streams. Parsing EBML involves many seeks and
+very small reads (element IDs and sizes are 1 to 8 bytes); on unbuffered
+streams (e.g., `ThreadAwareFile`, which uses `io.FileIO`) or network
+filesystems, each of these is a system call or a round trip.
+`BlockCacheStream` reads the underlying stream in large, aligned blocks,
+keeping the most recently used ones, so many small reads become a few large
+ones.
+
+A `Document` can use a block cache transparently; see the `blockCache`
+argument of `Schema.load()`.
+"""
+__author__ = "David Randall Stokes, Connor Flanigan"
+__copyright__ = "Copyright 2022, Mide Technology Corporation"
+__credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt"
+
+__all__ = ['BlockCacheStream']
+
+from collections import OrderedDict
+import threading
+from typing import BinaryIO, Optional
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+class BlockCacheStream(object):
+    """ A wrapper for a binary stream that caches its contents in fixed-size,
+        aligned blocks, discarding the least recently used blocks when the
+        cache is full. Optionally, when blocks are read sequentially (e.g.,
+        when scanning through a file), several blocks are read at once.
+
+        The stream position is kept separately for each thread, so a
+        `BlockCacheStream` wrapping a `ThreadAwareFile` can be used by
+        multiple threads, which share the cached blocks.
+
+        Writes go through to the underlying stream, and any cached blocks
+        they affect are discarded. Other attributes and methods are those of
+        the wrapped stream.
+
+        :var blockSize: The size of each cached block, in bytes.
+        :var capacity: The maximum number of blocks to cache.
+        :var readAhead: The number of blocks to read at once when reading
+            sequentially. 1 disables read-ahead.
+        :var hits: The number of block requests satisfied by the cache.
+        :var misses: The number of block requests requiring a read.
+    """
+
+    def __init__(self,
+                 stream: BinaryIO,
+                 blockSize: int = 65536,
+                 capacity: int = 64,
+                 readAhead: int = 1):
+        """ Constructor.
+
+            :param stream: The stream to wrap. Must be seekable.
+            :param blockSize: The size of each cached block, in bytes.
+            :param capacity: The maximum number of blocks to cache.
+            :param readAhead: The number of blocks to read at once when
+                blocks are read sequentially. 1 disables read-ahead.
+        """
+        if blockSize < 1 or capacity < 1 or readAhead < 1:
+            raise ValueError("blockSize, capacity, and readAhead must be positive")
+
+        self._stream = stream
+        self.blockSize = blockSize
+        self.capacity = capacity
+        self.readAhead = min(readAhead, capacity)
+
+        self._blocks = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+        # The last block read from the underlying stream, for detecting
+        # sequential reads.
+        self._lastMiss = None
+
+        self.hits = 0
+        self.misses = 0
+
+        self._local.pos = stream.tell()
+
+    def __repr__(self) -> str:
+        return "<%s %r>" % (self.__class__.__name__, self._stream)
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ==========================================================================
+    # Caching
+    # ==========================================================================
+
+    def _getBlock(self, idx: int) -> bytes:
+        """ Get a block, reading it (and possibly the blocks following it) if
+            it isn't cached.
+
+            :param idx: The block's index (i.e., its offset divided by the
+                block size).
+            :return: The block's data. It will be shorter than the block
+                size if the block is at the end of the stream.
+        """
+        with self._lock:
+            block = self._blocks.get(idx)
+            if block is not None:
+                self._blocks.move_to_end(idx)
+                self.hits += 1
+                return block
+
+            self.misses += 1
+            count = self.readAhead if idx - 1 == self._lastMiss else 1
+            self._stream.seek(idx * self.blockSize)
+            data = self._stream.read(count * self.blockSize)
+
+            bs = self.blockSize
+            block = data[:bs]
+            for i in range(0, max(len(data), 1), bs):
+                self._blocks[idx + i // bs] = data[i:i + bs]
+                self._blocks.move_to_end(idx + i // bs)
+            self._lastMiss = idx + (max(len(data), 1) - 1) // bs
+
+            while len(self._blocks) > self.capacity:
+                self._blocks.popitem(last=False)
+
+            return block
+
+    def _invalidate(self, start: int, end: int):
+        """ Discard cached blocks containing any of a range of bytes.
+
+            :param start: The first offset of the range.
+            :param end: The offset immediately after the range.
+        """
+        with self._lock:
+            for idx in range(start // self.blockSize, (end - 1) // self.blockSize + 1):
+                self._blocks.pop(idx, None)
+            # The last (partial) block may have grown.
+            if self._blocks:
+                last = max(self._blocks)
+                if len(self._blocks[last]) < self.blockSize:
+                    del self._blocks[last]
+            self._lastMiss = None
+
+    def clear(self):
+        """ Discard all cached blocks. """
+        with self._lock:
+            self._blocks.clear()
+            self._lastMiss = None
+
+    # ==========================================================================
+    # Standard stream methods
+    # ==========================================================================
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        pos = self.tell()
+        bs = self.blockSize
+
+        if size is None or size < 0 or size > bs * self.capacity // 2:
+            # Large reads go directly to the stream, so they don't flush out
+            # all the cached blocks.
+            with self._lock:
+                self._stream.seek(pos)
+                data = self._stream.read(size)
+        else:
+            idx, start = divmod(pos, bs)
+            block = self._getBlock(idx)
+            if start + size <= len(block):
+                # Typical case: all the data is in one block
+                data = block[start:start + size]
+            else:
+                parts = [block[start:]]
+                remaining = size - len(parts[0])
+                while remaining > 0 and len(block) == bs:
+                    idx += 1
+                    block = self._getBlock(idx)
+                    parts.append(block[:remaining])
+                    remaining -= len(parts[-1])
+                data = b''.join(parts)
+
+        self._local.pos = pos + len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(memoryview(buffer).cast('B')))
+        memoryview(buffer).cast('B')[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 0:
+            pos = offset
+        elif whence == 1:
+            pos = self.tell() + offset
+        else:
+            with self._lock:
+                pos = self._stream.seek(offset, whence)
+        if pos < 0:
+            raise ValueError("negative seek position %d" % pos)
+        self._local.pos = pos
+        return pos
+
+    def tell(self) -> int:
+        try:
+            return self._local.pos
+        except AttributeError:
+            # First access from a new thread
+            self._local.pos = 0
+            return 0
+
+    def write(self, data) -> int:
+        pos = self.tell()
+        with self._lock:
+            self._stream.seek(pos)
+            n = self._stream.write(data)
+            if n is None:
+                n = len(data)
+            self._invalidate(pos, pos + max(n, 1))
+        self._local.pos = pos + n
+        return n
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        size = self.tell() if size is None else size
+        with self._lock:
+            result = self._stream.truncate(size)
+            for idx in [i for i in self._blocks if (i + 1) * self.blockSize > size]:
+                del self._blocks[idx]
+            self._lastMiss = None
+        return result
+
+    def close(self):
+        self.clear()
+        return self._stream.close()
@@ -22,9 +22,8 @@ EBML files quickly and efficiently, and that's about it.
 # :todo: General documentation (more detailed than the README) and examples.
 # :todo: Document the best way to load schemata in a PyInstaller executable.
 #
-# :todo: (longer term) Consider making schema loading automatic based on the EBML
-#     DocType, DocTypeVersion, and DocTypeReadVersion. Would mean a refactoring
-#     of how schemata are loaded.
+# :todo: (longer term) Consider using DocTypeReadVersion when automatically
+#     selecting schemata (see `ebmlite.registry`).
 # :todo: (longer term) Refactor to support streaming data. This will require
 #     modifying the indexing and iterating methods of `Document`. Also affects
 #     the document-wide caching to-do item, listed above.
@@ -44,23 +43,26 @@ __all__ = ['BinaryElement', 'DateElement', 'Document', 'Element',
            'StringElement', 'UIntegerElement', 'UnicodeElement',
            'UnknownElement', 'VoidElement', 'loadSchema', 'parseSchema']
 
-from ast import literal_eval
-from datetime import datetime
+# Note: To keep `import ebmlite` fast, modules only used by specific
+# features (schema XML parsing, module-relative schema paths, dates, etc.)
+# are imported where they are used, not here.
 import errno
-import importlib.resources as importlib_resources
 from io import BytesIO, StringIO, IOBase
+import marshal
 import os.path
 from pathlib import Path
-import re
+import sys
 import types
-from typing import Any, BinaryIO, Dict, List, Optional, TextIO, Tuple, Union
-from xml.etree import ElementTree as ET
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, TextIO, Tuple, Union
+from typing import TYPE_CHECKING
 
 from .decoding import readElementID, readElementSize
 from .decoding import readFloat, readInt, readUInt, readDate
 from .decoding import readString, readUnicode
 from . import encoding
-from . import schemata
+
+if TYPE_CHECKING:
+    import datetime
 
 # ==============================================================================
 #
@@ -69,8 +71,10 @@ from . import schemata
 # SCHEMA_PATH: A list of paths for schema XML files, similar to `sys.path`.
 # When `loadSchema()` is used, it will search these paths, in order, to find
 # the schema file.
+# Note: the path of the `schemata` submodule is derived from this file's
+# location, rather than by importing it, for speed.
 SCHEMA_PATH = ['',
-               os.path.realpath(os.path.dirname(schemata.__file__))]
+               os.path.realpath(os.path.join(os.path.dirname(__file__), 'schemata'))]
 
 SCHEMA_PATH.extend(p for p in os.environ.get('EBMLITE_SCHEMA_PATH', '').split(os.path.pathsep)
                    if p not in SCHEMA_PATH)
@@ -80,6 +84,32 @@ SCHEMA_PATH.extend(p for p in os.environ.get('EBMLITE_SCHEMA_PATH', '').split(os
 SCHEMATA = {}
 
 
+def _getDefaultCachePath() -> Optional[str]:
+    """ Helper function to get the default directory for cached data (e.g.,
+        pre-parsed schemata). The `EBMLITE_CACHE_PATH` environment variable
+        overrides the platform-specific user cache directory; setting it to
+        an empty string disables caching.
+    """
+    path = os.environ.get('EBMLITE_CACHE_PATH')
+    if path is not None:
+        return path or None
+
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~/AppData/Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+
+    return os.path.join(base, 'ebmlite')
+
+
+# CACHE_PATH: The directory in which `loadSchema()` stores pre-parsed schema
+# data, so later processes can skip parsing the schema XML. `None` disables
+# the cache.
+CACHE_PATH = _getDefaultCachePath()
+
+
 # ==============================================================================
 #
 # ==============================================================================
@@ -273,6 +303,81 @@ class Element(object):
         """
         return self.value
 
+    # ==========================================================================
+    # Patching
+    # ==========================================================================
+
+    def _encodePatch(self, value: Any) -> bytes:
+        """ Type-specific helper function to encode a new payload for
+            `patch()`. Types with a fixed-width or padded encoding return a
+            payload the same size as the current one (if possible); others
+            return the minimal encoding.
+        """
+        return self.encodePayload(value)
+
+    def patch(self, value: Any):
+        """ Change the element's value, rewriting it in place in the file.
+            The document must be writable (e.g., loaded with ``mode='r+b'``).
+            The element's total size does not change: numbers and dates are
+            written with a fixed width and strings are padded with nulls, and
+            any other shorter data is followed by a ``Void`` element filling
+            the space left over.
+
+            Note: other `Element` objects referring to the same data (e.g.,
+            the children cached by a parent element) are not updated.
+
+            :param value: The new value.
+            :raises ValueError: If the new value does not fit in the
+                element's current space.
+            :raises IOError: If the element's stream is not writable.
+        """
+        try:
+            writable = self.stream.writable()
+        except (AttributeError, ValueError):
+            writable = False
+        if not writable:
+            raise IOError("Cannot patch %s: stream is not writable" % self.name)
+
+        payload = self._encodePatch(value)
+        encId = encoding.encodeId(self.id)
+        sizeLength = self.payloadOffset - self.offset - len(encId)
+        slack = self.size - len(payload)
+
+        if slack < 0:
+            raise ValueError("Cannot patch %s: encoded value (%d bytes) larger "
+                             "than current value (%d bytes)" %
+                             (self.name, len(payload), self.size))
+        elif slack == 1 and sizeLength < 8:
+            # Too small for a Void; use a longer size descriptor instead.
+            sizeLength += 1
+            slack = 0
+
+        void = b''
+        if slack > 0:
+            voidType = self.schema.get('Void')
+            if voidType is None:
+                raise ValueError("Cannot patch %s: encoded value smaller than "
+                                 "current value and schema has no Void "
+                                 "element" % self.name)
+            for voidSizeLength in range(1, 9):
+                voidLength = slack - len(encoding.encodeId(voidType.id)) - voidSizeLength
+                if voidLength >= 0 and encoding.getLength(voidLength) <= voidSizeLength:
+                    void = voidType.encode(None, length=voidLength,
+                                           lengthSize=voidSizeLength)
+                    break
+            else:
+                raise ValueError("Cannot patch %s: cannot fill %d bytes with "
+                                 "a Void element" % (self.name, slack))
+
+        self.stream.seek(self.offset)
+        self.stream.write(encId + encoding.encodeSize(len(payload), sizeLength)
+                          + payload + void)
+        self.stream.flush()
+
+        self.payloadOffset = self.offset + len(encId) + sizeLength
+        self.size = len(payload)
+        self._value = None
+
 
 # ==============================================================================
 
@@ -301,6 +406,12 @@ class IntegerElement(Element):
         """ Type-specific payload encoder for signed integer elements. """
         return encoding.encodeInt(data, length)
 
+    def _encodePatch(self, value: int) -> bytes:
+        """ Type-specific helper function to encode a new payload for
+            `patch()`. Integers are encoded at the current size.
+        """
+        return self.encodePayload(value, length=self.size)
+
 
 # ==============================================================================
 
@@ -352,6 +463,15 @@ class FloatElement(Element):
         """ Type-specific payload encoder for floating point elements. """
         return encoding.encodeFloat(data, length)
 
+    def _encodePatch(self, value: float) -> bytes:
+        """ Type-specific helper function to encode a new payload for
+            `patch()`. Floats are encoded at the current size, unless it is
+            zero (valid only for the value 0.0).
+        """
+        if self.size or not value:
+            return self.encodePayload(value, length=self.size)
+        return self.encodePayload(value)
+
 
 # ==============================================================================
 
@@ -382,6 +502,16 @@ class StringElement(Element):
         """ Type-specific payload encoder for ASCII string elements. """
         return encoding.encodeString(data, length)
 
+    def _encodePatch(self, value: str) -> bytes:
+        """ Type-specific helper function to encode a new payload for
+            `patch()`. Shorter strings are padded with nulls to the current
+            size.
+        """
+        payload = self.encodePayload(value)
+        if len(payload) > self.size:
+            return payload
+        return bytes(payload).ljust(self.size, b'\x00')
+
 
 # ==============================================================================
 
@@ -412,21 +542,30 @@ class UnicodeElement(StringElement):
 # ==============================================================================
 
 
+class _DatetimeType(object):
+    """ Descriptor for the `dtype` of `DateElement`, deferring the import
+        of `datetime` until a date element's type is actually used.
+    """
+    def __get__(self, obj, objtype=None):
+        from datetime import datetime
+        return datetime
+
+
 class DateElement(IntegerElement):
     """ Base class for an EBML 'date' element. Schema-specific subclasses are
         generated when a `Schema` is loaded.
     """
     __slots__ = ("stream", "offset", "size", "sizeLength", "payloadOffset", "_value")
-    dtype = datetime
+    dtype = _DatetimeType()
 
-    def parse(self, stream: BinaryIO, size: int) -> datetime:
+    def parse(self, stream: BinaryIO, size: int) -> "datetime.datetime":
         """ Type-specific helper function for parsing the element's payload.
             It is assumed the file pointer is at the start of the payload.
         """
         return readDate(stream, size)
 
     @classmethod
-    def encodePayload(cls, data: datetime, length: Optional[int] = None) -> bytes:
+    def encodePayload(cls, data: "datetime.datetime", length: Optional[int] = None) -> bytes:
         """ Type-specific payload encoder for date elements. """
         return encoding.encodeDate(data, length)
 
@@ -678,6 +817,37 @@ class MasterElement(Element):
         # TODO: Parse only the requested item(s), like `Document`
         return self.value.__getitem__(*args)
 
+    def readMany(self,
+                 names: Union[str, List[str], None] = None,
+                 raw: bool = False,
+                 **kwargs) -> List[Any]:
+        """ Read the values of this element's children, combining the reads
+            of nearby children's payloads. Much faster than getting each
+            child's `value` when there are many children. See
+            `ebmlite.util.readMany()`.
+
+            :param names: The name (or a list of names) of the child
+                elements to read. `None` reads all children.
+            :param raw: If `True`, get each element's raw binary value (like
+                `Element.getRawValue()`) rather than its parsed value.
+
+            Additional keyword arguments (`maxGap`, `maxSize`) are passed to
+            `ebmlite.util.readMany()`.
+
+            :return: A list of the children's values, in order.
+        """
+        from .util import readMany
+
+        if self._value is not None:
+            children = self._value
+        else:
+            children = self.__iter__(nocache=True)
+        if names is not None:
+            names = {names} if isinstance(names, str) else set(names)
+            children = (el for el in children if el.name in names)
+
+        return readMany(list(children), raw=raw, **kwargs)
+
     # ==========================================================================
     # Caching (experimental!)
     # ==========================================================================
@@ -777,6 +947,10 @@ class MasterElement(Element):
                 result[el.name] = el.dump()
         return result
 
+    def patch(self, value: Any):
+        """ Not supported by master elements; patch their children. """
+        raise TypeError("Cannot patch master element %s" % self.name)
+
 
 # ==============================================================================
 #
@@ -792,7 +966,9 @@ class Document(MasterElement):
                  stream: BinaryIO, 
                  name: Optional[str] = None, 
                  size: Optional[int] = None, 
-                 headers: bool = True):
+                 headers: bool = True,
+                 mode: str = 'rb',
+                 blockCache: Union[bool, Dict[str, int]] = False):
         """ Constructor. Instantiate a `Document` from a file-like stream.
             In most cases, `Schema.load()` should be used instead of
             explicitly instantiating a `Document`.
@@ -807,10 +983,19 @@ class Document(MasterElement):
                 (if present) will not appear as a root element in the document.
                 The contents of the ``EBML`` element will always be read,
                 regardless, and stored in the Document's `info` attribute.
+            :param mode: The mode in which to open the file, if `stream` is
+                a filename. Use ``'r+b'`` to allow changes (see
+                `Element.patch()`).
+            :param blockCache: If `True`, read the stream through a
+                `ebmlite.blockcache.BlockCacheStream`, combining the many
+                small reads made when parsing into a few large ones. Useful
+                for unbuffered streams (e.g., `ThreadAwareFile`) and network
+                filesystems. Can also be a dictionary of keyword arguments
+                for the `BlockCacheStream` (e.g., `blockSize`).
         """
         self._ownsStream = False
         if isinstance(stream, (str, Path)):
-            stream = open(stream, 'rb')
+            stream = open(stream, mode)
             self._ownsStream = True
 
         if not all((hasattr(stream, 'read'),
@@ -843,6 +1028,11 @@ class Document(MasterElement):
             elif self.filename and os.path.exists(self.filename):
                 self.size = os.path.getsize(self.stream.name)
 
+        if blockCache:
+            from .blockcache import BlockCacheStream
+            kwargs = blockCache if isinstance(blockCache, dict) else {}
+            self.stream = stream = BlockCacheStream(stream, **kwargs)
+
         self.info = {}
 
         try:
@@ -960,6 +1150,119 @@ class Document(MasterElement):
         # TODO: Implement this if/when caching of root elements is implemented.
         return 0
 
+    # ==========================================================================
+    # Instrumentation
+    # ==========================================================================
+
+    def stats(self):
+        """ Get the document's I/O statistics: the number of reads and
+            seeks, bytes read, elements parsed (by type), value cache hits,
+            and the time spent reading versus decoding. Statistics are
+            collected from the first call until stopped with
+            `ebmlite.stats.disable()`. See `ebmlite.stats`.
+
+            :return: An `ebmlite.stats.IOStats` object, updated as the
+                document is used.
+        """
+        from . import stats
+        return stats.enable(self)
+
+    def trackStats(self):
+        """ Collect I/O statistics for the document within the scope of a
+            ``with`` statement. See `ebmlite.stats`. Example::
+
+                with doc.trackStats() as stats:
+                    doc.dump()
+                print(stats.reads, stats.bytesRead)
+
+            :return: A context manager, returning an `ebmlite.stats.IOStats`
+                object.
+        """
+        from . import stats
+        return stats.track(self)
+
+    # ==========================================================================
+    # Appending
+    # ==========================================================================
+
+    def findEnd(self) -> Tuple[int, int]:
+        """ Find the end of the last complete root element, checking the
+            structure of the document's root elements (but not their
+            contents). Only the element headers are read.
+
+            :return: The offset of the end of the last complete root element,
+                and the offset of the end of the file. These differ if the
+                file ends with a partial (e.g., incompletely written)
+                element.
+            :raises IOError: If a root element has an unknown ('infinite')
+                size, so the end of the document cannot be found without
+                parsing its contents.
+        """
+        self.stream.seek(0, os.SEEK_END)
+        fileEnd = self.stream.tell()
+        pos = self.offset
+
+        while pos < fileEnd:
+            self.stream.seek(pos)
+            try:
+                eid, _ = readElementID(self.stream)
+                esize, _ = readElementSize(self.stream)
+            except (IOError, TypeError):
+                # Truncated or invalid header
+                break
+
+            headerEnd = self.stream.tell()
+            if esize is None:
+                if headerEnd > fileEnd:
+                    break
+                raise IOError("Root element (ID 0x%02X) at offset %d has an "
+                              "unknown size" % (eid, pos))
+            if headerEnd + esize > fileEnd:
+                break
+            pos = headerEnd + esize
+
+        return pos, fileEnd
+
+    def append(self, name: Union[str, int], value: Any) -> Element:
+        """ Write a new root element at the end of the document. The
+            document must be writable; see `Schema.openForAppend()`.
+
+            :param name: The name (or ID) of the element to write. It must
+                be a valid root element in the schema.
+            :param value: The element's value. If a list, multiple elements
+                are written (if the element type permits).
+            :return: The new element, or a list of new elements if `value`
+                is a list.
+        """
+        etype = self.schema[name]
+        if not self._isValidChild(etype.id):
+            raise ValueError("%s is not a valid root element" % etype.name)
+
+        data = etype.encode(value)
+
+        self.stream.seek(0, os.SEEK_END)
+        offset = self.stream.tell()
+        self.stream.write(data)
+        self.stream.flush()
+
+        # Keep cached document properties consistent with the file.
+        if hasattr(self, '_size'):
+            self._size = offset + len(data) - self.offset
+
+        elements = []
+        pos = offset
+        while pos < offset + len(data):
+            self.stream.seek(pos)
+            el, pos = self.parseElement(self.stream)
+            elements.append(el)
+
+        if hasattr(self, '_length'):
+            self._length += len(elements)
+
+        if isinstance(value, (list, tuple)):
+            return elements
+        return elements[0]
+
     # ==========================================================================
     # Encoding
     # ==========================================================================
@@ -1025,6 +1328,83 @@ class Document(MasterElement):
 # ==============================================================================
 
 
+class _LazyElementDict(dict):
+    """ A dictionary of a 'lazy' `Schema`'s `Element` subclasses, keyed by
+        ID or by name. Each subclass is created when it is first retrieved.
+        Operations on the dictionary as a whole (iteration, `len()`, etc.)
+        create all the subclasses not yet created.
+    """
+
+    def __init__(self, factory: Callable[[int], type]):
+        """ Constructor.
+
+            :param factory: A function that takes an element ID, creates
+                the corresponding `Element` subclass, and adds it to the
+                dictionary (or dictionaries) containing it.
+        """
+        super().__init__()
+        self._factory = factory
+        self._pending = {}  # IDs of elements not yet created, by key
+
+    def defer(self, key: Union[int, str], eid: int):
+        """ Add an element that will be created when first retrieved.
+
+            :param key: The dictionary key (element ID or name).
+            :param eid: The element's ID, as used by the factory function.
+        """
+        self._pending[key] = eid
+
+    def materialize(self):
+        """ Create all elements not yet created. """
+        for eid in list(self._pending.values()):
+            self._factory(eid)
+
+    def __missing__(self, key):
+        if key in self._pending:
+            return self._factory(self._pending[key])
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or key in self._pending
+
+    def __setitem__(self, key, value):
+        self._pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if self._pending.pop(key, None) is None:
+            dict.__delitem__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def _materializeFirst(name: str):
+    """ Helper function to wrap a `dict` method so it creates all pending
+        elements before being called.
+    """
+    method = getattr(dict, name)
+
+    def wrapped(self, *args, **kwargs):
+        self.materialize()
+        return method(self, *args, **kwargs)
+
+    wrapped.__name__ = name
+    wrapped.__doc__ = method.__doc__
+    return wrapped
+
+
+for _name in ('__eq__', '__ne__', '__iter__', '__len__', '__repr__',
+              '__reversed__', '__or__', '__ror__', '__ior__', 'clear', 'copy',
+              'items', 'keys', 'pop', 'popitem', 'setdefault', 'update',
+              'values'):
+    setattr(_LazyElementDict, _name, _materializeFirst(_name))
+del _name
+
+
 class Schema(object):
     """ An EBML schema, mapping element IDs to names and data types. Unlike
         the document and element types, this is not a base class; all schemata
@@ -1041,6 +1421,14 @@ class Schema(object):
         :ivar elementInfo: A dictionary mapping IDs to the raw schema
             attribute data. It may have additional items not present in the
             created element class' attributes.
+        :ivar globals: A dictionary of the schema's 'global' `Element`
+            subclasses (valid as a child of any element), keyed by ID.
+        :ivar dataElements: A dictionary of the schema's 'data' `Element`
+            subclasses (i.e., those containing the bulk of a document's
+            data, rather than metadata), keyed by ID.
+        :ivar lazy: If `True`, each element's `Element` subclass is created
+            when first retrieved from `elements` or `elementsByName` (or
+            via the Schema itself), rather than when the Schema is loaded.
 
         :ivar UNKNOWN: A class/function that handles unknown element IDs. By
             default, this is the `UnknownElement` class. Special-case handling
@@ -1085,28 +1473,23 @@ class Schema(object):
 
     def __init__(self, 
                  source: Union[str, Path, TextIO],
-                 name: Optional[str] = None):
+                 name: Optional[str] = None,
+                 lazy: bool = False):
         """ Constructor. Creates a new Schema from a schema description XML.
 
             :param source: The Schema's source, either a string with the full
                 path and name of the schema XML file, or a file-like stream.
             :param name: The schema's name. Defaults to the document type
                 element's default value (if defined) or the base file name.
+            :param lazy: If `True`, create each element's `Element` subclass
+                when it is first used, rather than all of them immediately.
+                Loads faster and uses less memory if only a fraction of the
+                schema's elements are used (as is typical of large schemata,
+                e.g., Matroska). Global elements are always created.
         """
-        self.source = source
-        self.filename = None
-
-        if isinstance(source, (str, Path)):
-            self.filename = os.path.realpath(source)
-        elif hasattr(source, "name"):
-            self.filename = os.path.realpath(source.name)
+        from xml.etree import ElementTree as ET
 
-        self.elements = {}    # Element types, keyed by ID
-        self.elementsByName = {}  # Element types, keyed by element name
-        self.elementInfo = {}  # Raw element schema attributes, keyed by ID
-
-        self.globals = {}   # Elements valid for any parent, by ID
-        self.children = set()  # Valid root elements, by ID
+        self._setup(source, lazy)
 
         # Parse, using the correct method for the schema format.
         schema = ET.parse(source)
@@ -1116,21 +1499,84 @@ class Schema(object):
             self._parseLegacySchema(root)
         elif root.tag == "Schema":
             # new ebmlite schema: root element is <Schema>
-            self._parseSchema(root, self)
+            self._parseSchema(root)
         else:
             raise IOError("Could not parse schema; expected root element "
                           "<Schema> or <table>, got <%s>" % root.tag)
 
-        # Special case: `Void` is a standard EBML element, but not its own
-        # type (it's technically binary). Use the special `VoidElement` type.
-        if 'Void' in self.elementsByName:
-            el = self.elementsByName['Void']
-            void = type('VoidElement', (VoidElement,),
-                        {'id': el.id, 'name': 'Void', 'schema': self,
-                         'mandatory': el.mandatory, 'multiple': el.multiple})
-            self.elements[el.id] = void
-            self.elementsByName['Void'] = void
+        self._finish(name)
+
+    @classmethod
+    def _fromDefinitions(cls,
+                         definitions: List[tuple],
+                         source: Union[str, Path, TextIO],
+                         name: Optional[str] = None,
+                         lazy: bool = False) -> "Schema":
+        """ Create a new Schema from previously recorded element definitions
+            (see `Schema.definitions`), without parsing any XML. Used when
+            loading cached schemata.
+
+            :param definitions: A list of element definitions, as recorded
+                in another Schema's `definitions`.
+            :param source: The Schema's original source.
+            :param name: The schema's name. Defaults to the document type
+                element's default value (if defined) or the base file name.
+            :param lazy: If `True`, create each element's `Element` subclass
+                when it is first used. See `Schema.__init__()`.
+        """
+        bases = cls._getBaseClassesByName()
+        self = cls.__new__(cls)
+        self._setup(source, lazy)
+        for eid, ename, baseName, attribs, parentId, docs in definitions:
+            self._defineElement(eid, ename, bases[baseName], attribs,
+                                parentId, docs)
+        self._finish(name)
+        return self
+
+    @classmethod
+    def _getBaseClassesByName(cls) -> Dict[str, type]:
+        """ Get the base `Element` classes used by this type of Schema, keyed
+            by class name.
+        """
+        bases = {}
+        for base in list(cls.BASE_CLASSES.values()) + list(cls.ELEMENT_TYPES.values()):
+            bases.setdefault(base.__name__, base)
+        return bases
+
+    def _setup(self, source: Union[str, Path, TextIO], lazy: bool = False):
+        """ Initialize the Schema's attributes prior to defining its
+            elements.
+        """
+        self.source = source
+        self.filename = None
+        self.lazy = lazy
+
+        if isinstance(source, (str, Path)):
+            self.filename = os.path.realpath(source)
+        elif hasattr(source, "name"):
+            self.filename = os.path.realpath(source.name)
+
+        if lazy:
+            self.elements = _LazyElementDict(self._createElement)
+            self.elementsByName = _LazyElementDict(self._createElement)
+        else:
+            self.elements = {}    # Element types, keyed by ID
+            self.elementsByName = {}  # Element types, keyed by element name
+        self.elementInfo = {}  # Raw element schema attributes, keyed by ID
+
+        # Element subclasses' base classes and attributes, keyed by ID
+        self._elementSpecs = {}
+
+        self.globals = {}   # Elements valid for any parent, by ID
+        self.dataElements = {}  # Elements containing bulk data, by ID
+        self.children = set()  # Valid root elements, by ID
+
+        # Every element definition, in order, as plain data (for caching).
+        self.definitions = []
 
+    def _finish(self, name: Optional[str] = None):
+        """ Complete the Schema after all its elements have been defined.
+        """
         # Schema name. Defaults to the schema's default EBML 'DocType'
         self.name = name or self.type
 
@@ -1161,15 +1607,15 @@ class Schema(object):
                 raise ValueError("Unknown type for element %r (ID 0x%02x): %r" %
                                  (ename, eid, etype))
 
-            self.addElement(eid, ename, self.ELEMENT_TYPES[etype], attribs,
-                            docs=docs)
+            self._defineElement(eid, ename, self.ELEMENT_TYPES[etype],
+                                attribs, docs=docs)
 
-    def _parseSchema(self, el, parent=None):
+    def _parseSchema(self, el, parentId: Optional[int] = None):
         """ Recursively crawl a schema XML definition file.
         """
         if el.tag == "Schema":
             for chEl in el:
-                self._parseSchema(chEl, self)
+                self._parseSchema(chEl)
             return
 
         if el.tag not in self.BASE_CLASSES:
@@ -1191,11 +1637,12 @@ class Schema(object):
 
         baseClass = self.BASE_CLASSES[el.tag]
 
-        cls = self.addElement(eid, ename, baseClass, attribs, parent, docs)
+        eid = self._defineElement(eid, ename, baseClass, attribs, parentId,
+                                  docs)
 
         if baseClass is MasterElement:
             for chEl in el:
-                self._parseSchema(chEl, cls)
+                self._parseSchema(chEl, eid)
 
     def addElement(self,
                    eid: int, 
@@ -1221,6 +1668,31 @@ class Schema(object):
             :param docs: The new element's docstring (e.g. the defining XML
                 element's text content).
         """
+        parentId = None if (parent is None or parent is self) else parent.id
+        eid = self._defineElement(eid, ename, baseClass, attribs, parentId,
+                                  docs)
+        return self.elements[eid]
+
+    def _defineElement(self,
+                       eid: Optional[int],
+                       ename: Optional[str],
+                       baseClass,
+                       attribs: Optional[Dict[str, Any]] = None,
+                       parentId: Optional[int] = None,
+                       docs: Optional[str] = None) -> int:
+        """ Create a new `Element` subclass and add it to the schema. Called
+            by `addElement()` and the schema XML parsers; the arguments are
+            recorded in the Schema's `definitions`.
+
+            :param parentId: The ID of the new element's parent element, or
+                `None` if the element is a root element.
+            :return: The new (or previously defined) element's ID.
+
+            See `Schema.addElement()` for descriptions of the other arguments.
+        """
+        self.definitions.append((eid, ename, baseClass.__name__, attribs,
+                                 parentId, docs))
+
         attribs = {} if attribs is None else attribs
 
         def _getBool(d, k, default):
@@ -1234,6 +1706,9 @@ class Schema(object):
 
         def _getInt(d, k, default):
             """ Helper function to get a dictionary value cast to int. """
+            if k not in d:
+                return default
+            from ast import literal_eval
             try:
                 return int(literal_eval(d[k].strip()))
             except (KeyError, SyntaxError, TypeError, ValueError):
@@ -1257,9 +1732,7 @@ class Schema(object):
 
             newatts = self.elementInfo[eid].copy()
             newatts.update(attribs)
-            if self.elementInfo[eid] == newatts:
-                eclass = self.elements[eid]
-            else:
+            if self.elementInfo[eid] != newatts:
                 raise TypeError('Element %r (ID 0x%02X) redefined with '
                                 'different attributes' % (ename, eid))
         else:
@@ -1286,6 +1759,7 @@ class Schema(object):
             precache = _getBool(attribs, 'precache', baseClass.precache)
             length = _getInt(attribs, 'length', None)
             isGlobal = _getInt(attribs, 'global', None)
+            isData = _getBool(attribs, 'data', False)
 
             if isGlobal is None:
                 # Element 'level'. The old schema format used level to define
@@ -1297,26 +1771,61 @@ class Schema(object):
                 # reading `level` if `global` isn't defined.
                 isGlobal = _getInt(attribs, 'level', None) == -1
 
-            # Create a new Element subclass
-            eclass = type('%sElement' % ename, (baseClass,),
-                          {'id': eid, 'name': ename, 'schema': self,
-                           'mandatory': mandatory, 'multiple': multiple,
-                           'precache': precache, 'length': length,
-                           'children': set(), '__doc__': docs,
-                           '__slots__': baseClass.__slots__})
-
-            self.elements[eid] = eclass
+            # Define the new Element subclass. Its `children` set is shared
+            # with the spec, so children can be added before it is created.
+            self._elementSpecs[eid] = (baseClass,
+                                       {'id': eid, 'name': ename, 'schema': self,
+                                        'mandatory': mandatory, 'multiple': multiple,
+                                        'precache': precache, 'length': length,
+                                        'children': set(), '__doc__': docs})
             self.elementInfo[eid] = attribs
-            self.elementsByName[ename] = eclass
+
+            if self.lazy:
+                self.elements.defer(eid, eid)
+                self.elementsByName.defer(ename, eid)
+            else:
+                self._createElement(eid)
 
             if isGlobal:
-                self.globals[eid] = eclass
+                # Globals are always created, keeping `globals` a normal dict
+                self.globals[eid] = self.elements[eid]
+
+            if isData:
+                self.dataElements[eid] = self.elements[eid]
+
+        if parentId is None:
+            self.children.add(eid)
+        else:
+            self._elementSpecs[parentId][1]['children'].add(eid)
+
+        return eid
+
+    def _createElement(self, eid: int) -> type:
+        """ Create the `Element` subclass for a defined element, and add it
+            to `elements` and `elementsByName`. Called by `_defineElement()`,
+            or upon first retrieval if the Schema is lazy.
 
-        parent = parent or self
-        if parent.children is None:
-            parent.children = set()
-        parent.children.add(eid)
+            :param eid: The element's EBML ID.
+            :return: The new `Element` subclass.
+        """
+        baseClass, attrs = self._elementSpecs[eid]
+        ename = attrs['name']
+
+        if ename == 'Void':
+            # Special case: `Void` is a standard EBML element, but not its own
+            # type (it's technically binary). Use the special `VoidElement` type.
+            eclass = type('VoidElement', (VoidElement,),
+                          {'id': eid, 'name': 'Void', 'schema': self,
+                           'mandatory': attrs['mandatory'],
+                           'multiple': attrs['multiple'], '__slots__': ()})
+        else:
+            # Note: an empty `__slots__` suffices (the base class defines
+            # them), and makes instances smaller and classes faster to create.
+            eclass = type('%sElement' % ename, (baseClass,),
+                          dict(attrs, __slots__=()))
 
+        self.elements[eid] = eclass
+        self.elementsByName[ename] = eclass
         return eclass
 
     def __repr__(self):
@@ -1372,6 +1881,50 @@ class Schema(object):
         """
         return self.document(fp, name=name, headers=headers, **kwargs)
 
+    def openForAppend(self,
+                      filename: Union[str, Path],
+                      truncate: bool = False,
+                      headers: bool = True,
+                      **kwargs) -> Document:
+        """ Open an EBML file for adding root elements (see
+            `Document.append()`). The file is created if it does not exist.
+            The structure of the file's root elements is checked before the
+            document is returned.
+
+            :param filename: The name of the file to open.
+            :param truncate: If `True`, a partial element at the end of the
+                file (e.g., one left by an interrupted write) is removed. If
+                `False`, such an element causes an `IOError`.
+            :param headers: If `True`, write the ``EBML`` header element if
+                the file is new or empty. Also passed to `Schema.load()`.
+
+            Additional keyword arguments are sent verbatim to `Schema.load()`.
+
+            :raises IOError: If the file ends with a partial element (and
+                `truncate` is `False`), or its end cannot be found.
+        """
+        with open(filename, 'ab') as f:
+            if headers and f.tell() == 0:
+                f.write(self.document.encodePayload(self.document._createHeaders()))
+
+        doc = self.load(filename, headers=headers, mode='r+b', **kwargs)
+
+        try:
+            end, fileEnd = doc.findEnd()
+            if end < fileEnd:
+                if not truncate:
+                    raise IOError("%s ends with a partial element at offset %d"
+                                  % (filename, end))
+                doc.stream.truncate(end)
+                doc.stream.flush()
+                if hasattr(doc, '_size'):
+                    doc._size = end - doc.offset
+        except Exception:
+            doc.close()
+            raise
+
+        return doc
+
     def loads(self, data: bytes, name: Optional[str] = None) -> Document:
         """ Load EBML from a string using this Schema.
 
@@ -1493,6 +2046,10 @@ def _expandSchemaPath(path: Union[str, Path, types.ModuleType],
     strpath = str(path)
     subdir = ''
 
+    if isinstance(path, types.ModuleType) or '{' in strpath:
+        import importlib.resources as importlib_resources
+        import re
+
     if not strpath:
         path = strpath = os.getcwd()
     elif '{' in strpath:
@@ -1522,36 +2079,111 @@ def listSchemata(*paths, absolute: bool = True) -> Dict[str, List[Schema]]:
             filename in the list is what will load if the base name is used
             with `loadSchema()`.
     """
+    from .registry import REGISTRY
+
     schemata = {}
-    paths = paths or SCHEMA_PATH
 
-    for path in paths:
-        try:
-            fullpath = _expandSchemaPath(path)
-        except ModuleNotFoundError:
-            continue
+    for path, p, info in REGISTRY.scan(paths or SCHEMA_PATH):
+        if info['rootTag'] == 'Schema':
+            value = p if absolute else Path(path) / p.name
+            schemata.setdefault(p.name, []).append(value)
 
-        if not fullpath.is_dir():
-            continue
+    return schemata
 
-        for p in fullpath.iterdir():
-            key = p.name
-            if key.lower().endswith('.xml'):
-                try:
-                    # Casting to string is py35 fix. Remove in future.
-                    xml = ET.parse(str(p))
-                    if xml.getroot().tag == 'Schema':
-                        value = p if absolute else Path(path) / p.name
-                        schemata.setdefault(key, []).append(value)
-                except (ET.ParseError, IOError, TypeError):
-                    continue
 
-    return schemata
+# Version of the schema cache file format. Increment if it changes.
+_SCHEMA_CACHE_FORMAT = 1
+
+
+def _getSchemaCacheFile(filename: Path) -> Optional[Tuple[str, tuple]]:
+    """ Helper function to get the name of the cache file for a schema XML
+        file, and the key used to validate the cached data. The key
+        contains the file's path, size, and modification time, as well as
+        the ebmlite version, so changes to any will invalidate the cache.
+
+        :param filename: The schema XML file.
+        :return: The cache filename and key, or `None` if the schema cannot
+            be cached (e.g., caching is disabled or the schema is not a
+            regular file).
+    """
+    if not CACHE_PATH or not isinstance(filename, Path):
+        return None
+
+    import hashlib
+    from . import __version__
+
+    try:
+        filename = os.path.realpath(filename)
+        stat = os.stat(filename)
+    except OSError:
+        return None
+
+    key = (_SCHEMA_CACHE_FORMAT, __version__, filename, stat.st_size,
+           stat.st_mtime_ns)
+    digest = hashlib.sha1(repr(key).encode('utf8')).hexdigest()[:16]
+    basename = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(CACHE_PATH, "%s-%s.schema" % (basename, digest)), key
+
+
+def _loadCachedSchema(filename: Path, **kwargs) -> Optional[Schema]:
+    """ Helper function to create a `Schema` from cached schema data, if
+        present and valid for the given schema XML file.
+
+        :param filename: The schema XML file.
+        :return: The new Schema, or `None` if not cached.
+    """
+    cacheFile = _getSchemaCacheFile(filename)
+    if not cacheFile:
+        return None
+
+    cacheFile, key = cacheFile
+    try:
+        with open(cacheFile, 'rb') as f:
+            # Note: `marshal.loads()` on the whole file is much faster than
+            # `marshal.load()` on the stream.
+            cachedKey, definitions = marshal.loads(f.read())
+        if cachedKey != key:
+            return None
+        return Schema._fromDefinitions(definitions, str(filename), **kwargs)
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        # Missing, unreadable, or invalid cache. Parse the XML instead.
+        return None
+
+
+def _saveCachedSchema(filename: Path, schema: Schema):
+    """ Helper function to write a `Schema`'s element definitions to the
+        cache. Failure to write the cache is not an error.
+
+        :param filename: The schema's XML file.
+        :param schema: The `Schema` parsed from the XML file.
+    """
+    cacheFile = _getSchemaCacheFile(filename)
+    if not cacheFile:
+        return
+
+    # Only definitions using known base classes can be recreated.
+    bases = schema._getBaseClassesByName()
+    if not all(bases.get(d[2]) is not None for d in schema.definitions):
+        return
+
+    cacheFile, key = cacheFile
+    tempFile = "%s.%d.tmp" % (cacheFile, os.getpid())
+    try:
+        os.makedirs(CACHE_PATH, exist_ok=True)
+        with open(tempFile, 'wb') as f:
+            marshal.dump((key, schema.definitions), f)
+        os.replace(tempFile, cacheFile)
+    except (OSError, ValueError):
+        try:
+            os.remove(tempFile)
+        except OSError:
+            pass
 
 
 def loadSchema(filename: Union[str, Path],
                reload: bool = False,
                paths: Optional[str] = None,
+               cache: bool = True,
                **kwargs) -> Schema:
     """ Import a Schema XML file. Loading the same file more than once will
         return the initial instantiation, unless `reload` is `True`.
@@ -1565,6 +2197,9 @@ def loadSchema(filename: Union[str, Path],
             Schema and/or its elements will not update.
         :param paths: A list of paths to search for schemata, an alternative
             to `ebmlite.SCHEMA_PATH`
+        :param cache: If `True`, use the schema's pre-parsed data in
+            `CACHE_PATH` (if present and up to date), and write it there
+            after parsing the schema XML.
 
         Additional keyword arguments are sent verbatim to the `Schema`
         constructor.
@@ -1603,8 +2238,13 @@ def loadSchema(filename: Union[str, Path],
     if not filename.is_file():
         raise IOError(errno.ENOENT, 'Could not find schema XML', origName)
 
-    with filename.open() as fs:
-        schema = Schema(fs, **kwargs)
+    schema = _loadCachedSchema(filename, **kwargs) if cache else None
+
+    if schema is None:
+        with filename.open() as fs:
+            schema = Schema(fs, **kwargs)
+        if cache:
+            _saveCachedSchema(filename, schema)
 
     SCHEMATA[str(filename)] = SCHEMATA[origName] = schema
     return schema
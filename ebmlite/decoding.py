@@ -13,11 +13,13 @@ __credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt
 __all__ = ['readElementID', 'readElementSize', 'readFloat', 'readInt',
            'readUInt', 'readDate', 'readString', 'readUnicode']
 
-from datetime import datetime, timedelta
 import struct
-from typing import BinaryIO, Optional, Tuple
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Optional, Tuple
 import warnings
 
+if TYPE_CHECKING:
+    import datetime
+
 # ==============================================================================
 #
 # ==============================================================================
@@ -127,6 +129,71 @@ def readElementSize(stream: BinaryIO) -> Tuple[Optional[int], int]:
     return size, length
 
 
+def _iterRaw(stream: BinaryIO,
+             start: int,
+             end: int,
+             window: int = 4096) -> Iterator[Tuple[int, int, int, int, bytes, int]]:
+    """ Iterate over the elements in a range of a stream, reading their
+        headers directly (rather than instantiating `Element` objects), from
+        a buffer read `window` bytes at a time.
+
+        :return: A generator yielding the element ID, its offset, the offset
+            of its payload, its payload size, the buffer containing the
+            element, and the position of its payload in the buffer. At least
+            24 bytes of the payload are in the buffer (if the payload is
+            that long). Iteration stops at the last complete element, e.g.,
+            if the file was truncated.
+    """
+    buf = b''
+    bufStart = start
+    pos = start
+    while pos < end:
+        rel = pos - bufStart
+        if rel + 36 > len(buf) and bufStart + len(buf) < end:
+            stream.seek(pos)
+            buf = stream.read(max(window, 36))
+            bufStart = pos
+            rel = 0
+        if rel >= len(buf):
+            break
+
+        # Single-byte IDs and sizes (e.g., small elements with 1-byte IDs)
+        # are handled as special cases, for speed.
+        eid = buf[rel]
+        if eid & 0x80:
+            idlen = 1
+        else:
+            idlen, _ = decodeIntLength(eid)
+            if idlen > 4:
+                raise IOError("Invalid element ID at offset %d" % pos)
+            eid = int.from_bytes(buf[rel:rel + idlen], 'big')
+
+        if rel + idlen >= len(buf):
+            # Truncated element ID
+            break
+
+        size = buf[rel + idlen]
+        if size & 0x80:
+            sizelen = 1
+            size &= 0x7F
+        else:
+            sizelen, size = decodeIntLength(size)
+            if rel + idlen + sizelen > len(buf):
+                # Truncated element size
+                break
+            size = (size << (8 * (sizelen - 1))) + int.from_bytes(
+                buf[rel + idlen + 1:rel + idlen + sizelen], 'big')
+        if size == 2 ** (7 * sizelen) - 1:
+            raise IOError("Element with unknown size at offset %d" % pos)
+
+        payloadOffset = pos + idlen + sizelen
+        if payloadOffset + size > end:
+            # Truncated payload
+            break
+        yield eid, pos, payloadOffset, size, buf, rel + idlen + sizelen
+        pos = payloadOffset + size
+
+
 def readUInt(stream: BinaryIO, size: int) -> int:
     """ Read an unsigned integer from a file (or file-like stream).
 
@@ -217,7 +284,7 @@ def readUnicode(stream: BinaryIO, size: int) -> str:
     return str(data, 'utf_8')
 
 
-def readDate(stream: BinaryIO, size: int = 8) -> datetime:
+def readDate(stream: BinaryIO, size: int = 8) -> "datetime.datetime":
     """ Read an EBML encoded date (nanoseconds since UTC 2001-01-01T00:00:00)
         from a file (or file-like stream).
 
@@ -226,6 +293,8 @@ def readDate(stream: BinaryIO, size: int = 8) -> datetime:
         :return: The decoded value (as `datetime.datetime`).
         :raise IOError: raised if the length of the date is not 8 bytes.
     """
+    from datetime import datetime, timedelta
+
     if size != 8:
         raise IOError("Cannot read date value of length %d, only 8." % size)
     data = stream.read(size)
@@ -11,15 +11,17 @@ __credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt
 __all__ = ['encodeBinary', 'encodeDate', 'encodeFloat', 'encodeId', 'encodeInt',
            'encodeSize', 'encodeString', 'encodeUInt', 'encodeUnicode']
 
-import datetime
 import struct
 import sys
-from typing import AnyStr, Optional
+from typing import TYPE_CHECKING, AnyStr, Optional
 import warnings
 
 from .decoding import _struct_uint64, _struct_int64
 from .decoding import _struct_float32, _struct_float64
 
+if TYPE_CHECKING:
+    import datetime
+
 # ==============================================================================
 #
 # ==============================================================================
@@ -292,7 +294,7 @@ def encodeUnicode(val: str, length: Optional[int] = None) -> bytes:
     return encodeBinary(val, length)
 
 
-def encodeDate(val: datetime.datetime, length: Optional[int] = None) -> bytes:
+def encodeDate(val: "datetime.datetime", length: Optional[int] = None) -> bytes:
     """ Encode a `datetime` object as an EBML date (i.e. nanoseconds since
         2001-01-01T00:00:00).
 
@@ -302,6 +304,8 @@ def encodeDate(val: datetime.datetime, length: Optional[int] = None) -> bytes:
         :return: The binary representation of val as an 8-byte dateTime.
         :raise ValueError: raised if the length of the input is not 8 bytes.
     """
+    import datetime
+
     if length is None:
         length = 8
     elif length != 8:
@@ -0,0 +1,532 @@
+"""
+Helpers for reading sensor data from Mide IDE recordings, built on the
+bundled ``mide_ide.xml`` schema: the data of each channel is read, in one
+pass over the file, into a NumPy structured array, with one field per
+subchannel, as described by the channel's ``ChannelFormat`` (a Python
+`struct` format string) in the recording's ``RecordingProperties``.
+
+NumPy is only required for the functions returning arrays.
+"""
+__author__ = "David Randall Stokes, Connor Flanigan"
+__copyright__ = "Copyright 2022, Mide Technology Corporation"
+__credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt"
+
+__all__ = ['DataBlocks', 'blockTimes', 'channelDtype', 'getChannels',
+           'readChannelData', 'sampleTimes', 'scanBlocks', 'unwrapTimes']
+
+from array import array
+from io import BytesIO
+from pathlib import Path
+import re
+import struct
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterable, Optional, Tuple, Union
+import warnings
+
+from . import core
+from .decoding import _iterRaw
+from .util import READ_MAX_GAP, READ_MAX_SIZE, _iterReads
+
+if TYPE_CHECKING:
+    import numpy
+
+# ==============================================================================
+#
+# ==============================================================================
+
+# The name of the schema used for files opened by name.
+SCHEMA = 'mide_ide.xml'
+
+# IDs of the data block elements and the `ChannelDataBlock` children used
+# when reading blocks directly.
+SIMPLECHANNELDATABLOCK_ID = 0xA0
+CHANNELDATABLOCK_ID = 0xA1
+CHANNELIDREF_ID = 0xB0
+CHANNELDATAPAYLOAD_ID = 0xB2
+STARTTIMECODEABS_ID = 0xB8
+ENDTIMECODEABS_ID = 0xB9
+STARTTIMECODEABSMOD_ID = 0xBA
+ENDTIMECODEABSMOD_ID = 0xBB
+
+# The size of the header of a `SimpleChannelDataBlock` (a 2 byte modulo
+# timecode and a 1 byte channel ID) preceding its data.
+SIMPLE_HEADER_SIZE = 3
+
+# The kinds of block timecodes (see `DataBlocks.timeTypes`): absolute,
+# modulo the channel's ``TimeCodeModulus``, and the 2 byte modulo timecode
+# of a `SimpleChannelDataBlock`.
+TIME_ABS = 0
+TIME_MOD = 1
+TIME_SIMPLE = 2
+
+# Timecode defaults, used if a channel has no ``TimeCodeScale`` (in seconds
+# per tick) or ``TimeCodeModulus``.
+DEFAULT_TIMECODE_SCALE = 1.0 / 32768
+DEFAULT_TIMECODE_MODULUS = 2 ** 24
+SIMPLE_TIMECODE_MODULUS = 2 ** 16
+
+# The amount of data read at a time when scanning the data blocks. Blocks
+# smaller than this are read along with their neighbors.
+READ_WINDOW = 16384
+
+# NumPy type 'kinds' of `struct` format characters. The sizes are determined
+# by `struct` itself, since they depend on the format's byte order character.
+_STRUCT_KINDS = {'b': 'i', 'B': 'u', '?': 'b', 'h': 'i', 'H': 'u', 'i': 'i',
+                 'I': 'u', 'l': 'i', 'L': 'u', 'q': 'i', 'Q': 'u', 'n': 'i',
+                 'N': 'u', 'e': 'f', 'f': 'f', 'd': 'f'}
+
+# `struct` byte order characters, and the NumPy equivalents.
+_BYTE_ORDERS = {'<': '<', '>': '>', '!': '>', '=': '=', '@': '='}
+
+_STRUCT_TOKEN = re.compile(r'\s*(\d*)([xcbB?hHiIlLqQnNefdsp])')
+
+
+def _getDocument(source: Union[str, Path, BinaryIO, core.Document]) -> core.Document:
+    """ Helper function to get a `Document` from a filename, stream, or
+        an existing `Document`.
+    """
+    if isinstance(source, core.Document):
+        return source
+    return core.loadSchema(SCHEMA).load(source)
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def getChannels(source: Union[str, Path, BinaryIO, core.Document]) -> Dict[int, Dict[str, Any]]:
+    """ Get the descriptions of a recording's channels from its
+        ``RecordingProperties/ChannelList``.
+
+        :param source: The IDE file: a filename, a stream, or a loaded
+            `Document`.
+        :return: A dictionary of ``Channel`` elements' values (as from
+            `dump()`), keyed by ``ChannelID``.
+    """
+    doc = _getDocument(source)
+    try:
+        for el in doc:
+            if el.id in doc.schema.dataElements:
+                break
+            if el.name != 'RecordingProperties':
+                continue
+            for child in el:
+                if child.name == 'ChannelList':
+                    return {ch['ChannelID']: ch
+                            for ch in child.dump().get('Channel', [])
+                            if 'ChannelID' in ch}
+        return {}
+    finally:
+        if doc is not source:
+            doc.close()
+
+
+def channelDtype(channel: Dict[str, Any]) -> "numpy.dtype":
+    """ Create a NumPy structured data type for a channel's samples, from the
+        channel's ``ChannelFormat`` (a `struct` format string). Each field
+        is named after its subchannel's ``SubChannelName``, or ``sc0``,
+        ``sc1``, etc. if the subchannels don't all have unique names.
+
+        :param channel: The channel's description, as returned by
+            `getChannels()`.
+        :return: A `numpy.dtype`.
+    """
+    import numpy
+
+    fmt = channel.get('ChannelFormat')
+    if not fmt:
+        raise ValueError("Channel %r has no ChannelFormat" % channel.get('ChannelID'))
+
+    fmt = fmt.strip()
+    prefix = fmt[0] if fmt[0] in _BYTE_ORDERS else '@'
+    order = _BYTE_ORDERS[prefix]
+    body = fmt[1:] if fmt[0] in _BYTE_ORDERS else fmt
+
+    formats = []
+    offsets = []
+    consumed = ''
+    pos = 0
+    while pos < len(body.rstrip()):
+        match = _STRUCT_TOKEN.match(body, pos)
+        if not match:
+            raise ValueError("Unsupported ChannelFormat: %r" % fmt)
+        pos = match.end()
+        count = int(match.group(1) or 1)
+        code = match.group(2)
+
+        if code in 'sp':
+            fields = [(code, 'S%d' % count)]
+        elif code == 'c':
+            fields = [(code, 'S1')] * count
+        elif code == 'x':
+            fields = []
+        else:
+            size = struct.calcsize(prefix + code)
+            fields = [(code, '%s%s%d' % (order, _STRUCT_KINDS[code], size))] * count
+
+        for code, dtype in fields:
+            # Offset of the next field, including any alignment padding
+            offsets.append(struct.calcsize(prefix + consumed + '0' + code))
+            formats.append(dtype)
+            consumed += code if code not in 'sp' else '%d%s' % (count, code)
+        if code == 'x':
+            consumed += '%dx' % count
+
+    names = [sc.get('SubChannelName') for sc in channel.get('SubChannel', [])]
+    if (len(names) != len(formats) or not all(isinstance(n, str) and n for n in names)
+            or len(set(names)) != len(names)):
+        names = ['sc%d' % i for i in range(len(formats))]
+
+    return numpy.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                        'itemsize': struct.calcsize(fmt)})
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+class DataBlocks(object):
+    """ The locations of the data in an IDE file's ``ChannelDataBlock`` and
+        ``SimpleChannelDataBlock`` elements, as arrays (see the standard
+        `array` module), in the order in which they appear in the file.
+        Created by `scanBlocks()`.
+
+        :ivar channels: The channel ID of each block.
+        :ivar offsets: The offset of each block's data (i.e., the
+            ``ChannelDataPayload``, or the data following the header of a
+            ``SimpleChannelDataBlock``).
+        :ivar sizes: The size of each block's data.
+        :ivar starts: The start timecode of each block, in the channel's
+            ``TimeCodeScale`` units, or -1 if the block has none.
+        :ivar ends: The end timecode of each block (the time of its last
+            sample), or -1 if the block has none.
+        :ivar timeTypes: The kind of each block's timecodes: `TIME_ABS`,
+            `TIME_MOD` (modulo the channel's ``TimeCodeModulus``), or
+            `TIME_SIMPLE` (a ``SimpleChannelDataBlock``'s 16 bit timecode).
+    """
+
+    def __init__(self):
+        self.channels = array('l')
+        self.offsets = array('q')
+        self.sizes = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.timeTypes = array('B')
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __repr__(self) -> str:
+        return "<%s: %d blocks>" % (self.__class__.__name__, len(self))
+
+    def totals(self) -> Dict[int, int]:
+        """ Get the total size of each channel's data.
+
+            :return: A dictionary of sizes, keyed by channel ID.
+        """
+        totals = {}
+        for channel, size in zip(self.channels, self.sizes):
+            totals[channel] = totals.get(channel, 0) + size
+        return totals
+
+    def _add(self, channel: Optional[int], offset: Optional[int], size: int,
+             start: int = -1, end: int = -1, timeType: int = TIME_ABS):
+        """ Add a block, if it has both a channel and data. """
+        if channel is not None and offset is not None:
+            self.channels.append(channel)
+            self.offsets.append(offset)
+            self.sizes.append(size)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.timeTypes.append(timeType)
+
+
+def scanBlocks(source: Union[str, Path, BinaryIO, core.Document],
+               window: int = READ_WINDOW) -> DataBlocks:
+    """ Find the data in all of an IDE file's data blocks. The headers of
+        the root elements and the data blocks' children are read directly,
+        without creating `Element` objects.
+
+        :param source: The IDE file: a filename, a stream, or a loaded
+            `Document`.
+        :param window: The amount of data to read at a time.
+        :return: A `DataBlocks` containing the channel, offset, size, and
+            raw timecodes of the data in each block.
+    """
+    doc = _getDocument(source)
+    blocks = DataBlocks()
+    stream = doc.stream
+
+    try:
+        for eid, _offset, payloadOffset, size, buf, rel in _iterRaw(stream, doc.payloadOffset,
+                                                                    doc.size, window):
+            if eid == SIMPLECHANNELDATABLOCK_ID:
+                if size >= SIMPLE_HEADER_SIZE:
+                    blocks._add(buf[rel + 2], payloadOffset + SIMPLE_HEADER_SIZE,
+                                size - SIMPLE_HEADER_SIZE,
+                                int.from_bytes(buf[rel:rel + 2], 'big'), -1, TIME_SIMPLE)
+                continue
+            elif eid != CHANNELDATABLOCK_ID:
+                continue
+
+            if rel + size <= len(buf):
+                # The whole block is in the buffer; read its children from it
+                children = _iterRaw(BytesIO(buf[rel:rel + size]), 0, size, size)
+                base = payloadOffset
+            else:
+                children = _iterRaw(stream, payloadOffset, payloadOffset + size, window)
+                base = 0
+
+            channel = dataOffset = None
+            dataSize = 0
+            times = {}
+            for childId, _childOffset, childPayload, childSize, childBuf, childRel in children:
+                if childId == CHANNELIDREF_ID:
+                    channel = int.from_bytes(childBuf[childRel:childRel + childSize], 'big',
+                                             signed=True)
+                elif childId == CHANNELDATAPAYLOAD_ID:
+                    dataOffset = base + childPayload
+                    dataSize = childSize
+                elif STARTTIMECODEABS_ID <= childId <= ENDTIMECODEABSMOD_ID:
+                    times[childId] = int.from_bytes(childBuf[childRel:childRel + childSize], 'big')
+
+            # Absolute timecodes are used if present. Mixed start and end
+            # types can't be reconciled here, so the end is ignored.
+            if STARTTIMECODEABS_ID in times or STARTTIMECODEABSMOD_ID not in times:
+                blocks._add(channel, dataOffset, dataSize, times.get(STARTTIMECODEABS_ID, -1),
+                            times.get(ENDTIMECODEABS_ID, -1), TIME_ABS)
+            else:
+                blocks._add(channel, dataOffset, dataSize, times[STARTTIMECODEABSMOD_ID],
+                            times.get(ENDTIMECODEABSMOD_ID, -1), TIME_MOD)
+
+    finally:
+        if doc is not source:
+            doc.close()
+
+    return blocks
+
+
+def readChannelData(source: Union[str, Path, BinaryIO, core.Document],
+                    channels: Optional[Iterable[int]] = None,
+                    maxGap: int = READ_MAX_GAP,
+                    maxSize: int = READ_MAX_SIZE,
+                    blocks: Optional[DataBlocks] = None) -> Dict[int, "numpy.ndarray"]:
+    """ Read the data of an IDE file's channels into NumPy structured arrays
+        (see `channelDtype()`). The data blocks are found in one pass (see
+        `scanBlocks()`); each channel's data is then copied into a buffer of
+        the channel's total size, reading the data of blocks that are close
+        together at once (see `util.readRanges()`). Requires NumPy.
+
+        :param source: The IDE file: a filename, a stream, or a loaded
+            `Document`.
+        :param channels: The IDs of the channels to read, or `None` to read
+            all channels with a ``ChannelFormat``.
+        :param maxGap: The largest gap between two blocks that will be read
+            (and discarded) to combine them into one read.
+        :param maxSize: The largest read to make when combining blocks.
+            Larger blocks are still read in full.
+        :param blocks: The file's data blocks, if already found by
+            `scanBlocks()`.
+        :return: A dictionary of structured arrays, one element per sample,
+            keyed by channel ID. Channels without data have empty arrays.
+    """
+    import numpy
+
+    doc = _getDocument(source)
+    try:
+        info = getChannels(doc)
+        if channels is None:
+            channels = [chId for chId, ch in info.items() if ch.get('ChannelFormat')]
+        else:
+            channels = list(channels)
+            for chId in channels:
+                if chId not in info:
+                    raise KeyError("Channel %r not in ChannelList" % chId)
+
+        dtypes = {chId: channelDtype(info[chId]) for chId in channels}
+        if blocks is None:
+            blocks = scanBlocks(doc)
+        totals = blocks.totals()
+
+        # Preallocated buffers for each channel, and the position in each
+        buffers = {chId: bytearray(totals.get(chId, 0)) for chId in channels}
+        views = {chId: memoryview(buf) for chId, buf in buffers.items()}
+        positions = dict.fromkeys(channels, 0)
+
+        selected = [i for i, chId in enumerate(blocks.channels) if chId in buffers]
+        offsets = blocks.offsets
+        sizes = blocks.sizes
+        ranges = [(offsets[idx], sizes[idx]) for idx in selected]
+
+        for start, data, indices in _iterReads(doc.stream, ranges, maxGap, maxSize):
+            data = memoryview(data)
+            for idx in indices:
+                idx = selected[idx]
+                chId = blocks.channels[idx]
+                rel = offsets[idx] - start
+                if rel + sizes[idx] > len(data):
+                    raise IOError("Unexpected end of file reading block at offset %d"
+                                  % offsets[idx])
+                pos = positions[chId]
+                views[chId][pos:pos + sizes[idx]] = data[rel:rel + sizes[idx]]
+                positions[chId] = pos + sizes[idx]
+
+        results = {}
+        for chId, buf in buffers.items():
+            dtype = dtypes[chId]
+            count, remainder = divmod(len(buf), dtype.itemsize)
+            if remainder:
+                warnings.warn("Channel %r data size (%d) is not a multiple of its sample "
+                              "size (%d); ignoring the last %d bytes"
+                              % (chId, len(buf), dtype.itemsize, remainder))
+            results[chId] = numpy.frombuffer(buf, dtype=dtype, count=count)
+
+        return results
+
+    finally:
+        if doc is not source:
+            doc.close()
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def _parseNumber(value: Union[str, int, float]) -> float:
+    """ Parse a numeric string element value, which may be an integer, a
+        decimal, or a ratio (e.g., ``'1/32768'``). Raises `ValueError` if
+        the value is not valid.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    num, _, den = value.partition('/')
+    if den:
+        return float(num) / float(den)
+    return float(num)
+
+
+def unwrapTimes(times: Iterable[int], modulus: int) -> "numpy.ndarray":
+    """ Remove the rollovers from a sequence of modulo timecodes. Each
+        decrease from one timecode to the next is taken to be a rollover;
+        timecodes are assumed to be less than one modulus apart. Requires
+        NumPy.
+
+        :param times: The timecodes, in order.
+        :param modulus: The modulus at which the timecodes roll over.
+        :return: The unwrapped timecodes, as a 64 bit integer array.
+    """
+    import numpy
+
+    times = numpy.asarray(times, dtype=numpy.int64)
+    if len(times) < 2:
+        return times.copy()
+    rollovers = numpy.zeros(len(times), dtype=numpy.int64)
+    numpy.cumsum(numpy.diff(times) < 0, out=rollovers[1:])
+    return times + rollovers * modulus
+
+
+def blockTimes(blocks: DataBlocks,
+               channel: Dict[str, Any]) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+    """ Get the start and end times of a channel's data blocks. Modulo
+        timecodes are unwrapped (see `unwrapTimes()`), and the times are
+        scaled by the channel's ``TimeCodeScale``. Requires NumPy.
+
+        :param blocks: The file's data blocks, from `scanBlocks()`.
+        :param channel: The channel's description (see `getChannels()`).
+        :return: Two arrays of times, in seconds, for the channel's blocks
+            in file order: the time of each block's first sample, and of
+            its last sample (NaN if the block has no such timecode).
+    """
+    import numpy
+
+    scale = _parseNumber(channel.get('TimeCodeScale', DEFAULT_TIMECODE_SCALE))
+    moduli = {TIME_MOD: channel.get('TimeCodeModulus', DEFAULT_TIMECODE_MODULUS),
+              TIME_SIMPLE: SIMPLE_TIMECODE_MODULUS}
+
+    selected = numpy.asarray(blocks.channels) == channel.get('ChannelID')
+    starts = numpy.asarray(blocks.starts)[selected]
+    ends = numpy.asarray(blocks.ends)[selected]
+    timeTypes = numpy.asarray(blocks.timeTypes)[selected]
+
+    startTicks = numpy.where(starts < 0, numpy.nan, starts.astype(numpy.float64))
+    endTicks = numpy.where(ends < 0, numpy.nan, ends.astype(numpy.float64))
+
+    for timeType, modulus in moduli.items():
+        isType = timeTypes == timeType
+        if not isType.any():
+            continue
+        unwrapped = unwrapTimes(starts[isType], modulus)
+        startTicks[isType] = unwrapped
+        # The end is at most one rollover after the start
+        typeEnds = ends[isType]
+        endTicks[isType] = numpy.where(typeEnds < 0, numpy.nan,
+                                       unwrapped + (typeEnds - starts[isType]) % modulus)
+
+    return startTicks * scale, endTicks * scale
+
+
+def sampleTimes(source: Union[str, Path, BinaryIO, core.Document],
+                channels: Optional[Iterable[int]] = None,
+                blocks: Optional[DataBlocks] = None) -> Dict[int, "numpy.ndarray"]:
+    """ Get the time of each sample of an IDE file's channels, matching the
+        arrays from `readChannelData()`. Each block's samples are spaced
+        evenly between its start and end times (see `blockTimes()`). For a
+        block without an end time, the next block's start is used as the
+        time following its last sample, or, for a channel's last block, the
+        previous block's sample spacing. Requires NumPy.
+
+        :param source: The IDE file: a filename, a stream, or a loaded
+            `Document`.
+        :param channels: The IDs of the channels, or `None` for all
+            channels with a ``ChannelFormat``.
+        :param blocks: The file's data blocks, if already found by
+            `scanBlocks()`.
+        :return: A dictionary of arrays of times, in seconds, keyed by
+            channel ID.
+    """
+    import numpy
+
+    doc = _getDocument(source)
+    try:
+        info = getChannels(doc)
+        if channels is None:
+            channels = [chId for chId, ch in info.items() if ch.get('ChannelFormat')]
+        if blocks is None:
+            blocks = scanBlocks(doc)
+
+        allSizes = numpy.asarray(blocks.sizes)
+        allChannels = numpy.asarray(blocks.channels)
+
+        results = {}
+        for chId in channels:
+            if chId not in info:
+                raise KeyError("Channel %r not in ChannelList" % chId)
+            itemsize = channelDtype(info[chId]).itemsize
+            starts, ends = blockTimes(blocks, info[chId])
+            counts = allSizes[allChannels == chId] // itemsize
+
+            # The time between samples in each block
+            periods = numpy.zeros(len(counts))
+            known = ~numpy.isnan(ends) & (counts > 1)
+            periods[known] = (ends[known] - starts[known]) / (counts[known] - 1)
+
+            missing = numpy.isnan(ends) & (counts > 0)
+            nextStarts = numpy.append(starts[1:], numpy.nan)
+            fromNext = missing & ~numpy.isnan(nextStarts)
+            periods[fromNext] = (nextStarts[fromNext] - starts[fromNext]) / counts[fromNext]
+            if len(periods) > 1 and missing[-1]:
+                periods[-1] = periods[-2]
+
+            # Each sample's index within its block
+            firsts = numpy.cumsum(counts) - counts
+            indices = numpy.arange(counts.sum()) - numpy.repeat(firsts, counts)
+            results[chId] = (numpy.repeat(starts, counts)
+                             + indices * numpy.repeat(periods, counts))
+
+        return results
+
+    finally:
+        if doc is not source:
+            doc.close()
@@ -0,0 +1,1068 @@
+"""
+Helpers for Matroska (and WebM) files, built on the bundled ``matroska.xml``
+schema: a time index of a segment's clusters (using the segment's ``Cues``
+when present), allowing a time to be found without reading every cluster,
+and the decoding of blocks and their (possibly laced) frames.
+
+Times are in the segment's timecode units (i.e., multiples of the segment's
+``TimecodeScale``, in nanoseconds; by default, milliseconds), like the
+timecodes in the file itself. Offsets are absolute positions in the file.
+"""
+__author__ = "David Randall Stokes, Connor Flanigan"
+__copyright__ = "Copyright 2022, Mide Technology Corporation"
+__credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt"
+
+__all__ = ['BlockHeaders', 'ClusterIndex', 'cut', 'demux', 'iterFrames',
+           'parseBlockHeader', 'splitLaces']
+
+from array import array
+from bisect import bisect_right
+import os.path
+from pathlib import Path
+import struct
+import sys
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from . import core, encoding
+from .decoding import _iterRaw, decodeIntLength, readElementID, readElementSize
+from .util import READ_MAX_GAP, READ_MAX_SIZE, _copyRange, _iterReads
+
+# ==============================================================================
+#
+# ==============================================================================
+
+# The name of the schema used for files opened by name.
+SCHEMA = 'matroska.xml'
+
+# The default `TimecodeScale`, in nanoseconds.
+DEFAULT_TIMECODE_SCALE = 1000000
+
+# IDs of the elements in a Cluster, used when reading clusters directly
+# (the bundled schema doesn't define the children of `BlockGroup`).
+TIMECODE_ID = 0xE7
+SIMPLEBLOCK_ID = 0xA3
+BLOCKGROUP_ID = 0xA0
+BLOCK_ID = 0xA1
+REFERENCEBLOCK_ID = 0xFB
+
+# Block header flags. Note: `FLAG_KEYFRAME` is only defined for SimpleBlock;
+# see `BlockHeaders`.
+FLAG_KEYFRAME = 0x80
+FLAG_INVISIBLE = 0x08
+FLAG_LACING = 0x06
+FLAG_DISCARDABLE = 0x01
+
+# The amount of data read at a time when reading the contents of a Cluster
+# directly. Larger values mean fewer reads, but more data read needlessly
+# when blocks are large (e.g., video).
+READ_WINDOW = 4096
+
+# The top-level elements copied by `cut()` (if present), in the order in
+# which they are written.
+CUT_ELEMENTS = ('Info', 'Tracks', 'Chapters', 'Attachments', 'Tags')
+
+
+def _getDocument(source: Union[str, Path, BinaryIO, core.Document]) -> core.Document:
+    """ Helper function to get a `Document` from a filename, stream, or
+        an existing `Document`.
+    """
+    if isinstance(source, core.Document):
+        return source
+    return core.loadSchema(SCHEMA).load(source)
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+class BlockHeaders(object):
+    """ The decoded headers of the ``SimpleBlock`` and ``Block`` elements in
+        a set of clusters, as arrays (see the standard `array` module), in the
+        order in which they appear in the file. Created by
+        `ClusterIndex.readBlockHeaders()`.
+
+        The arrays can be converted to NumPy arrays without copying, e.g.
+        ``numpy.frombuffer(headers.times, dtype=numpy.int64)``.
+
+        :ivar offsets: The offset of each block element.
+        :ivar dataOffsets: The offset of each block's data (i.e., the start
+            of its payload after the block header, including the lacing
+            header, if any).
+        :ivar dataSizes: The size of each block's data.
+        :ivar tracks: The track number of each block.
+        :ivar times: The absolute timecode of each block: its cluster's
+            timecode plus the block's relative timecode.
+        :ivar flags: Each block's header flags. Keyframes in a ``BlockGroup``
+            (i.e., without a ``ReferenceBlock``) are also given the
+            SimpleBlock keyframe flag (0x80).
+        :ivar clusters: The offset of each block's ``Cluster``.
+    """
+
+    def __init__(self):
+        self.offsets = array('q')
+        self.dataOffsets = array('q')
+        self.dataSizes = array('q')
+        self.tracks = array('L')
+        self.times = array('q')
+        self.flags = array('B')
+        self.clusters = array('q')
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __repr__(self) -> str:
+        return "<%s: %d blocks>" % (self.__class__.__name__, len(self))
+
+    @property
+    def keyframes(self) -> array:
+        """ An array of the keyframe flag of each block (1 or 0). """
+        return array('B', bytes(self.flags).translate(_KEYFRAME_TABLE))
+
+    @property
+    def lacing(self) -> array:
+        """ An array of the lacing type of each block: 0 (none), 1 (Xiph),
+            2 (fixed size), or 3 (EBML).
+        """
+        return array('B', bytes(self.flags).translate(_LACING_TABLE))
+
+    def _addCluster(self, stream: BinaryIO, cluster: int, start: int, end: int,
+                    tracks: Optional[Iterable[int]] = None):
+        """ Read the headers of the blocks in a Cluster.
+
+            :param stream: The stream from which to read.
+            :param cluster: The offset of the Cluster element.
+            :param start: The offset of the Cluster's payload.
+            :param end: The end of the Cluster's payload.
+            :param tracks: The track numbers of the blocks to keep, or `None`
+                to keep all.
+        """
+        clusterTime = 0
+        offsets = []
+        dataOffsets = []
+        dataSizes = []
+
+        # The first 4 bytes of each block header (i.e., all of it, if the
+        # track number is 1 byte, which is nearly always the case), decoded
+        # all at once after reading the cluster.
+        heads = bytearray()
+
+        # Blocks that can't be decoded from `heads`: index -> (track,
+        # relative timecode, flags), and the keyframe status of Blocks in
+        # BlockGroups: index -> keyframe
+        longTracks = {}
+        keyframes = {}
+
+        blocks = _iterRaw(stream, start, end, READ_WINDOW)
+        for eid, offset, payloadOffset, size, buf, rel in blocks:
+            if eid == BLOCKGROUP_ID:
+                block = None
+                keyframe = True
+                for child in _iterRaw(stream, payloadOffset, payloadOffset + size, READ_WINDOW):
+                    if child[0] == BLOCK_ID:
+                        block = child
+                    elif child[0] == REFERENCEBLOCK_ID:
+                        keyframe = False
+                if block is None:
+                    continue
+                _eid, offset, payloadOffset, size, buf, rel = block
+                keyframes[len(offsets)] = keyframe
+            elif eid == TIMECODE_ID:
+                clusterTime = int.from_bytes(buf[rel:rel + size], 'big')
+                continue
+            elif eid != SIMPLEBLOCK_ID:
+                continue
+
+            head = buf[rel:rel + 4]
+            headerSize = 4
+            if not head[0] & 0x80:
+                track, timecode, fl, headerSize = parseBlockHeader(buf[rel:rel + 12])
+                longTracks[len(offsets)] = (track, timecode, fl)
+            offsets.append(offset)
+            dataOffsets.append(payloadOffset + headerSize)
+            dataSizes.append(size - headerSize)
+            heads.extend(head)
+
+        # Decode the headers: track number (1 byte, with the EBML length
+        # marker), relative timecode (signed 16b big-endian), and flags.
+        blockTracks = array('L', list(bytes(heads[0::4]).translate(_TRACK_TABLE)))
+        timecodes = bytearray(len(offsets) * 2)
+        timecodes[0::2] = heads[1::4]
+        timecodes[1::2] = heads[2::4]
+        timecodes = array('h', timecodes)
+        if sys.byteorder == 'little':
+            timecodes.byteswap()
+        flags = array('B', heads[3::4])
+
+        for idx, (track, tc, fl) in longTracks.items():
+            blockTracks[idx] = track
+            timecodes[idx] = tc
+            flags[idx] = fl
+        for idx, keyframe in keyframes.items():
+            flags[idx] = (flags[idx] | FLAG_KEYFRAME) if keyframe else (flags[idx] & ~FLAG_KEYFRAME)
+
+        times = [clusterTime + tc for tc in timecodes]
+
+        if tracks is not None:
+            keep = [i for i, track in enumerate(blockTracks) if track in tracks]
+            if len(keep) < len(offsets):
+                offsets = [offsets[i] for i in keep]
+                dataOffsets = [dataOffsets[i] for i in keep]
+                dataSizes = [dataSizes[i] for i in keep]
+                blockTracks = [blockTracks[i] for i in keep]
+                times = [times[i] for i in keep]
+                flags = [flags[i] for i in keep]
+
+        self.offsets.extend(offsets)
+        self.dataOffsets.extend(dataOffsets)
+        self.dataSizes.extend(dataSizes)
+        self.tracks.extend(blockTracks)
+        self.times.extend(times)
+        self.flags.extend(flags)
+        self.clusters.extend([cluster] * len(offsets))
+
+
+# Struct for decoding a block header's timecode and flags
+_BLOCK_TIMECODE = struct.Struct('>hB')
+
+# Translation tables for getting values from block flags in bulk
+_KEYFRAME_TABLE = bytes((b & FLAG_KEYFRAME) >> 7 for b in range(256))
+_LACING_TABLE = bytes((b & FLAG_LACING) >> 1 for b in range(256))
+_TRACK_TABLE = bytes(b & 0x7F for b in range(256))
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def parseBlockHeader(data: Union[bytes, memoryview]) -> Tuple[int, int, int, int]:
+    """ Decode the header of a ``SimpleBlock`` or ``Block`` element.
+
+        :param data: The block element's payload (or at least its start).
+        :return: The block's track number, relative timecode, flags, and
+            the size of the header (i.e., the offset of the lacing header or
+            frame data in the payload).
+    """
+    tracklen, track = decodeIntLength(data[0])
+    if tracklen > 1:
+        track = (track << (8 * (tracklen - 1))) + int.from_bytes(data[1:tracklen], 'big')
+    timecode, flags = _BLOCK_TIMECODE.unpack_from(data, tracklen)
+    return track, timecode, flags, tracklen + 3
+
+
+def _readLaceSize(data: memoryview, pos: int) -> Tuple[int, int]:
+    """ Read an EBML lace size (an EBML-encoded unsigned integer).
+
+        :return: The size and the position following it.
+    """
+    length, size = decodeIntLength(data[pos])
+    if length > 1:
+        size = (size << (8 * (length - 1))) + int.from_bytes(data[pos + 1:pos + length], 'big')
+    return size, pos + length
+
+
+def splitLaces(data: Union[bytes, memoryview], lacing: int) -> List[memoryview]:
+    """ Split the data of a block into frames, decoding its lacing header.
+        The frames are views of the data, not copies.
+
+        :param data: The block's data, following the block header (i.e.,
+            starting with the lacing header, if any).
+        :param lacing: The block's lacing type: 0 (none), 1 (Xiph), 2 (fixed
+            size), or 3 (EBML), i.e., ``(flags & FLAG_LACING) >> 1``.
+        :return: A list of `memoryview` objects, one per frame.
+    """
+    data = memoryview(data)
+    if not lacing:
+        return [data]
+
+    count = data[0] + 1
+    pos = 1
+    sizes = []
+
+    if lacing == 1:
+        # Xiph: each size (except the last) is a sum of bytes, ending with
+        # the first byte less than 255.
+        for _ in range(count - 1):
+            size = 0
+            while True:
+                b = data[pos]
+                pos += 1
+                size += b
+                if b != 255:
+                    break
+            sizes.append(size)
+
+    elif lacing == 2:
+        # Fixed size: all frames are the same size.
+        size, remainder = divmod(len(data) - pos, count)
+        if remainder:
+            raise ValueError("Block data size (%d) not divisible by frame count (%d)"
+                             % (len(data) - pos, count))
+        sizes = [size] * (count - 1)
+
+    elif lacing == 3:
+        # EBML: the first size is an unsigned EBML integer, the others the
+        # (signed) difference from the previous size.
+        size, pos = _readLaceSize(data, pos)
+        sizes.append(size)
+        for _ in range(count - 2):
+            length = pos
+            diff, pos = _readLaceSize(data, pos)
+            length = pos - length
+            size += diff - (2 ** (7 * length - 1) - 1)
+            sizes.append(size)
+
+    else:
+        raise ValueError("Invalid lacing type: %r" % lacing)
+
+    frames = []
+    for size in sizes:
+        if size < 0 or pos + size > len(data):
+            raise ValueError("Laced frame size exceeds block size")
+        frames.append(data[pos:pos + size])
+        pos += size
+    frames.append(data[pos:])
+    return frames
+
+
+def iterFrames(clusters: Iterable[core.Element],
+               tracks: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, int, bool, memoryview]]:
+    """ Iterate over the frames in a set of ``Cluster`` elements, splitting
+        laced blocks into their individual frames.
+
+        :param clusters: The ``Cluster`` elements, e.g., a ``Segment`` or
+            the results of `ClusterIndex.clustersBetween()`. Other elements
+            are ignored.
+        :param tracks: The numbers of the tracks to include, or `None` to
+            include all.
+        :return: A generator yielding tuples containing each frame's track
+            number, absolute timecode, keyframe status, and data (as a
+            `memoryview`). All the frames in a laced block have the block's
+            timecode.
+    """
+    if tracks is not None:
+        tracks = frozenset(tracks)
+
+    for cluster in clusters:
+        if cluster.name != 'Cluster':
+            continue
+
+        clusterTime = 0
+        for el in cluster:
+            if el.id == TIMECODE_ID:
+                clusterTime = el.value
+                continue
+            elif el.id == SIMPLEBLOCK_ID:
+                raw = el.getRawValue()
+                keyframe = None
+            elif el.id == BLOCKGROUP_ID:
+                raw = None
+                keyframe = True
+                for child in el:
+                    if child.id == BLOCK_ID:
+                        raw = child.getRawValue()
+                    elif child.id == REFERENCEBLOCK_ID:
+                        keyframe = False
+                if raw is None:
+                    continue
+            else:
+                continue
+
+            track, timecode, flags, headerSize = parseBlockHeader(raw)
+            if tracks is not None and track not in tracks:
+                continue
+            if keyframe is None:
+                keyframe = bool(flags & FLAG_KEYFRAME)
+
+            time = clusterTime + timecode
+            for frame in splitLaces(memoryview(raw)[headerSize:], (flags & FLAG_LACING) >> 1):
+                yield track, time, keyframe, frame
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+class ClusterIndex(object):
+    """ A time index of the clusters in a Matroska segment. The times and
+        offsets of clusters are read from the segment's ``Cues`` (located via
+        its ``SeekHead``, if any); if the segment has no ``Cues``, each
+        cluster's header and timecode is read instead.
+
+        Since ``Cues`` often only refer to some of the clusters (e.g., those
+        starting with a video keyframe), finding the cluster containing a time
+        starts at the last indexed cluster at or before the time, reading the
+        clusters following it.
+
+        :ivar doc: The indexed `Document`.
+        :ivar segment: The indexed ``Segment`` element.
+        :ivar segmentOffset: The offset of the ``Segment`` payload, to which
+            the positions in ``SeekHead`` and ``Cues`` are relative.
+        :ivar segmentEnd: The end of the ``Segment``, or of the file if the
+            ``Segment`` has an unknown size.
+        :ivar positions: The offsets of the top-level elements (other than
+            ``Cluster``) found in ``SeekHead`` or before the first cluster,
+            keyed by element name. Only the first of each is included.
+        :ivar firstCluster: The offset of the first ``Cluster``, or `None`.
+        :ivar timecodeScale: The segment's ``TimecodeScale``, in nanoseconds.
+        :ivar duration: The segment's ``Duration`` (in timecode units), or
+            `None` if not specified.
+        :ivar times: The sorted times of the indexed clusters.
+        :ivar offsets: The offsets of the indexed clusters, corresponding to
+            `times`.
+        :ivar source: The source of the index, either ``'cues'`` or
+            ``'clusters'``.
+    """
+
+    def __init__(self,
+                 source: Union[str, Path, BinaryIO, core.Document],
+                 useCues: bool = True):
+        """ Constructor.
+
+            :param source: A Matroska `Document`, or the name of (or a stream
+                containing) a Matroska file. Only the first ``Segment`` is
+                indexed.
+            :param useCues: If `False`, don't use the segment's ``Cues``;
+                always index the segment by reading every ``Cluster``.
+        """
+        self.doc = _getDocument(source)
+        self._ownsDoc = self.doc is not source
+        self.schema = self.doc.schema
+
+        self.segment = self._findSegment()
+        if self.segment is None:
+            self.close()
+            raise ValueError("No Segment element found in %s" % (self.doc.filename or self.doc))
+
+        self.segmentOffset = self.segment.payloadOffset
+        self.segmentEnd = self._getFileEnd()
+        if hasattr(self.segment, '_size'):
+            # Don't use `size`; for an 'infinite' Segment, it reads the file.
+            self.segmentEnd = min(self.segmentEnd, self.segmentOffset + self.segment._size)
+
+        self.positions = {}
+        self.firstCluster = None
+        self._readPositions()
+
+        self.timecodeScale = DEFAULT_TIMECODE_SCALE
+        self.duration = None
+        info = self.getElement('Info')
+        if info is not None:
+            for el in info:
+                if el.name == 'TimecodeScale':
+                    self.timecodeScale = el.value
+                elif el.name == 'Duration':
+                    self.duration = el.value
+
+        self.times = []
+        self.offsets = []
+        self.source = None
+        if useCues:
+            self._readCues()
+        if not self.times:
+            self._scanClusters()
+
+    def __repr__(self) -> str:
+        return "<%s %r, %d clusters from %s>" % (self.__class__.__name__,
+                                                  self.doc.name, len(self.times),
+                                                  self.source)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Close the document, if it was opened by the `ClusterIndex`. """
+        if self._ownsDoc:
+            self.doc.close()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    # ==========================================================================
+    # Reading the segment
+    # ==========================================================================
+
+    def _getFileEnd(self) -> int:
+        """ Get the size of the document's stream. """
+        if self.doc.size is not None:
+            return self.doc.size
+        stream = self.doc.stream
+        pos = stream.tell()
+        end = stream.seek(0, os.SEEK_END)
+        stream.seek(pos)
+        return end
+
+    def _findSegment(self) -> Optional[core.MasterElement]:
+        """ Find the first ``Segment`` element. The root elements' headers
+            are read directly, rather than by iterating over the document,
+            so the size of an 'infinite' Segment isn't calculated (which
+            would read the whole file).
+        """
+        segmentType = self.schema['Segment']
+        stream = self.doc.stream
+        pos = self.doc.offset
+        while True:
+            stream.seek(pos)
+            try:
+                eid, idlen = readElementID(stream)
+                esize, sizelen = readElementSize(stream)
+            except (IOError, TypeError):
+                return None
+            payloadOffset = pos + idlen + sizelen
+            if eid == segmentType.id:
+                return segmentType(stream, pos, esize, payloadOffset)
+            elif esize is None:
+                return None
+            pos = payloadOffset + esize
+
+    def parseElementAt(self, offset: int) -> Optional[core.Element]:
+        """ Parse the element at a given offset in the segment.
+
+            :param offset: The element's absolute offset in the file.
+            :return: The element, or `None` if there is no element at the
+                offset (i.e., it is past the end of the segment).
+        """
+        if offset >= self.segmentEnd:
+            return None
+        stream = self.doc.stream
+        stream.seek(offset)
+        try:
+            return self.segment.parseElement(stream, nocache=True)[0]
+        except TypeError as err:
+            # Occurs at end of file
+            if "ord()" not in str(err):
+                raise
+            return None
+
+    def iterElements(self, offset: Optional[int] = None) -> Iterator[core.Element]:
+        """ Iterate over the segment's top-level elements, starting at a
+            given offset. Unlike iterating over the ``Segment`` itself, this
+            works with an 'infinite' (unknown size) ``Segment`` without first
+            reading to its end.
+
+            :param offset: The absolute offset of the first element to read.
+                Defaults to the start of the ``Segment``'s payload.
+        """
+        pos = self.segmentOffset if offset is None else offset
+        infinite = not hasattr(self.segment, '_size')
+        while True:
+            el = self.parseElementAt(pos)
+            if el is None:
+                break
+            if infinite and not self.segment._isValidChild(el.id):
+                break
+            yield el
+            pos = el.payloadOffset + el.size
+
+    def iterClusters(self, offset: Optional[int] = None) -> Iterator[core.MasterElement]:
+        """ Iterate over the segment's ``Cluster`` elements, starting at a
+            given offset.
+
+            :param offset: The absolute offset from which to start. Defaults
+                to the first ``Cluster``.
+        """
+        offset = self.firstCluster if offset is None else offset
+        if offset is None:
+            return
+        for el in self.iterElements(offset):
+            if el.name == 'Cluster':
+                yield el
+
+    @staticmethod
+    def clusterTime(cluster: core.MasterElement) -> int:
+        """ Get the timecode of a ``Cluster`` element (from its ``Timecode``
+            child element, normally its first).
+        """
+        for el in cluster:
+            if el.name == 'Timecode':
+                return el.value
+        raise ValueError("%r has no Timecode" % cluster)
+
+    def getElement(self, name: str) -> Optional[core.Element]:
+        """ Get one of the segment's top-level elements (other than
+            ``Cluster``) by name, without reading the whole segment. Only
+            elements listed in the segment's ``SeekHead`` or appearing before
+            the first ``Cluster`` can be found.
+
+            :param name: The name of the element (e.g., ``'Tracks'``).
+            :return: The element, or `None` if not found.
+        """
+        offset = self.positions.get(name)
+        if offset is None:
+            return None
+        el = self.parseElementAt(offset)
+        if el is None or el.name != name:
+            return None
+        return el
+
+    def _readSeekHead(self, seekHead: core.MasterElement,
+                      positions: Dict[str, int]):
+        """ Read the positions of elements listed in a ``SeekHead``. """
+        for seek in seekHead:
+            if seek.name != 'Seek':
+                continue
+            seekId = seekPosition = None
+            for el in seek:
+                if el.name == 'SeekID':
+                    seekId = int.from_bytes(el.value, 'big')
+                elif el.name == 'SeekPosition':
+                    seekPosition = el.value
+            if seekId in self.schema.elements and seekPosition is not None:
+                name = self.schema.elements[seekId].name
+                positions.setdefault(name, self.segmentOffset + seekPosition)
+
+    def _readPositions(self):
+        """ Find the top-level elements before the first ``Cluster``, and
+            any listed in the ``SeekHead``.
+        """
+        seekHeads = []
+        for el in self.iterElements():
+            if el.name == 'Cluster':
+                self.firstCluster = el.offset
+                break
+            self.positions.setdefault(el.name, el.offset)
+            if el.name == 'SeekHead':
+                seekHeads.append(el)
+
+        positions = {}
+        for seekHead in seekHeads:
+            self._readSeekHead(seekHead, positions)
+
+        # A SeekHead may refer to another SeekHead (e.g., at the end).
+        offset = positions.get('SeekHead')
+        if offset is not None and offset != self.positions.get('SeekHead'):
+            el = self.parseElementAt(offset)
+            if el is not None and el.name == 'SeekHead':
+                self._readSeekHead(el, positions)
+
+        for name, offset in positions.items():
+            self.positions.setdefault(name, offset)
+
+        if self.firstCluster is None and 'Cluster' in self.positions:
+            self.firstCluster = self.positions['Cluster']
+        self.positions.pop('Cluster', None)
+
+    # ==========================================================================
+    # Building the index
+    # ==========================================================================
+
+    def _readCues(self):
+        """ Build the index from the segment's ``Cues``. """
+        cues = self.getElement('Cues')
+        if cues is None:
+            return
+
+        clusters = {}
+        for cuePoint in cues:
+            if cuePoint.name != 'CuePoint':
+                continue
+            cueTime = None
+            positions = []
+            for el in cuePoint:
+                if el.name == 'CueTime':
+                    cueTime = el.value
+                elif el.name == 'CueTrackPositions':
+                    for pos in el:
+                        if pos.name == 'CueClusterPosition':
+                            positions.append(self.segmentOffset + pos.value)
+            if cueTime is None:
+                continue
+            for offset in positions:
+                if offset < self.segmentEnd:
+                    clusters[offset] = min(cueTime, clusters.get(offset, cueTime))
+
+        if clusters:
+            entries = sorted((t, offset) for offset, t in clusters.items())
+            self.times = [t for t, _offset in entries]
+            self.offsets = [offset for _t, offset in entries]
+            self.source = 'cues'
+
+    def _scanClusters(self):
+        """ Build the index by reading every ``Cluster``. """
+        self.times = []
+        self.offsets = []
+        for cluster in self.iterClusters():
+            self.times.append(self.clusterTime(cluster))
+            self.offsets.append(cluster.offset)
+        self.source = 'clusters'
+
+    # ==========================================================================
+    # Seeking
+    # ==========================================================================
+
+    def _startOffset(self, time: int) -> Optional[int]:
+        """ Get the offset of the last indexed cluster at or before a time
+            (or the first cluster, if the time precedes it).
+        """
+        idx = bisect_right(self.times, time) - 1
+        if idx < 0:
+            return self.firstCluster
+        return self.offsets[idx]
+
+    def seek(self, time: int) -> Optional[core.MasterElement]:
+        """ Find the ``Cluster`` containing a time, i.e., the last cluster
+            starting at or before it.
+
+            :param time: The time, in the segment's timecode units.
+            :return: The ``Cluster`` element, or `None` if the segment has
+                no clusters. If the time precedes the first cluster, the first
+                cluster is returned.
+        """
+        result = None
+        for cluster in self.iterClusters(self._startOffset(time)):
+            if result is not None and self.clusterTime(cluster) > time:
+                break
+            result = cluster
+        return result
+
+    def clustersBetween(self, start: int, end: int) -> Iterator[core.MasterElement]:
+        """ Iterate over the ``Cluster`` elements overlapping a time range:
+            the cluster containing the start time, and all clusters starting
+            before the end time.
+
+            :param start: The start of the time range, in the segment's
+                timecode units.
+            :param end: The end of the time range, in the segment's timecode
+                units.
+        """
+        # The last cluster starting at or before `start`, which contains it.
+        containing = None
+        for cluster in self.iterClusters(self._startOffset(start)):
+            time = self.clusterTime(cluster)
+            if time <= start:
+                containing = cluster
+                continue
+            if containing is not None:
+                yield containing
+                containing = None
+            if time > end:
+                break
+            yield cluster
+
+        if containing is not None:
+            yield containing
+
+    # ==========================================================================
+    # Blocks
+    # ==========================================================================
+
+    def _clustersOverlapping(self,
+                             start: Optional[int] = None,
+                             end: Optional[int] = None) -> Iterator[core.MasterElement]:
+        """ Iterate over the clusters overlapping a time range, either end
+            of which may be `None` (unbounded).
+        """
+        if start is None and end is None:
+            return self.iterClusters()
+        return self.clustersBetween(float('-inf') if start is None else start,
+                                    float('inf') if end is None else end)
+
+    def readBlockHeaders(self,
+                         start: Optional[int] = None,
+                         end: Optional[int] = None,
+                         tracks: Optional[Iterable[int]] = None) -> BlockHeaders:
+        """ Read and decode the headers of all ``SimpleBlock`` and ``Block``
+            elements in a range of clusters. The clusters' contents are read
+            directly, without creating `Element` objects.
+
+            :param start: The start of the time range, in the segment's
+                timecode units. `None` starts at the first cluster.
+            :param end: The end of the time range, in the segment's timecode
+                units. `None` continues to the last cluster.
+            :param tracks: The numbers of the tracks to include, or `None`
+                to include all.
+            :return: A `BlockHeaders` containing all the blocks in the
+                clusters overlapping the time range (including blocks outside
+                of it).
+        """
+        if tracks is not None:
+            tracks = frozenset(tracks)
+
+        headers = BlockHeaders()
+        stream = self.doc.stream
+        for cluster in self._clustersOverlapping(start, end):
+            headers._addCluster(stream, cluster.offset, cluster.payloadOffset,
+                                cluster.payloadOffset + cluster.size, tracks)
+        return headers
+
+    def iterFrames(self,
+                   start: Optional[int] = None,
+                   end: Optional[int] = None,
+                   tracks: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, int, bool, memoryview]]:
+        """ Iterate over the frames in a range of clusters, splitting laced
+            blocks into their individual frames. See `iterFrames()`.
+
+            :param start: The start of the time range, in the segment's
+                timecode units. `None` starts at the first cluster.
+            :param end: The end of the time range, in the segment's timecode
+                units. `None` continues to the last cluster.
+            :param tracks: The numbers of the tracks to include, or `None`
+                to include all.
+            :return: A generator yielding tuples containing each frame's
+                track number, absolute timecode, keyframe status, and data
+                (as a `memoryview`), for all the frames in the clusters
+                overlapping the time range (including frames outside of it).
+        """
+        return iterFrames(self._clustersOverlapping(start, end), tracks)
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def _copyFrames(stream: BinaryIO,
+                out: BinaryIO,
+                headers: BlockHeaders,
+                maxGap: int = READ_MAX_GAP,
+                maxSize: int = READ_MAX_SIZE) -> int:
+    """ Write the frames of a set of blocks to a stream, reading the data of
+        blocks that are close together at once (see `util.readRanges()`).
+
+        :return: The number of bytes written.
+    """
+    offsets = headers.dataOffsets
+    sizes = headers.dataSizes
+    lacing = headers.lacing
+    written = 0
+
+    ranges = list(zip(offsets, sizes))
+    for start, data, indices in _iterReads(stream, ranges, maxGap, maxSize):
+        data = memoryview(data)
+        for idx in indices:
+            rel = offsets[idx] - start
+            if rel + sizes[idx] > len(data):
+                raise IOError("Unexpected end of file reading block at offset %d"
+                              % offsets[idx])
+            block = data[rel:rel + sizes[idx]]
+            if lacing[idx]:
+                for frame in splitLaces(block, lacing[idx]):
+                    out.write(frame)
+                    written += len(frame)
+            else:
+                out.write(block)
+                written += len(block)
+
+    return written
+
+
+def demux(source: Union[str, Path, BinaryIO, core.Document],
+          track: int,
+          out: Union[str, Path, BinaryIO],
+          start: Optional[int] = None,
+          end: Optional[int] = None,
+          maxGap: int = READ_MAX_GAP,
+          maxSize: int = READ_MAX_SIZE) -> int:
+    """ Extract the frames of one track from a Matroska file, writing them
+        (without block or lacing headers) to a file. The locations of the
+        track's blocks are found with `ClusterIndex.readBlockHeaders()`, and
+        their data is read in large chunks.
+
+        :param source: The Matroska file: a filename, a stream, or a loaded
+            `Document`.
+        :param track: The number of the track to extract.
+        :param out: The filename or (binary) stream to which to write.
+        :param start: The start of the time range to extract, in the
+            segment's timecode units. `None` starts at the first cluster.
+        :param end: The end of the time range to extract, in the segment's
+            timecode units. `None` continues to the last cluster.
+        :param maxGap: The largest gap between two blocks that will be read
+            (and discarded) to combine them into one read.
+        :param maxSize: The largest read to make when combining blocks.
+            Larger blocks are still read in full.
+        :return: The number of bytes written.
+    """
+    index = ClusterIndex(source)
+    closeOut = False
+    try:
+        headers = index.readBlockHeaders(start, end, tracks=[track])
+        if isinstance(out, (str, Path)):
+            out = open(out, 'wb')
+            closeOut = True
+        return _copyFrames(index.doc.stream, out, headers, maxGap, maxSize)
+    finally:
+        index.close()
+        if closeOut:
+            out.close()
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def _encodeElement(eid: int, payload: bytes) -> bytes:
+    """ Encode a (master) element from its already-encoded payload. """
+    return encoding.encodeId(eid) + encoding.encodeSize(len(payload)) + payload
+
+
+def _encodeSeekHead(schema: core.Schema, positions: List[Tuple[int, int]]) -> bytes:
+    """ Encode a ``SeekHead``. Positions are always written with 8 bytes, so
+        the size of the ``SeekHead`` doesn't depend on them.
+
+        :param schema: The Matroska schema.
+        :param positions: A list of (element ID, position) tuples.
+    """
+    seeks = bytearray()
+    for eid, pos in positions:
+        seeks.extend(_encodeElement(schema['Seek'].id,
+                                    schema['SeekID'].encode(encoding.encodeId(eid))
+                                    + schema['SeekPosition'].encode(pos, length=8)))
+    return _encodeElement(schema['SeekHead'].id, bytes(seeks))
+
+
+def _cutCues(index: ClusterIndex, clusters: Dict[int, Tuple[int, int]]) -> bytes:
+    """ Create the ``Cues`` for a cut segment. The original ``CuePoints``
+        referring to the copied clusters are used if there are any; otherwise,
+        there is a ``CuePoint`` for each cluster, for the first video track
+        (or the first track, if there is no video).
+
+        :param index: The `ClusterIndex` of the original segment.
+        :param clusters: The copied clusters' times and new positions
+            (relative to the new segment's payload), keyed by their
+            original offsets.
+        :return: The encoded ``Cues``, or an empty string if there are no
+            clusters.
+    """
+    if not clusters:
+        return b''
+
+    points = []
+    cues = index.getElement('Cues') if index.source == 'cues' else None
+    if cues is not None:
+        for cuePoint in cues:
+            if cuePoint.name != 'CuePoint':
+                continue
+            point = cuePoint.dump()
+            positions = []
+            for trackPos in point.get('CueTrackPositions', []):
+                offset = index.segmentOffset + trackPos.get('CueClusterPosition', -1)
+                if offset in clusters:
+                    # Positions of things other than the cluster itself (e.g.,
+                    # codec state) would need to be recalculated; drop them.
+                    trackPos.pop('CueCodecState', None)
+                    trackPos.pop('CueReference', None)
+                    trackPos['CueClusterPosition'] = clusters[offset][1]
+                    positions.append(trackPos)
+            if positions and 'CueTime' in point:
+                points.append({'CueTime': point['CueTime'], 'CueTrackPositions': positions})
+
+    if not points:
+        track = None
+        tracks = index.getElement('Tracks')
+        for entry in (tracks or ()):
+            if entry.name != 'TrackEntry':
+                continue
+            entry = entry.dump()
+            if track is None or entry.get('TrackType') == 1:
+                track = entry.get('TrackNumber', track)
+            if entry.get('TrackType') == 1:
+                break
+        for time, pos in sorted(clusters.values()):
+            points.append({'CueTime': time,
+                           'CueTrackPositions': {'CueTrack': track or 1,
+                                                 'CueClusterPosition': pos}})
+
+    return index.schema['Cues'].encode({'CuePoint': points})
+
+
+def cut(source: Union[str, Path, BinaryIO, core.Document],
+        out: Union[str, Path, BinaryIO],
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        chunkSize: int = READ_MAX_SIZE) -> int:
+    """ Copy the part of a Matroska file in a time range to a new file,
+        without decoding or re-encoding the clusters. The EBML header, the
+        segment's metadata (see `CUT_ELEMENTS`), and the clusters overlapping
+        the time range are copied as-is, and a new ``SeekHead`` and ``Cues``
+        are written for the new layout. Top-level ``Void`` elements are not
+        copied.
+
+        Because whole clusters are copied, the result may start before and end
+        after the time range. Timecodes are not changed, so the first cluster
+        will generally not start at 0, and the ``Info`` (including its
+        ``Duration``) is that of the original.
+
+        :param source: The Matroska file: a filename, a stream, or a loaded
+            `Document`. Only its first ``Segment`` is copied.
+        :param out: The filename or (binary) stream to which to write.
+        :param start: The start of the time range, in the segment's timecode
+            units. `None` starts at the first cluster.
+        :param end: The end of the time range, in the segment's timecode
+            units. `None` continues to the last cluster.
+        :param chunkSize: The size of each read when copying clusters, if
+            the data can't be copied by the OS (see `util._copyRange()`).
+        :return: The number of bytes written.
+    """
+    index = ClusterIndex(source)
+    closeOut = False
+    try:
+        schema = index.schema
+        stream = index.doc.stream
+
+        # Copied elements, as (ID, offset, total size)
+        elements = []
+        for name in CUT_ELEMENTS:
+            el = index.getElement(name)
+            if el is not None:
+                elements.append((el.id, el.offset, el.payloadOffset + el.size - el.offset))
+
+        # Original cluster offset -> (time, new position)
+        clusters = {}
+        clusterRanges = []
+        seekIds = [eid for eid, _offset, _size in elements]
+        cuesId = schema['Cues'].id
+
+        sourceClusters = list(index._clustersOverlapping(start, end))
+        if sourceClusters:
+            seekIds.append(cuesId)
+
+        # All sizes are known in advance, so the whole layout can be
+        # calculated before any clusters are copied.
+        pos = len(_encodeSeekHead(schema, [(eid, 0) for eid in seekIds]))
+        seekPositions = []
+        for eid, _offset, size in elements:
+            seekPositions.append((eid, pos))
+            pos += size
+        for cluster in sourceClusters:
+            size = cluster.payloadOffset + cluster.size - cluster.offset
+            clusters[cluster.offset] = (index.clusterTime(cluster), pos)
+            if clusterRanges and clusterRanges[-1][0] + clusterRanges[-1][1] == cluster.offset:
+                clusterRanges[-1][1] += size
+            else:
+                clusterRanges.append([cluster.offset, size])
+            pos += size
+
+        cues = _cutCues(index, clusters)
+        if cues:
+            seekPositions.append((cuesId, pos))
+            pos += len(cues)
+
+        header = index.segment.offset - index.doc.offset
+        segmentHeader = (encoding.encodeId(index.segment.id)
+                         + encoding.encodeSize(pos, 8))
+
+        if isinstance(out, (str, Path)):
+            out = open(out, 'wb')
+            closeOut = True
+
+        _copyRange(stream, out, index.doc.offset, header, chunkSize)
+        out.write(segmentHeader)
+        out.write(_encodeSeekHead(schema, seekPositions))
+        for _eid, offset, size in elements:
+            _copyRange(stream, out, offset, size, chunkSize)
+        for offset, size in clusterRanges:
+            _copyRange(stream, out, offset, size, chunkSize)
+        out.write(cues)
+
+        return header + len(segmentHeader) + pos
+
+    finally:
+        index.close()
+        if closeOut:
+            out.close()
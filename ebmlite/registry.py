@@ -0,0 +1,600 @@
+"""
+A registry of EBML schemata, indexed by the ``DocType`` and
+``DocTypeVersion`` defined in each schema's ``EBML`` header element. The
+registry allows EBML files to be opened without knowing their schema in
+advance; see `ebmlite.open()`.
+
+Finding the schemata requires parsing every schema XML file in the search
+path (`ebmlite.SCHEMA_PATH`). To avoid doing this in every process, the
+index is saved in `ebmlite.core.CACHE_PATH`; each file's entry is updated
+if the file's modification time or size changes.
+"""
+__author__ = "David Randall Stokes, Connor Flanigan"
+__copyright__ = "Copyright 2021, Mide Technology Corporation"
+__credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt"
+
+__all__ = ['SchemaRegistry', 'REGISTRY', 'open', 'probe', 'readHeader']
+
+import errno
+import io
+from io import BytesIO
+import marshal
+import os.path
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from . import core
+from .decoding import readElementID, readElementSize, readString, readUInt
+
+# ==============================================================================
+#
+# ==============================================================================
+
+# IDs of the standard EBML header element and its children used to identify
+# the document type.
+EBML_ID = 0x1A45DFA3
+DOCTYPE_ID = 0x4282
+DOCTYPEVERSION_ID = 0x4287
+DOCTYPEREADVERSION_ID = 0x4285
+
+# Header children read by `readHeader()`, keyed by ID.
+HEADER_ELEMENTS = {
+    DOCTYPE_ID: ('DocType', readString),
+    DOCTYPEVERSION_ID: ('DocTypeVersion', readUInt),
+    DOCTYPEREADVERSION_ID: ('DocTypeReadVersion', readUInt),
+}
+
+# The largest EBML header `readHeader()` will read. Real headers are tiny;
+# anything bigger isn't a valid header.
+MAX_HEADER_SIZE = 4096
+
+# The largest element `probe()` will read. Larger ones (e.g., a long index or
+# attached files) are skipped.
+PROBE_MAX_SIZE = 1024 * 1024
+
+# Structural elements not included in the results of `probe()`.
+PROBE_SKIP = ('Void', 'CRC-32', 'SeekHead')
+
+# Version of the index cache file format. Increment if it changes.
+_INDEX_FORMAT = 1
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def _readSchemaInfo(filename) -> Dict[str, Any]:
+    """ Helper function to get the information used to index a schema XML
+        file: the root XML element's tag (`rootTag`), the ``DocType`` and
+        ``DocTypeVersion`` defaults (`docType` and `version`), and the IDs of
+        the schema's root (i.e. top level) EBML elements (`roots`).
+
+        :param filename: The schema XML file, as a `Path` or `Traversable`.
+        :return: A dictionary of schema info. The values will be `None` if
+            the file could not be parsed.
+    """
+    from xml.etree import ElementTree as ET
+
+    info = {'rootTag': None, 'docType': None, 'version': None, 'roots': ()}
+
+    try:
+        with filename.open('rb') as f:
+            root = ET.parse(f).getroot()
+    except (ET.ParseError, IOError, TypeError):
+        return info
+
+    info['rootTag'] = root.tag
+
+    if root.tag == 'table':
+        # Old python-ebml schema: flat, with the structure defined by 'level'
+        roots = [el for el in root.findall('element') if el.get('level') == '0']
+    else:
+        roots = list(root)
+
+    try:
+        info['roots'] = tuple(int(el.get('id'), 16) for el in roots
+                              if el.get('id'))
+
+        for el in root.iter():
+            eid = int(el.get('id'), 16) if el.get('id') else None
+            if eid == DOCTYPE_ID and info['docType'] is None:
+                info['docType'] = el.get('default')
+            elif eid == DOCTYPEVERSION_ID and info['version'] is None:
+                info['version'] = int(el.get('default'))
+    except (TypeError, ValueError):
+        # Bad ID or version value. Not valid; ignore.
+        pass
+
+    return info
+
+
+def readHeader(stream: BinaryIO) -> Tuple[Dict[str, Any], Optional[int]]:
+    """ Read the values identifying the type of an EBML document from the
+        start of its ``EBML`` header element, without using a schema. The
+        stream is left at an arbitrary position.
+
+        :param stream: The file (or file-like stream), positioned at the start
+            of the EBML document.
+        :return: A dictionary of header values (``DocType``,
+            ``DocTypeVersion``, and/or ``DocTypeReadVersion``, if present),
+            and the ID of the first element after the header (or `None` if
+            the header is the last element, or if the stream does not start
+            with an ``EBML`` element).
+    """
+    header = {}
+
+    try:
+        eid, _ = readElementID(stream)
+        if eid != EBML_ID:
+            return header, None
+
+        size, _ = readElementSize(stream)
+        if size is None or size > MAX_HEADER_SIZE:
+            return header, None
+
+        data = stream.read(size)
+        headerStream = BytesIO(data)
+        while headerStream.tell() < len(data):
+            eid, _ = readElementID(headerStream)
+            size, _ = readElementSize(headerStream)
+            if eid in HEADER_ELEMENTS:
+                name, reader = HEADER_ELEMENTS[eid]
+                header[name] = reader(headerStream, size)
+            else:
+                headerStream.seek(size, 1)
+
+        return header, readElementID(stream)[0]
+
+    except (IOError, TypeError, ValueError):
+        # Bad or truncated data, or EOF (`ord()` of an empty string)
+        return header, None
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+class SchemaRegistry(object):
+    """ An index of EBML schemata, by the ``DocType`` and ``DocTypeVersion``
+        defaults in their ``EBML`` header elements.
+
+        The search path is scanned when the registry is first used, and the
+        results are kept. Call `refresh()` to rescan (e.g., if schema files
+        have been added to the search path).
+
+        :ivar aliases: A dictionary of alternate names for document types,
+            e.g. ``webm`` for ``matroska``. Keys are the alternate names,
+            values are the `DocType` of the schema to use.
+    """
+
+    def __init__(self,
+                 paths: Optional[List[Union[str, Path]]] = None,
+                 cache: bool = True):
+        """ Constructor.
+
+            :param paths: A list of paths to search for schemata. Defaults to
+                `ebmlite.SCHEMA_PATH` (as it is when the registry is used).
+            :param cache: If `True`, save the index in (and load it from)
+                `ebmlite.core.CACHE_PATH`.
+        """
+        self.paths = paths
+        self.cache = cache
+        self.aliases = {'webm': 'matroska'}
+
+        self._index = None     # Schema info from files, keyed by real path
+        self._entries = None   # (filename, info) from last scan
+        self._scannedPaths = None
+        self._registered = []  # (docType, version, schema) from `register()`
+
+    # ==========================================================================
+    # Index cache
+    # ==========================================================================
+
+    def _getIndexFile(self) -> Optional[str]:
+        """ Get the name of the index cache file, or `None` if caching is
+            disabled.
+        """
+        if not self.cache or not core.CACHE_PATH:
+            return None
+        return os.path.join(core.CACHE_PATH, 'schemata.index')
+
+    def _loadIndex(self) -> Dict[str, tuple]:
+        """ Load the index of schema info from the cache (if present). """
+        from . import __version__
+
+        indexFile = self._getIndexFile()
+        if indexFile:
+            try:
+                with io.open(indexFile, 'rb') as f:
+                    fmt, version, index = marshal.loads(f.read())
+                if fmt == _INDEX_FORMAT and version == __version__:
+                    return index
+            except (OSError, EOFError, ValueError, TypeError):
+                # Missing, unreadable, or invalid cache. Rebuild.
+                pass
+        return {}
+
+    def _saveIndex(self):
+        """ Write the index of schema info to the cache. Failure to write the
+            cache is not an error.
+        """
+        from . import __version__
+
+        indexFile = self._getIndexFile()
+        if not indexFile:
+            return
+
+        tempFile = "%s.%d.tmp" % (indexFile, os.getpid())
+        try:
+            os.makedirs(core.CACHE_PATH, exist_ok=True)
+            with io.open(tempFile, 'wb') as f:
+                marshal.dump((_INDEX_FORMAT, __version__, self._index), f)
+            os.replace(tempFile, indexFile)
+        except (OSError, ValueError):
+            try:
+                os.remove(tempFile)
+            except OSError:
+                pass
+
+    def _getInfo(self, filename) -> Tuple[Dict[str, Any], bool]:
+        """ Get the indexed information for a schema file, updating the
+            index if the file is new or has changed.
+
+            :param filename: The schema XML file, as a `Path` or `Traversable`.
+            :return: The schema info (see `_readSchemaInfo()`), and whether
+                or not the index was updated.
+        """
+        if not isinstance(filename, Path):
+            # Not a real file (e.g., a resource in a zipped module); its
+            # modification time can't be checked, so don't index it.
+            return _readSchemaInfo(filename), False
+
+        try:
+            key = os.path.realpath(filename)
+            stat = os.stat(key)
+        except OSError:
+            return _readSchemaInfo(filename), False
+
+        entry = self._index.get(key)
+        if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2], False
+
+        info = _readSchemaInfo(filename)
+        self._index[key] = (stat.st_size, stat.st_mtime_ns, info)
+        return info, True
+
+    # ==========================================================================
+    #
+    # ==========================================================================
+
+    def scan(self, paths: Optional[List[Union[str, Path]]] = None
+             ) -> Iterator[Tuple[Union[str, Path], Path, Dict[str, Any]]]:
+        """ Find all schema XML files in a set of paths, and get their info.
+
+            :param paths: A list of paths to search. Defaults to the
+                registry's `paths`, or `ebmlite.SCHEMA_PATH`.
+            :return: An iterator producing the path searched (as supplied),
+                the full schema filename (a `Path` or `Traversable`), and a
+                dictionary of schema info (`rootTag`, `docType`, `version`,
+                and `roots`, the IDs of root EBML elements) for each XML file.
+                Files that could not be parsed have a `rootTag` of `None`.
+        """
+        if self._index is None:
+            self._index = self._loadIndex()
+
+        paths = paths or self.paths or core.SCHEMA_PATH
+        modified = False
+
+        try:
+            for path in paths:
+                try:
+                    fullpath = core._expandSchemaPath(path)
+                except ModuleNotFoundError:
+                    continue
+
+                if not fullpath.is_dir():
+                    continue
+
+                for p in fullpath.iterdir():
+                    if p.name.lower().endswith('.xml'):
+                        info, updated = self._getInfo(p)
+                        modified = modified or updated
+                        yield path, p, info
+        finally:
+            if modified:
+                self._saveIndex()
+
+    def refresh(self):
+        """ Rescan the schema search path. """
+        paths = list(self.paths or core.SCHEMA_PATH)
+        self._entries = [(p, info) for _path, p, info in self.scan(paths)
+                         if info['rootTag'] in ('Schema', 'table')]
+        self._scannedPaths = paths
+
+    def register(self,
+                 docType: str,
+                 schema: Union[str, Path, core.Schema],
+                 version: Optional[int] = None):
+        """ Explicitly add a schema to the registry. Registered schemata take
+            precedence over those found in the search path.
+
+            :param docType: The ``DocType`` of documents using the schema.
+            :param schema: The schema, as either a `Schema` instance or a
+                schema filename (as used with `loadSchema()`).
+            :param version: The ``DocTypeVersion`` of the schema, if it
+                applies to only one version.
+        """
+        self._registered.insert(0, (docType, version, schema))
+
+    def find(self,
+             docType: str,
+             version: Optional[int] = None,
+             rootId: Optional[int] = None) -> Union[Path, core.Schema, None]:
+        """ Find the schema for a given document type.
+
+            If more than one schema has the same ``DocType`` (e.g., one used
+            for a sub-format), those with `rootId` as a root element are
+            preferred. Of those, schemata with a ``DocTypeVersion`` matching
+            `version` are preferred, otherwise the one with the highest
+            version is used. Remaining ties are broken by search path order.
+
+            :param docType: The document type (the ``DocType`` from the
+                document's ``EBML`` header).
+            :param version: The document type version (the
+                ``DocTypeVersion`` from the document's ``EBML`` header).
+            :param rootId: The ID of the first element following the
+                document's ``EBML`` header.
+            :return: A registered `Schema` or schema name, the filename of
+                the schema XML, or `None` if no schema was found.
+        """
+        docType = self.aliases.get(docType, docType)
+
+        for regType, regVersion, schema in self._registered:
+            if regType == docType and regVersion in (None, version):
+                return schema
+
+        paths = list(self.paths or core.SCHEMA_PATH)
+        if self._entries is None or paths != self._scannedPaths:
+            self.refresh()
+
+        best = None
+        bestRank = None
+        for filename, info in self._entries:
+            if info['docType'] != docType:
+                continue
+            rank = (rootId is not None and rootId in info['roots'],
+                    version is not None and info['version'] == version,
+                    info['version'] or 0)
+            if bestRank is None or rank > bestRank:
+                best, bestRank = filename, rank
+
+        return best
+
+    def load(self,
+             docType: str,
+             version: Optional[int] = None,
+             rootId: Optional[int] = None,
+             **kwargs) -> core.Schema:
+        """ Load the schema for a given document type. See `find()` for the
+            description of the arguments. Additional keyword arguments are
+            sent verbatim to `loadSchema()`.
+
+            :raises: IOError if no schema is found for the document type.
+        """
+        schema = self.find(docType, version, rootId)
+        if schema is None:
+            raise IOError(errno.ENOENT,
+                          'Could not find schema for DocType %r' % docType)
+        if isinstance(schema, core.Schema):
+            return schema
+        return core.loadSchema(schema, **kwargs)
+
+
+# The default registry, used by `open()`.
+REGISTRY = SchemaRegistry()
+
+
+def open(source: Union[str, Path, BinaryIO],
+         name: Optional[str] = None,
+         headers: bool = False,
+         mode: str = 'rb',
+         registry: Optional[SchemaRegistry] = None,
+         **kwargs) -> core.Document:
+    """ Open an EBML file, automatically loading the appropriate schema. The
+        schema is selected using the ``DocType`` and ``DocTypeVersion`` in
+        the file's ``EBML`` header element; only the header is read.
+
+        :param source: The name of an EBML file, or a file-like stream
+            (positioned at the start of the EBML document).
+        :param name: The name of the document. Defaults to filename.
+        :param headers: If `False`, the file's ``EBML`` header element
+            (if present) will not appear as a root element in the document.
+        :param mode: The mode in which to open the file, if `source` is a
+            filename. Use ``'r+b'`` to allow changes (see `Element.patch()`).
+        :param registry: The `SchemaRegistry` used to find the schema.
+            Defaults to `ebmlite.registry.REGISTRY`.
+
+        Additional keyword arguments are sent verbatim to `loadSchema()`.
+
+        :raises: IOError if the file has no ``DocType`` in its header, or if
+            no schema is found for its document type.
+    """
+    registry = registry or REGISTRY
+
+    if isinstance(source, (str, Path)):
+        filename = str(source)
+        with io.open(source, 'rb') as f:
+            header, rootId = readHeader(f)
+    else:
+        filename = getattr(source, 'name', repr(source))
+        pos = source.tell()
+        header, rootId = readHeader(source)
+        source.seek(pos)
+
+    if 'DocType' not in header:
+        raise IOError(errno.EINVAL, 'No EBML header with a DocType', filename)
+
+    schema = registry.load(header['DocType'], header.get('DocTypeVersion'),
+                           rootId, **kwargs)
+    return schema.load(source, name=name, headers=headers, mode=mode)
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def _readSeekHead(seekHead: core.MasterElement, start: int) -> List[Tuple[int, int]]:
+    """ Get the IDs and (absolute) offsets of the elements listed in a
+        ``SeekHead``.
+
+        :param seekHead: The ``SeekHead`` element.
+        :param start: The offset to which the positions are relative (i.e.,
+            the payload of the ``SeekHead``'s parent).
+        :return: A list of ``(id, offset)`` tuples.
+    """
+    seeks = []
+    for seek in seekHead:
+        if seek.name != 'Seek':
+            continue
+        seekId = seekPosition = None
+        for el in seek:
+            if el.name == 'SeekID':
+                seekId = int.from_bytes(el.value, 'big')
+            elif el.name == 'SeekPosition':
+                seekPosition = el.value
+        if seekId is not None and seekPosition is not None:
+            seeks.append((seekId, start + seekPosition))
+    return seeks
+
+
+def _probeElements(doc: core.Document,
+                   start: int,
+                   end: int,
+                   maxSize: int,
+                   parent: Optional[type] = None) -> Dict[str, Any]:
+    """ Read the metadata elements in a range of a document (either the root
+        level, or a master element containing data elements), stopping at
+        the first data element. Elements listed in a ``SeekHead`` are then
+        read, if they haven't been already. The element headers are read
+        directly, so the size of an 'infinite' element is never calculated.
+
+        :param doc: The `Document` being probed.
+        :param start: The offset of the first element.
+        :param end: The end of the range (e.g., the end of the parent).
+        :param maxSize: The largest element to read.
+        :param parent: The `Element` subclass of the parent, if not the
+            root level. Elements that aren't valid children end the range.
+        :return: A dictionary of element values, keyed by name. Values of
+            elements that may appear multiple times are lists.
+    """
+    schema = doc.schema
+    stream = doc.stream
+    result = {}
+    seen = set()
+    seeks = []
+
+    def _read(pos: int, expectedId: Optional[int] = None) -> Optional[int]:
+        """ Read the element at an offset, returning the offset of the next
+            element, or `None` if no more should be read. Elements found via
+            a ``SeekHead`` have an expected ID; containers aren't followed.
+        """
+        stream.seek(pos)
+        try:
+            eid, idlen = readElementID(stream)
+            size, sizelen = readElementSize(stream)
+        except (IOError, TypeError, ValueError):
+            # Bad data, or EOF (`ord()` of an empty string)
+            return None
+
+        if eid in schema.dataElements or eid not in schema:
+            return None
+        if expectedId is not None and eid != expectedId:
+            # Stale or bad SeekHead entry
+            return None
+        if parent is not None and not parent._isValidChild(eid):
+            return None
+
+        seen.add(pos)
+        elType = schema[eid]
+        payloadOffset = pos + idlen + sizelen
+        elEnd = end if size is None else payloadOffset + size
+
+        if issubclass(elType, core.MasterElement) and not elType.children.isdisjoint(schema.dataElements):
+            # A master element containing data (e.g., a Matroska Segment).
+            # Only the first is read.
+            if expectedId is None:
+                result[elType.name] = _probeElements(doc, payloadOffset, elEnd, maxSize, elType)
+            return None
+        elif size is None:
+            return None
+        elif elType.name == 'SeekHead':
+            seeks.extend(_readSeekHead(elType(stream, pos, size, payloadOffset), start))
+            return elEnd
+        elif elType.name in PROBE_SKIP or size > maxSize:
+            return elEnd
+        else:
+            el = elType(stream, pos, size, payloadOffset)
+            value = el.dump()
+
+        if elType.multiple:
+            result.setdefault(elType.name, []).append(value)
+        else:
+            result.setdefault(elType.name, value)
+        return elEnd
+
+    pos = start
+    while pos is not None and pos < end:
+        pos = _read(pos)
+
+    for seekId, pos in seeks:
+        if start <= pos < end and pos not in seen:
+            _read(pos, seekId)
+
+    return result
+
+
+def probe(source: Union[str, Path, BinaryIO],
+          schema: Union[str, Path, core.Schema, None] = None,
+          maxSize: int = PROBE_MAX_SIZE,
+          registry: Optional[SchemaRegistry] = None,
+          **kwargs) -> Dict[str, Any]:
+    """ Read an EBML file's metadata without reading its data: the ``EBML``
+        header and the elements before the first of the schema's 'data'
+        elements (those with ``data="1"`` in the schema, e.g., Matroska's
+        ``Cluster`` or IDE's ``ChannelDataBlock``), plus any elements
+        listed in a ``SeekHead`` (e.g., Matroska ``Tags`` or ``Cues``
+        following the data). Master elements containing data elements (e.g.,
+        Matroska's ``Segment``) are probed in the same way; only the first
+        is read.
+
+        :param source: The name of an EBML file, or a file-like stream
+            (positioned at the start of the EBML document).
+        :param schema: The schema to use (a `Schema` or the name of a schema
+            file). Defaults to the schema for the file's ``DocType`` (see
+            `open()`).
+        :param maxSize: The largest element to read. Larger elements are
+            skipped.
+        :param registry: The `SchemaRegistry` used to find the schema, if
+            `schema` is not specified. Defaults to
+            `ebmlite.registry.REGISTRY`.
+
+        Additional keyword arguments are sent verbatim to `loadSchema()`.
+
+        :return: A dictionary of the metadata elements' values (as from
+            `Element.dump()`), keyed by element name. Values of master
+            elements containing data are nested dictionaries of their
+            metadata.
+    """
+    if schema is None:
+        doc = open(source, headers=True, registry=registry, **kwargs)
+    else:
+        if not isinstance(schema, core.Schema):
+            schema = core.loadSchema(schema, **kwargs)
+        doc = schema.load(source, headers=True)
+
+    try:
+        return _probeElements(doc, doc.payloadOffset, doc.size, maxSize)
+    finally:
+        doc.close()
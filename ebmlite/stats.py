@@ -0,0 +1,456 @@
+"""
+I/O instrumentation for EBML documents: counts of stream reads and seeks,
+bytes read, elements parsed (by type), element value cache hits, and the
+time spent reading versus decoding. Used to tell whether a given access
+pattern is I/O-bound or CPU-bound.
+
+Instrumentation works by wrapping a `Document`'s stream and (while any
+document is being instrumented) `MasterElement.parseElement()` and the
+`value` properties of `Element` and `MasterElement`. When no document is
+instrumented, nothing is wrapped, so there is no overhead.
+
+Typically, this is used via `Document.stats()` and `Document.trackStats()`::
+
+    with doc.trackStats() as stats:
+        for el in doc:
+            ...
+    print(stats)
+
+Note: only elements parsed after instrumentation is started are counted;
+elements parsed before (e.g., the cached children of a `MasterElement`)
+continue to use the un-instrumented stream.
+"""
+__author__ = "David Randall Stokes, Connor Flanigan"
+__copyright__ = "Copyright 2022, Mide Technology Corporation"
+__credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt"
+
+__all__ = ['IOStats', 'Profile', 'StatsStream', 'enable', 'disable',
+           'getStats', 'profile', 'track']
+
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from . import core
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+class IOStats(object):
+    """ A set of I/O statistics for a `Document`.
+
+        :var reads: The number of stream reads.
+        :var seeks: The number of stream seeks.
+        :var bytesRead: The total number of bytes read.
+        :var elements: The number of elements parsed, keyed by element name.
+        :var cacheHits: The number of times an element's `value` was
+            retrieved from the element's cache rather than the file.
+        :var readTime: The time spent reading and seeking, in seconds.
+        :var decodeTime: The time spent parsing elements and decoding
+            values (excluding the time spent reading), in seconds.
+    """
+    __slots__ = ("reads", "seeks", "bytesRead", "elements", "cacheHits",
+                 "readTime", "decodeTime")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ Set all statistics to zero. """
+        self.reads = 0
+        self.seeks = 0
+        self.bytesRead = 0
+        self.elements = Counter()
+        self.cacheHits = 0
+        self.readTime = 0.0
+        self.decodeTime = 0.0
+
+    def _addElement(self, parent: core.MasterElement, el: core.Element, dt: float):
+        """ Record an element parsed by `parent`, taking `dt` seconds. """
+        self.elements[el.name] += 1
+        self.decodeTime += dt
+
+    def _addValue(self, el: core.Element, dt: float):
+        """ Record the decoding of an element's value, taking `dt` seconds. """
+        self.decodeTime += dt
+
+    def _addCacheHit(self, el: core.Element):
+        """ Record an element's value being retrieved from its cache. """
+        self.cacheHits += 1
+
+    @property
+    def elementsParsed(self) -> int:
+        """ The total number of elements parsed. """
+        return sum(self.elements.values())
+
+    def asDict(self) -> Dict[str, Any]:
+        """ Get the statistics as a dictionary. """
+        return {'reads': self.reads,
+                'seeks': self.seeks,
+                'bytesRead': self.bytesRead,
+                'elementsParsed': self.elementsParsed,
+                'elements': dict(self.elements),
+                'cacheHits': self.cacheHits,
+                'readTime': self.readTime,
+                'decodeTime': self.decodeTime}
+
+    def __repr__(self) -> str:
+        return ("<%s reads=%d seeks=%d bytesRead=%d elementsParsed=%d "
+                "cacheHits=%d readTime=%.6f decodeTime=%.6f>"
+                % (self.__class__.__name__, self.reads, self.seeks,
+                   self.bytesRead, self.elementsParsed, self.cacheHits,
+                   self.readTime, self.decodeTime))
+
+
+class Profile(IOStats):
+    """ A per-element-type profile of a `Document`: in addition to the
+        `IOStats`, the number of elements parsed, their total payload size,
+        and the time spent parsing them and decoding their values, by element
+        name and by element path (e.g., ``('Segment', 'Cluster',
+        'SimpleBlock')``). Times exclude time spent reading. Created by
+        `profile()`.
+
+        Note: to determine element paths, the path of every element parsed
+        is kept, so profiling a very large document uses a lot of memory.
+
+        :var counts: The number of elements parsed, keyed by name. Children
+            of 'infinite' (unknown size) elements are parsed twice: once
+            to determine their parent's size, and once when read.
+        :var payloadBytes: The total payload size of elements parsed, keyed
+            by name. Does not include 'infinite' elements.
+        :var pathTimes: The 'self' time spent parsing elements (and decoding
+            their values), keyed by element path.
+    """
+    __slots__ = ("counts", "payloadBytes", "pathTimes", "_paths")
+
+    def reset(self):
+        """ Set all statistics to zero. """
+        super(Profile, self).reset()
+        self.counts = self.elements
+        self.payloadBytes = Counter()
+        self.pathTimes = Counter()
+        self._paths = {}
+
+    def _addElement(self, parent: core.MasterElement, el: core.Element, dt: float):
+        super(Profile, self)._addElement(parent, el, dt)
+        if isinstance(parent, core.Document):
+            path = (el.name,)
+        else:
+            path = self._paths.get(parent.offset, (parent.name,)) + (el.name,)
+        self._paths[el.offset] = path
+        self.pathTimes[path] += dt
+        if isinstance(el, core.MasterElement):
+            # Don't use `size`; getting it for an 'infinite' element reads it.
+            self.payloadBytes[el.name] += getattr(el, '_size', 0)
+        else:
+            self.payloadBytes[el.name] += el.size
+
+    def _addValue(self, el: core.Element, dt: float):
+        super(Profile, self)._addValue(el, dt)
+        self.pathTimes[self._paths.get(el.offset, (el.name,))] += dt
+
+    def byName(self) -> Dict[str, Dict[str, Any]]:
+        """ Get the profile by element name.
+
+            :return: A dictionary of dictionaries, keyed by element name,
+                containing the number of elements parsed (`count`), their
+                total payload size (`bytes`), the time spent parsing and
+                decoding them (`time`), and the time spent on them and all
+                their descendants (`cumulative`).
+        """
+        result = {name: {'count': count, 'bytes': self.payloadBytes[name],
+                         'time': 0.0, 'cumulative': 0.0}
+                  for name, count in self.counts.items()}
+        for path, t in self.pathTimes.items():
+            entry = result.setdefault(path[-1], {'count': 0, 'bytes': 0,
+                                                 'time': 0.0, 'cumulative': 0.0})
+            entry['time'] += t
+            for name in set(path):
+                result.setdefault(name, {'count': 0, 'bytes': 0,
+                                         'time': 0.0, 'cumulative': 0.0})
+                result[name]['cumulative'] += t
+        return result
+
+    def table(self, sort: str = 'cumulative', limit: Optional[int] = None) -> str:
+        """ Get the profile as a table (a string) of element names, counts,
+            total payload bytes, and times (in milliseconds).
+
+            :param sort: The column by which to sort (descending): `count`,
+                `bytes`, `time`, or `cumulative`.
+            :param limit: The maximum number of rows, or `None` for all.
+        """
+        rows = sorted(self.byName().items(), key=lambda x: (-x[1][sort], x[0]))
+        lines = ["%-32s %10s %14s %12s %12s"
+                 % ('element', 'count', 'bytes', 'self ms', 'cum. ms')]
+        for name, entry in rows[:limit]:
+            lines.append("%-32s %10d %14d %12.3f %12.3f"
+                         % (name, entry['count'], entry['bytes'],
+                            entry['time'] * 1000, entry['cumulative'] * 1000))
+        return '\n'.join(lines)
+
+    def folded(self) -> str:
+        """ Get the profile as 'folded' stacks (element paths separated by
+            semicolons, followed by a time in microseconds), as used by
+            flame graph tools (e.g., ``flamegraph.pl`` or speedscope).
+        """
+        lines = []
+        for path, t in sorted(self.pathTimes.items()):
+            us = int(round(t * 1000000))
+            if us > 0:
+                lines.append("%s %d" % (';'.join(path), us))
+        return '\n'.join(lines)
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+class StatsStream(object):
+    """ A wrapper for a stream that counts reads and seeks, recording them
+        in one or more `IOStats` objects. Other attributes and methods are
+        those of the wrapped stream.
+
+        :var collectors: The `IOStats` objects to which to add the stream's
+            statistics.
+        :var totals: The `IOStats` collecting statistics for the whole time
+            the stream is instrumented (see `enable()`), or `None`.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        """ Constructor.
+
+            :param stream: The stream to wrap.
+        """
+        self._stream = stream
+        self.collectors = []
+        self.totals = None
+
+        # Total time spent in `read()` and `seek()`, used to separate I/O
+        # time from decoding time.
+        self._ioTime = 0.0
+
+    def __repr__(self) -> str:
+        return "<%s %r>" % (self.__class__.__name__, self._stream)
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+    def read(self, size: int = -1) -> bytes:
+        t0 = perf_counter()
+        data = self._stream.read(size)
+        dt = perf_counter() - t0
+        self._ioTime += dt
+        for stats in self.collectors:
+            stats.reads += 1
+            stats.bytesRead += len(data)
+            stats.readTime += dt
+        return data
+
+    def readinto(self, buffer) -> int:
+        t0 = perf_counter()
+        n = self._stream.readinto(buffer)
+        dt = perf_counter() - t0
+        self._ioTime += dt
+        for stats in self.collectors:
+            stats.reads += 1
+            stats.bytesRead += n or 0
+            stats.readTime += dt
+        return n
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        t0 = perf_counter()
+        pos = self._stream.seek(offset, whence)
+        dt = perf_counter() - t0
+        self._ioTime += dt
+        for stats in self.collectors:
+            stats.seeks += 1
+            stats.readTime += dt
+        return pos
+
+    def tell(self) -> int:
+        return self._stream.tell()
+
+
+# ==============================================================================
+# Hooks. The original methods are replaced while any document is
+# instrumented, and restored afterwards.
+# ==============================================================================
+
+_originalParseElement = core.MasterElement.parseElement
+_originalValue = core.Element.value
+_originalMasterValue = core.MasterElement.value
+
+# The number of instrumented streams. The hooks are installed while > 0.
+_instrumented = 0
+
+
+def _parseElement(self, stream: BinaryIO,
+                  nocache: bool = False) -> Tuple[core.Element, int]:
+    """ Instrumented replacement for `MasterElement.parseElement()`. """
+    if type(stream) is not StatsStream:
+        return _originalParseElement(self, stream, nocache)
+
+    io0 = stream._ioTime
+    t0 = perf_counter()
+    el, pos = _originalParseElement(self, stream, nocache)
+    dt = perf_counter() - t0 - (stream._ioTime - io0)
+    for stats in stream.collectors:
+        stats._addElement(self, el, dt)
+    return el, pos
+
+
+def _value(self):
+    """ Instrumented replacement for the `Element.value` property. """
+    stream = self.stream
+    if type(stream) is not StatsStream:
+        return _originalValue.fget(self)
+
+    if self._value is not None:
+        for stats in stream.collectors:
+            stats._addCacheHit(self)
+        return self._value
+
+    io0 = stream._ioTime
+    t0 = perf_counter()
+    value = _originalValue.fget(self)
+    dt = perf_counter() - t0 - (stream._ioTime - io0)
+    for stats in stream.collectors:
+        stats._addValue(self, dt)
+    return value
+
+
+def _masterValue(self):
+    """ Instrumented replacement for the `MasterElement.value` property.
+        Child elements are counted by `_parseElement()`; only cache hits
+        are counted here.
+    """
+    stream = self.stream
+    if type(stream) is StatsStream and self._value is not None:
+        for stats in stream.collectors:
+            stats._addCacheHit(self)
+    return _originalMasterValue.fget(self)
+
+
+def _installHooks():
+    """ Replace the methods used to instrument documents. """
+    global _instrumented
+    _instrumented += 1
+    if _instrumented == 1:
+        core.MasterElement.parseElement = _parseElement
+        core.Element.value = property(_value, doc=_originalValue.__doc__)
+        core.MasterElement.value = property(_masterValue, doc=_originalMasterValue.__doc__)
+
+
+def _removeHooks():
+    """ Restore the original methods, if no documents are instrumented. """
+    global _instrumented
+    _instrumented = max(0, _instrumented - 1)
+    if _instrumented == 0:
+        core.MasterElement.parseElement = _originalParseElement
+        core.Element.value = _originalValue
+        core.MasterElement.value = _originalMasterValue
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+
+def _instrument(doc: core.Document) -> StatsStream:
+    """ Wrap a document's stream (if it isn't already). """
+    if not isinstance(doc.stream, StatsStream):
+        doc.stream = StatsStream(doc.stream)
+        _installHooks()
+    return doc.stream
+
+
+def _uninstrument(doc: core.Document):
+    """ Restore a document's original stream, if nothing is collecting
+        statistics from it.
+    """
+    stream = doc.stream
+    if isinstance(stream, StatsStream) and not stream.collectors:
+        doc.stream = stream._stream
+        _removeHooks()
+
+
+def getStats(doc: core.Document) -> Optional[IOStats]:
+    """ Get the statistics collected from a document since `enable()` was
+        called, or `None` if not enabled.
+    """
+    stream = doc.stream
+    if isinstance(stream, StatsStream):
+        return stream.totals
+    return None
+
+
+def enable(doc: core.Document) -> IOStats:
+    """ Start collecting I/O statistics for a document. If already enabled,
+        the existing statistics are returned.
+
+        :param doc: The `Document` to instrument.
+        :return: The `IOStats` to which the document's statistics will be
+            added.
+    """
+    stream = _instrument(doc)
+    if stream.totals is None:
+        stream.totals = IOStats()
+        stream.collectors.append(stream.totals)
+    return stream.totals
+
+
+def disable(doc: core.Document) -> Optional[IOStats]:
+    """ Stop collecting I/O statistics for a document (started by
+        `enable()`). Statistics being collected by `track()` are unaffected.
+
+        :param doc: The instrumented `Document`.
+        :return: The final statistics, or `None` if not enabled.
+    """
+    stream = doc.stream
+    if not isinstance(stream, StatsStream) or stream.totals is None:
+        return None
+    totals = stream.totals
+    stream.collectors.remove(totals)
+    stream.totals = None
+    _uninstrument(doc)
+    return totals
+
+
+@contextmanager
+def track(doc: core.Document, stats: Optional[IOStats] = None):
+    """ Context manager that collects I/O statistics for a document within
+        its scope. Scopes can be nested, and can be used while statistics are
+        also being collected via `enable()`.
+
+        :param doc: The `Document` to instrument.
+        :param stats: The `IOStats` (or subclass, e.g., `Profile`) to which
+            to add the statistics. Defaults to a new `IOStats`.
+        :return: The `IOStats` for the scope.
+    """
+    stream = _instrument(doc)
+    stats = IOStats() if stats is None else stats
+    stream.collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        stream.collectors.remove(stats)
+        _uninstrument(doc)
+
+
+def profile(doc: core.Document):
+    """ Context manager that profiles a document within its scope, recording
+        the number, total size, and parsing/decoding time of elements, by
+        element name and path. Example::
+
+            with ebmlite.profile(doc) as prof:
+                doc.dump()
+            print(prof.table())
+
+        :param doc: The `Document` to profile.
+        :return: A context manager, returning a `Profile`.
+    """
+    return track(doc, Profile())
@@ -1,12 +1,27 @@
 import argparse
-from xml.dom.minidom import parseString
-from xml.etree import ElementTree as ET
 
 from ebmlite.tools import utils
 import ebmlite.util
 import ebmlite.xml_codecs
 
 
+def convert(schema, filename, out, full=False, single=False, encoding='base64'):
+    """ Convert one EBML file to XML. Also used by worker processes when
+        converting a batch of files.
+    """
+    codecargs = {'cols': None} if single else {}
+    codec = ebmlite.xml_codecs.BINARY_CODECS[encoding](**codecargs)
+    if single:
+        indent = newline = ''
+    else:
+        indent, newline = '\t', '\n'
+
+    doc = schema.load(filename, headers=True)
+    ebmlite.util.toXmlFile(doc, out, offsets=full, sizes=full, types=full,
+                           ids=full, binary_codec=codec, indent=indent,
+                           newline=newline)
+
+
 def main():
     # Build help text listing the binary codecs, and get the default one.
     codecs = list(ebmlite.xml_codecs.BINARY_CODECS)
@@ -22,7 +37,9 @@ def main():
         description="A tool for converting ebml to xml."
     )
     argparser.add_argument(
-        'input', metavar="FILE.ebml", help="The source EBML file.",
+        'input', metavar="FILE.ebml", nargs='+',
+        help=("The source EBML file. If more than one, each is converted to"
+              " a .xml file in the output directory."),
     )
     argparser.add_argument(
         'schema',
@@ -33,7 +50,8 @@ def main():
         ),
     )
     argparser.add_argument(
-        '-o', '--output', metavar="FILE.xml", help="The output file.",
+        '-o', '--output', metavar="FILE.xml",
+        help="The output file, or the output directory for multiple files.",
     )
     argparser.add_argument(
         '-c', '--clobber', action="store_true",
@@ -54,22 +72,18 @@ def main():
         help="The method of encoding binary data as text.\n" + codec_desc
     )
 
+    utils.add_batch_arguments(argparser)
+
     args = argparser.parse_args()
+    options = dict(full=args.max, single=args.single,
+                   encoding=args.encoding.strip().lower())
 
-    codecargs = {'cols': None} if args.single else {}
-    codec = ebmlite.xml_codecs.BINARY_CODECS[args.encoding.strip().lower()](**codecargs)
+    if utils.is_batch(args):
+        exit(utils.run_batch(args, convert, '.xml', options=options))
 
-    with utils.load_files(args, binary_output=args.single) as (schema, out):
-        doc = schema.load(args.input, headers=True)
-        if args.max:
-            root = ebmlite.util.toXml(doc, offsets=True, sizes=True, types=True, ids=True, binary_codec=codec)
-        else:
-            root = ebmlite.util.toXml(doc, offsets=False, sizes=False, types=False, ids=False, binary_codec=codec)
-        s = ET.tostring(root, encoding="utf-8")
-        if args.single:
-            out.write(s)
-        else:
-            parseString(s).writexml(out, addindent='\t', newl='\n', encoding='utf-8')
+    args.input = args.input[0]
+    with utils.load_files(args) as (schema, out):
+        convert(schema, args.input, out, **options)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+"""
+Copy a time range of a Matroska (or WebM) file to a new file, without
+re-encoding. Whole clusters are copied, so the result may start slightly
+before and end slightly after the requested times.
+"""
+
+import argparse
+import os.path
+import sys
+
+from ebmlite import matroska
+from ebmlite.tools import utils
+
+
+def to_timecode(seconds, index):
+    """ Convert a time in seconds to the segment's timecode units. """
+    if seconds is None:
+        return None
+    return int(round(seconds * 1e9 / index.timecodeScale))
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip())
+    argparser.add_argument(
+        'input', metavar="FILE.mkv", help="The source Matroska file.",
+    )
+    argparser.add_argument(
+        '-o', '--output', required=True, metavar="FILE.mkv", help="The output file.",
+    )
+    argparser.add_argument(
+        '-s', '--start', type=float, metavar="SECONDS",
+        help="The start of the time range (default: the start of the file).",
+    )
+    argparser.add_argument(
+        '-e', '--end', type=float, metavar="SECONDS",
+        help="The end of the time range (default: the end of the file).",
+    )
+    argparser.add_argument(
+        '-c', '--clobber', action="store_true",
+        help="Clobber (overwrite) existing files.",
+    )
+
+    args = argparser.parse_args()
+
+    if not os.path.exists(args.input):
+        utils.errPrint("Input file does not exist: %s" % args.input)
+
+    output = os.path.realpath(os.path.expanduser(args.output))
+    if os.path.exists(output):
+        if os.path.samefile(args.input, output):
+            utils.errPrint("Error: Output would overwrite input: %s" % args.input)
+        elif not args.clobber:
+            utils.errPrint("Error: Output file already exists: %s" % args.output)
+
+    try:
+        with matroska.ClusterIndex(args.input) as index:
+            size = matroska.cut(index.doc, output,
+                                to_timecode(args.start, index),
+                                to_timecode(args.end, index))
+    except (IOError, ValueError) as err:
+        utils.errPrint("Error cutting %s: %s" % (args.input, err))
+
+    sys.stderr.write("Wrote %d bytes to %s\n" % (size, args.output))
+
+
+if __name__ == "__main__":
+    main()
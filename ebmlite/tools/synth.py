@@ -0,0 +1,434 @@
+"""
+Generate synthetic EBML documents for scale and stress testing. Documents
+are built from a schema's structure, with random (but reproducible, given
+the same seed) element values. Optionally, documents can contain
+unknown-size master elements, ``Void`` padding, and deliberate corruption.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import os.path
+import random
+import string
+import sys
+
+from ebmlite import core, encoding
+from ebmlite.tools import utils
+
+
+# Multipliers for size suffixes (e.g., "5GB")
+SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024**2, 'g': 1024**3, 't': 1024**4}
+
+# The range of the default maximum binary payload size, which scales with the
+# document size (see `default_binary_size()`). Elements are encoded one at a
+# time, so large documents need large payloads to be generated quickly.
+MIN_BINARY_SIZE = 64
+MAX_BINARY_SIZE = 1024**2
+
+
+def parse_size(size):
+    """ Parse a size given on the command line, with an optional suffix:
+        K, M, G, or T (optionally followed by "B" or "iB"; all are powers of
+        1024). E.g., ``"5GB"``.
+    """
+    s = size.strip().lower()
+    for suffix in ('ib', 'b'):
+        if s.endswith(suffix) and s[:-len(suffix)][-1:] in 'kmgt':
+            s = s[:-len(suffix)]
+            break
+    unit = s[-1:] if s[-1:] in 'kmgt' else ''
+    try:
+        return int(float(s[:len(s) - len(unit)]) * SIZE_UNITS[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid size: %r" % size)
+
+
+def default_binary_size(size):
+    """ Get the default maximum size of binary element payloads for a
+        document of a given size: 1/1024 of the document's size, between
+        `MIN_BINARY_SIZE` and `MAX_BINARY_SIZE`.
+    """
+    return max(MIN_BINARY_SIZE, min(MAX_BINARY_SIZE, size // 1024))
+
+
+def parse_mix(mix):
+    """ Parse an element mix given on the command line, e.g.
+        ``"SimpleBlock=10,Void=0"``.
+    """
+    result = {}
+    for item in filter(None, mix.split(',')):
+        name, _, weight = item.partition('=')
+        try:
+            result[name.strip()] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError("Invalid element weight: %r" % item)
+    return result
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+class Synthesizer(object):
+    """ Generates random documents for a schema. Generated elements are
+        nested tuples of (element type, value), in which the values of
+        master elements are lists of child elements.
+    """
+
+    def __init__(self, schema, seed=0, depth=4, fanout=8, binary_size=MIN_BINARY_SIZE,
+                 mix=None, unknown_size=0.0, void=0.0):
+        """ Constructor.
+
+            :param schema: The `Schema` of the documents to generate.
+            :param seed: The random seed. The same arguments and seed always
+                produce the same document.
+            :param depth: The maximum depth of nested master elements.
+            :param fanout: The maximum number of children per master element
+                (in addition to any mandatory ones).
+            :param binary_size: The maximum size of binary element payloads.
+            :param mix: A dictionary of relative weights for choosing
+                elements, keyed by element name. Element types not included
+                have a weight of 1. A weight of 0 excludes the element (unless
+                it is mandatory).
+            :param unknown_size: The probability of a master element being
+                written with an unknown ('infinite') size. Only applied where
+                the document remains valid, i.e., the element following it
+                is not a valid child.
+            :param void: The probability of a ``Void`` element following any
+                element.
+        """
+        self.schema = schema
+        self.rng = random.Random(seed)
+        self.depth = depth
+        self.fanout = fanout
+        self.binary_size = binary_size
+        self.mix = mix or {}
+        self.unknown_size = unknown_size
+        self.void = void if 'Void' in schema else 0
+        self.void_type = schema['Void'] if self.void else None
+
+        # Elements that may appear at the root level (other than the header)
+        self.roots = [c for c in self._get_choices(schema.children) if c[1] > 0]
+        if not self.roots:
+            raise ValueError("Schema %s has no usable root elements" % schema.name)
+
+        # The number of elements encoded
+        self.num_elements = 0
+
+    def _get_choices(self, ids):
+        """ Get the element types (and their weights) that can be chosen
+            from a set of element IDs. Global elements (e.g., ``Void``) and
+            the ``EBML`` header are excluded.
+        """
+        choices = []
+        for eid in sorted(ids):
+            etype = self.schema.elements[eid]
+            if (eid in self.schema.globals or etype.name == 'EBML'
+                    or issubclass(etype, core.VoidElement)):
+                continue
+            weight = self.mix.get(etype.name, 1)
+            if weight > 0 or etype.mandatory:
+                choices.append((etype, weight))
+        return choices
+
+    def _choose(self, choices):
+        """ Choose an element type, by weight. """
+        types, weights = zip(*choices)
+        return self.rng.choices(types, weights)[0]
+
+    # ==========================================================================
+
+    def make_value(self, etype):
+        """ Generate a random value for a (non-master) element type. """
+        rng = self.rng
+        if issubclass(etype, core.DateElement):
+            return datetime(2001, 1, 1) + timedelta(microseconds=rng.randrange(10**15))
+        elif issubclass(etype, core.UIntegerElement):
+            return rng.getrandbits(8 * (etype.length or 4))
+        elif issubclass(etype, core.IntegerElement):
+            bits = 8 * (etype.length or 4) - 1
+            return rng.randrange(-2**bits, 2**bits)
+        elif issubclass(etype, core.FloatElement):
+            return rng.uniform(-1e6, 1e6)
+        elif issubclass(etype, core.UnicodeElement):
+            return ''.join(rng.choice('abcdefghij éüλ中')
+                           for _ in range(rng.randint(1, etype.length or 16)))
+        elif issubclass(etype, core.StringElement):
+            return ''.join(rng.choice(string.ascii_letters)
+                           for _ in range(rng.randint(1, etype.length or 16)))
+        return rng.randbytes(rng.randint(0, etype.length or self.binary_size))
+
+    def make_element(self, etype, depth=1):
+        """ Generate an element (and its children, if a master).
+
+            :param etype: The element type (an `Element` subclass).
+            :param depth: The depth of the element in the document.
+            :return: A tuple of the element type and its value (for master
+                elements, a list of child elements).
+        """
+        if not issubclass(etype, core.MasterElement):
+            return etype, self.make_value(etype)
+
+        choices = self._get_choices(etype.children or ())
+        if depth >= self.depth:
+            choices = [c for c in choices if not issubclass(c[0], core.MasterElement)]
+
+        children = []
+        for child, _weight in choices:
+            if child.mandatory:
+                children.append(self.make_element(child, depth + 1))
+
+        choices = [c for c in choices
+                   if c[1] > 0 and (c[0].multiple or not c[0].mandatory)]
+        for _ in range(self.rng.randint(0, self.fanout) if choices else 0):
+            child = self._choose(choices)
+            if not child.multiple:
+                if any(c[0] is child for c in children):
+                    continue
+            children.append(self.make_element(child, depth + 1))
+
+        if self.void:
+            withVoids = []
+            for child in children:
+                withVoids.append(child)
+                if self.rng.random() < self.void:
+                    withVoids.append(self.make_void())
+            children = withVoids
+
+        return etype, children
+
+    def make_root(self):
+        """ Generate a root-level element. """
+        return self.make_element(self._choose(self.roots))
+
+    def make_void(self):
+        """ Generate a ``Void`` element. """
+        return self.void_type, self.rng.randint(0, self.binary_size)
+
+    # ==========================================================================
+
+    def encode(self, element, following=None):
+        """ Encode a generated element.
+
+            :param element: The element, as generated by `make_element()`.
+            :param following: The ID of the element that will follow this
+                one in the file (`None` if at the end of the file). Used to
+                determine if the element can be written with an unknown size.
+            :return: The encoded element.
+        """
+        etype, value = element
+        self.num_elements += 1
+        if issubclass(etype, core.VoidElement):
+            return etype.encode(None, length=value)
+        elif not issubclass(etype, core.MasterElement):
+            return etype.encode(value)
+
+        payload = bytearray()
+        for i, child in enumerate(value):
+            nextId = value[i + 1][0].id if i + 1 < len(value) else following
+            payload.extend(self.encode(child, nextId))
+
+        # An unknown-size element ends at the first element that is not a
+        # valid child, so only use it if the next element isn't one.
+        infinite = (self.unknown_size
+                    and self.rng.random() < self.unknown_size
+                    and (following is None or not etype._isValidChild(following)))
+        size = None if infinite else len(payload)
+        return encoding.encodeId(etype.id) + encoding.encodeSize(size) + payload
+
+
+def generate(schema, out, size, seed=0, depth=4, fanout=8, binary_size=None,
+             mix=None, unknown_size=0.0, void=0.0, corrupt=0, truncate=False,
+             headers=True):
+    """ Generate a synthetic EBML document. Root elements are generated until
+        the document reaches the given size.
+
+        :param schema: The `Schema` (or schema name) of the document.
+        :param out: The output filename, or a readable, writable, seekable
+            binary stream.
+        :param size: The minimum size of the document, in bytes.
+        :param binary_size: The maximum size of binary element payloads.
+            `None` scales it with `size` (see `default_binary_size()`).
+        :param corrupt: The number of bytes to corrupt (after the header),
+            at random positions.
+        :param truncate: If `True`, the last root element is truncated
+            (e.g., like a file whose recording was interrupted).
+        :param headers: If `True`, the document starts with an ``EBML``
+            header element.
+        :return: A dictionary with the size of the document, the number of
+            elements generated, the offsets of corrupted bytes, and the
+            offset at which the document was truncated (if any).
+
+        See `Synthesizer` for the other arguments.
+    """
+    if not isinstance(schema, core.Schema):
+        schema = core.loadSchema(schema)
+    if binary_size is None:
+        binary_size = default_binary_size(size)
+
+    synth = Synthesizer(schema, seed=seed, depth=depth, fanout=fanout,
+                        binary_size=binary_size, mix=mix,
+                        unknown_size=unknown_size, void=void)
+
+    stream = open(out, 'w+b') if isinstance(out, (str, bytes, os.PathLike)) else out
+    try:
+        start = stream.tell()
+        if headers and 'EBML' in schema:
+            cls = schema.document
+            stream.write(cls.encodePayload(cls._createHeaders()))
+        headerEnd = stream.tell()
+
+        # Generate one root element ahead, so each element's successor is
+        # known when it is encoded.
+        lastOffset = headerEnd
+        element = synth.make_root()
+        while element is not None:
+            if synth.rng.random() < synth.void:
+                element = [element, synth.make_void()]
+            else:
+                element = [element]
+
+            if stream.tell() - start < size:
+                nextElement = synth.make_root()
+            else:
+                nextElement = None
+
+            for i, el in enumerate(element):
+                following = element[i + 1][0].id if i + 1 < len(element) else None
+                if following is None and nextElement is not None:
+                    following = nextElement[0].id
+                lastOffset = stream.tell()
+                stream.write(synth.encode(el, following))
+
+            element = nextElement if stream.tell() - start < size else None
+
+        end = stream.tell()
+        truncated = None
+        if truncate and end - lastOffset > 1:
+            truncated = synth.rng.randrange(lastOffset + 1, end)
+            stream.truncate(truncated)
+            end = truncated
+
+        # Corrupted bytes are chosen after truncating, so all are in the file
+        corrupted = []
+        if corrupt and end > headerEnd:
+            corrupted = sorted(synth.rng.sample(range(headerEnd, end),
+                                                min(corrupt, end - headerEnd)))
+            for offset in corrupted:
+                stream.seek(offset)
+                byte = stream.read(1)[0]
+                stream.seek(offset)
+                stream.write(bytes([byte ^ synth.rng.randint(1, 255)]))
+
+        stream.seek(end)
+
+    finally:
+        if stream is not out:
+            stream.close()
+
+    return {'size': end - start,
+            'elements': synth.num_elements,
+            'corrupted': corrupted,
+            'truncated': truncated}
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="A tool for generating synthetic EBML files for testing."
+    )
+    argparser.add_argument(
+        '--schema', required=True, metavar="SCHEMA.xml",
+        help=(
+          "The name of the schema file. Only the name itself is required if"
+          " the schema file is in the standard schema directory."
+        ),
+    )
+    argparser.add_argument(
+        '-o', '--output', required=True, metavar="FILE.ebml", help="The output file.",
+    )
+    argparser.add_argument(
+        '-c', '--clobber', action="store_true",
+        help="Clobber (overwrite) existing files.",
+    )
+    argparser.add_argument(
+        '--size', type=parse_size, default=parse_size('1MB'),
+        help=("The minimum size of the generated file, e.g. 100MB or 5GB"
+              " (default: 1MB)."),
+    )
+    argparser.add_argument(
+        '--seed', type=int, default=0,
+        help="The random seed. The same seed and arguments produce the same file.",
+    )
+    argparser.add_argument(
+        '--depth', type=int, default=4,
+        help="The maximum depth of nested master elements (default: 4).",
+    )
+    argparser.add_argument(
+        '--fanout', type=int, default=8,
+        help="The maximum number of children per master element (default: 8).",
+    )
+    argparser.add_argument(
+        '--binary-size', type=parse_size,
+        help=("The maximum size of binary element payloads. Larger payloads "
+              "generate large files faster (default: 1/1024 of --size, "
+              "from %d bytes to %dMB)." % (MIN_BINARY_SIZE, MAX_BINARY_SIZE // 1024**2)),
+    )
+    argparser.add_argument(
+        '--mix', type=parse_mix, default={},
+        help=("Relative weights for choosing elements, by name, e.g."
+              " 'SimpleBlock=10,Tags=0'. Unlisted elements have a weight of 1."),
+    )
+    argparser.add_argument(
+        '--unknown-size', type=float, default=0, metavar="PROBABILITY",
+        help="The probability of a master element having an unknown size.",
+    )
+    argparser.add_argument(
+        '--void', type=float, default=0, metavar="PROBABILITY",
+        help="The probability of a Void element following each element.",
+    )
+    argparser.add_argument(
+        '--corrupt', type=int, default=0, metavar="N",
+        help="The number of bytes to corrupt, at random positions.",
+    )
+    argparser.add_argument(
+        '--truncate', action="store_true",
+        help="Truncate the last root element, as if the file were incomplete.",
+    )
+    argparser.add_argument(
+        '--no-headers', action="store_true",
+        help="Do not write an EBML header element.",
+    )
+
+    args = argparser.parse_args()
+
+    output = os.path.realpath(os.path.expanduser(args.output))
+    if os.path.exists(output) and not args.clobber:
+        utils.errPrint("Error: Output file already exists: %s" % args.output)
+
+    try:
+        schema = utils.load_schema(args.schema)
+    except IOError as err:
+        utils.errPrint("Error loading schema: %s\n" % err)
+
+    result = generate(schema, output, args.size, seed=args.seed,
+                      depth=args.depth, fanout=args.fanout,
+                      binary_size=args.binary_size, mix=args.mix,
+                      unknown_size=args.unknown_size, void=args.void,
+                      corrupt=args.corrupt, truncate=args.truncate,
+                      headers=not args.no_headers)
+
+    sys.stderr.write("Wrote %d bytes (%d elements) to %s\n"
+                     % (result['size'], result['elements'], args.output))
+    if result['corrupted']:
+        sys.stderr.write("Corrupted bytes at offsets: %s\n"
+                         % ', '.join(map(str, result['corrupted'])))
+    if result['truncated'] is not None:
+        sys.stderr.write("Truncated at offset %d\n" % result['truncated'])
+
+
+if __name__ == "__main__":
+    main()
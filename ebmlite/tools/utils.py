@@ -1,6 +1,7 @@
 import contextlib
 import sys
 import os.path
+import time
 
 from ebmlite import core
 
@@ -11,6 +12,15 @@ def errPrint(msg):
     exit(1)
 
 
+def load_schema(schema_file):
+    """ Load a schema named on the command line. The ``.xml`` extension is
+        optional.
+    """
+    if os.path.splitext(schema_file.strip())[1] == '':
+        schema_file += '.xml'
+    return core.loadSchema(schema_file)
+
+
 @contextlib.contextmanager
 def load_files(args, binary_output=False):
     if not os.path.exists(args.input):
@@ -19,10 +29,7 @@ def load_files(args, binary_output=False):
 
     schema = None
     try:
-        schema_file = args.schema
-        if os.path.splitext(schema_file.strip())[1] == '':
-            schema_file += '.xml'
-        schema = core.loadSchema(schema_file)
+        schema = load_schema(args.schema)
     except IOError as err:
         errPrint("Error loading schema: %s\n" % err)
 
@@ -35,3 +42,164 @@ def load_files(args, binary_output=False):
         errPrint("Error: Output file already exists: %s" % args.output)
     with open(output, ('wb' if binary_output else 'w')) as out:
         yield schema, out
+
+
+# ==============================================================================
+# --- Batch processing
+# ==============================================================================
+
+def add_batch_arguments(argparser):
+    """ Add the arguments for batch processing multiple files to a tool's
+        `argparse.ArgumentParser`.
+    """
+    argparser.add_argument(
+        '-j', '--jobs', type=int, default=1, metavar="N",
+        help=("The number of files to process in parallel, when processing"
+              " multiple files. 0 uses one process per CPU core."),
+    )
+
+
+def is_batch(args):
+    """ Determine whether a tool's arguments specify a batch of files: more
+        than one input, or a directory as the output.
+    """
+    if len(args.input) > 1:
+        return True
+    return bool(args.output and (os.path.isdir(args.output)
+                                 or args.output.endswith(('/', os.sep))))
+
+
+# The worker process' schema, loaded once by `_init_worker()`.
+_worker_schema = None
+
+
+def _init_worker(schema_file):
+    """ Initialize a batch worker process, loading the schema.
+    """
+    global _worker_schema
+    _worker_schema = load_schema(schema_file)
+
+
+def _process_file(func, infile, outfile, binary_output, options):
+    """ Process one file in a batch (in a worker process, or the main one).
+
+        :return: The input filename, the output filename, the size of the
+            input, and the time taken (in seconds).
+    """
+    t0 = time.perf_counter()
+    try:
+        with open(outfile, ('wb' if binary_output else 'w')) as out:
+            func(_worker_schema, infile, out, **options)
+    except BaseException:
+        # Don't leave partial output
+        with contextlib.suppress(OSError):
+            os.remove(outfile)
+        raise
+    return infile, outfile, os.path.getsize(infile), time.perf_counter() - t0
+
+
+def run_batch(args, func, ext, binary_output=False, options=None):
+    """ Process a batch of files, optionally in parallel. Each file's result
+        is reported as it completes, followed by the total throughput.
+
+        :param args: The tool's parsed command-line arguments (`input`,
+            `schema`, `output`, `clobber`, and `jobs`).
+        :param func: The function to process each file. Must be a
+            module-level function (so it can be used by worker processes),
+            taking a `Schema`, an input filename, an output stream, and the
+            keyword arguments in `options`.
+        :param ext: The extension of the output files. Each is named after
+            its input file, and written to the `output` directory (or the
+            input's directory if no output is specified). An input whose
+            output file would be written by an earlier one (e.g., a file
+            with the same name in another directory) is reported as failed.
+        :param binary_output: If `True`, output files are opened in binary
+            mode.
+        :param options: Keyword arguments for `func`.
+        :return: The tool's exit status: 0 if all files were processed
+            successfully, 1 otherwise.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    options = options or {}
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    try:
+        # Load once up front to catch problems before starting any workers
+        _init_worker(args.schema)
+    except IOError as err:
+        errPrint("Error loading schema: %s\n" % err)
+
+    outdir = args.output and os.path.realpath(os.path.expanduser(args.output))
+    if outdir:
+        os.makedirs(outdir, exist_ok=True)
+
+    failed = 0
+    tasks = []
+    claimed = {}  # Output filename -> the input file that will write it
+    for infile in args.input:
+        if not os.path.isfile(infile):
+            sys.stderr.write("Input file does not exist: %s\n" % infile)
+            failed += 1
+            continue
+        name = os.path.splitext(os.path.basename(infile))[0] + ext
+        outfile = os.path.join(outdir or os.path.dirname(os.path.realpath(infile)), name)
+        key = os.path.normcase(outfile)
+        if key in claimed:
+            # E.g., inputs with the same name in different directories
+            sys.stderr.write("Output file %s for %s would overwrite the output of %s\n"
+                             % (outfile, infile, claimed[key]))
+            failed += 1
+            continue
+        if os.path.exists(outfile):
+            if os.path.samefile(infile, outfile):
+                sys.stderr.write("Output would overwrite input: %s\n" % infile)
+                failed += 1
+                continue
+            elif not args.clobber:
+                sys.stderr.write("Output file already exists: %s\n" % outfile)
+                failed += 1
+                continue
+        claimed[key] = infile
+        tasks.append((infile, outfile))
+
+    total = 0
+
+    def _report(infile, result=None, error=None):
+        nonlocal failed, total
+        if error is not None:
+            failed += 1
+            sys.stderr.write("Error processing %s: %s\n" % (infile, error))
+        else:
+            infile, outfile, size, elapsed = result
+            total += size
+            sys.stderr.write("%s -> %s (%.2f s)\n" % (infile, outfile, elapsed))
+        sys.stderr.flush()
+
+    t0 = time.perf_counter()
+
+    if jobs == 1 or len(tasks) < 2:
+        for infile, outfile in tasks:
+            try:
+                _report(infile, _process_file(func, infile, outfile,
+                                              binary_output, options))
+            except Exception as err:
+                _report(infile, error=err)
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)),
+                                 initializer=_init_worker,
+                                 initargs=(args.schema,)) as executor:
+            futures = {executor.submit(_process_file, func, infile, outfile,
+                                       binary_output, options): infile
+                       for infile, outfile in tasks}
+            for future in as_completed(futures):
+                error = future.exception()
+                _report(futures[future], None if error else future.result(), error)
+
+    elapsed = time.perf_counter() - t0 or 1e-9
+    done = len(args.input) - failed
+    sys.stderr.write("Processed %d of %d files (%.1f MB) in %.2f s: "
+                     "%.1f MB/s, %.1f files/s\n"
+                     % (done, len(args.input), total / 1e6, elapsed,
+                        total / 1e6 / elapsed, done / elapsed))
+    return 1 if failed else 0
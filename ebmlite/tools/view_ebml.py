@@ -5,6 +5,15 @@ import ebmlite.util
 import ebmlite.xml_codecs
 
 
+def view(schema, filename, out, encoding='ignore'):
+    """ Write the structure of one EBML file. Also used by worker processes
+        when processing a batch of files.
+    """
+    codec = ebmlite.xml_codecs.BINARY_CODECS[encoding]()
+    doc = schema.load(filename, headers=True)
+    ebmlite.util.pprint(doc, out=out, binary_codec=codec)
+
+
 def main():
     # Build help text listing the binary codecs, and get the default one.
     codecs = list(ebmlite.xml_codecs.BINARY_CODECS)
@@ -20,7 +29,9 @@ def main():
         description="A tool for reading ebml file content."
     )
     argparser.add_argument(
-        'input', metavar="FILE.ebml", help="The source XML file.",
+        'input', metavar="FILE.ebml", nargs='+',
+        help=("The source EBML file. If more than one, each is written to a"
+              " .txt file in the output directory."),
     )
     argparser.add_argument(
         'schema',
@@ -31,7 +42,8 @@ def main():
         ),
     )
     argparser.add_argument(
-        '-o', '--output', metavar="FILE.xml", help="The output file.",
+        '-o', '--output', metavar="FILE.txt",
+        help="The output file, or the output directory for multiple files.",
     )
     argparser.add_argument(
         '-c', '--clobber', action="store_true",
@@ -44,13 +56,17 @@ def main():
         help="The method of encoding binary data as text.\n" + codec_desc
     )
 
+    utils.add_batch_arguments(argparser)
+
     args = argparser.parse_args()
+    options = dict(encoding=args.encoding.strip().lower())
 
-    codec = ebmlite.xml_codecs.BINARY_CODECS[args.encoding.strip().lower()]()
+    if utils.is_batch(args):
+        exit(utils.run_batch(args, view, '.txt', options=options))
 
+    args.input = args.input[0]
     with utils.load_files(args, binary_output=False) as (schema, out):
-        doc = schema.load(args.input, headers=True)
-        ebmlite.util.pprint(doc, out=out, binary_codec=codec)
+        view(schema, args.input, out, **options)
 
 
 if __name__ == "__main__":
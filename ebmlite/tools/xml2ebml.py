@@ -4,12 +4,21 @@ from ebmlite.tools import utils
 import ebmlite.util
 
 
+def convert(schema, filename, out):
+    """ Convert one XML file to EBML. Also used by worker processes when
+        converting a batch of files.
+    """
+    ebmlite.util.xml2ebml(filename, out, schema)  # , sizeLength=4, headers=True, unknown=True)
+
+
 def main():
     argparser = argparse.ArgumentParser(
         description="A tool for converting xml to ebml."
     )
     argparser.add_argument(
-        'input', metavar="FILE.xml", help="The source XML file.",
+        'input', metavar="FILE.xml", nargs='+',
+        help=("The source XML file. If more than one, each is converted to"
+              " a .ebml file in the output directory."),
     )
     argparser.add_argument(
         'schema',
@@ -20,16 +29,23 @@ def main():
         ),
     )
     argparser.add_argument(
-        '-o', '--output', metavar="FILE.ebml", help="The output file.",
+        '-o', '--output', metavar="FILE.ebml",
+        help="The output file, or the output directory for multiple files.",
     )
     argparser.add_argument(
         '-c', '--clobber', action="store_true",
         help="Clobber (overwrite) existing files.",
     )
+    utils.add_batch_arguments(argparser)
+
     args = argparser.parse_args()
 
+    if utils.is_batch(args):
+        exit(utils.run_batch(args, convert, '.ebml', binary_output=True))
+
+    args.input = args.input[0]
     with utils.load_files(args, binary_output=True) as (schema, out):
-        ebmlite.util.xml2ebml(args.input, out, schema)  # , sizeLength=4, headers=True, unknown=True)
+        convert(schema, args.input, out)
 
 
 if __name__ == "__main__":
@@ -5,8 +5,6 @@ This module may be imported or used as a command-line utility.
 Created on Aug 11, 2017
 
 :todo: Clean up and standardize usage of the term 'size' versus 'length.'
-:todo: Modify (or create an alternate version of) `toXml()` that writes
-    directly to a file, allowing the conversion of huge EBML files.
 :todo: Add other options to command-line utility for the other arguments of
     `toXml()` and `xml2ebml()`.
 """
@@ -14,21 +12,19 @@ __author__ = "David Randall Stokes, Connor Flanigan"
 __copyright__ = "Copyright 2021, Mide Technology Corporation"
 __credits__ = "David Randall Stokes, Connor Flanigan, Becker Awqatty, Derek Witt"
 
-__all__ = ['createID', 'validateID', 'toXml', 'xml2ebml', 'loadXml', 'pprint',
-           'printSchemata', 'flatiter']
+__all__ = ['createID', 'validateID', 'toXml', 'toXmlFile', 'xml2ebml',
+           'loadXml', 'pprint', 'printSchemata', 'flatiter', 'readRanges',
+           'readMany', 'Writer', 'extract']
 
-import ast
+# Note: Modules only used by specific features (XML conversion, temporary
+# files, etc.) are imported where they are used, to keep importing fast.
 from io import BytesIO
-import pathlib
 import struct
 import sys
-import tempfile
-from typing import BinaryIO, Callable, IO, List, Optional, Tuple, Union
-from xml.etree import ElementTree as ET
+from typing import Any, BinaryIO, Callable, IO, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 
 from . import core, encoding, decoding
-from . import xml_codecs
 
 # ==============================================================================
 #
@@ -160,10 +156,14 @@ def toXml(el: core.Element,
             the contents of Void elements as text.
         :return The root XML element of the file.
     """
-    if isinstance(binary_codec, str):
-        binary_codec = xml_codecs.BINARY_CODECS[binary_codec]()
-    if isinstance(void_codec, str):
-        void_codec = xml_codecs.BINARY_CODECS[void_codec]()
+    from xml.etree import ElementTree as ET
+
+    if isinstance(binary_codec, str) or isinstance(void_codec, str):
+        from . import xml_codecs
+        if isinstance(binary_codec, str):
+            binary_codec = xml_codecs.BINARY_CODECS[binary_codec]()
+        if isinstance(void_codec, str):
+            void_codec = xml_codecs.BINARY_CODECS[void_codec]()
 
     if isinstance(el, core.Document):
         elname = el.__class__.__name__
@@ -206,10 +206,177 @@ def toXml(el: core.Element,
     return xmlEl
 
 
+# Replacements for escaping XML attribute values.
+_XML_ATTR_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;',
+                                   '"': '&quot;', '\n': '&#10;',
+                                   '\r': '&#13;', '\t': '&#09;'})
+
+
+def _xmlAttrs(attrs: List[Tuple[str, Any]]) -> str:
+    """ Helper function to render XML attributes. Values are escaped, and
+        non-ASCII characters are written as character references.
+    """
+    return ''.join(' %s="%s"' % (k, str(v).translate(_XML_ATTR_ESCAPES)
+                                 .encode('ascii', 'xmlcharrefreplace').decode())
+                   for k, v in attrs if v is not None)
+
+
+def toXmlFile(el: core.Element,
+              out: Union[str, Path, IO],
+              offsets: bool = True,
+              sizes: bool = True,
+              types: bool = True,
+              ids: bool = True,
+              binary_codec: Union[Callable, str] = 'base64',
+              void_codec: Union[Callable, str] = 'ignore',
+              indent: str = '\t',
+              newline: str = '\n'):
+    """ Convert an EBML Document to XML, writing it directly to a file. Unlike
+        `toXml()`, no XML tree is built in memory, allowing the conversion
+        of huge EBML files. Arguments are the same as `toXml()`, with the
+        exception of those listed below.
+
+        :param el: An instance of an EBML Element or Document subclass.
+        :param out: The output filename, or a text or binary stream.
+        :param indent: The string used for each level of indentation.
+        :param newline: The string written after each XML element. Use
+            empty strings for `indent` and `newline` to write the XML on
+            a single line.
+    """
+    import io
+
+    if isinstance(binary_codec, str) or isinstance(void_codec, str):
+        from . import xml_codecs
+        if isinstance(binary_codec, str):
+            binary_codec = xml_codecs.BINARY_CODECS[binary_codec]()
+        if isinstance(void_codec, str):
+            void_codec = xml_codecs.BINARY_CODECS[void_codec]()
+
+    if isinstance(out, (str, Path)):
+        stream = open(out, 'w', encoding='utf-8')
+    elif not isinstance(out, io.TextIOBase):
+        stream = io.TextIOWrapper(out, encoding='utf-8')
+    else:
+        stream = out
+
+    write = stream.write
+
+    def _write(el, depth):
+        prefix = indent * depth
+
+        if isinstance(el, core.Document):
+            elname = el.__class__.__name__
+            attrs = [('source', el.filename),
+                     ('schemaName', el.schema.name),
+                     ('schemaFile', el.schema.filename)]
+        else:
+            elname = el.name
+            attrs = []
+            if ids and isinstance(el.id, int):
+                attrs.append(('id', "0x%X" % el.id))
+            if types:
+                attrs.append(('type', el.dtype.__name__))
+
+        if offsets:
+            attrs.append(('offset', el.offset))
+        if sizes:
+            attrs.append(('size', el.size))
+
+        if isinstance(el, core.MasterElement):
+            children = iter(el)
+            child = next(children, None)
+            if child is None:
+                write('%s<%s%s/>%s' % (prefix, elname, _xmlAttrs(attrs), newline))
+                return
+            write('%s<%s%s>%s' % (prefix, elname, _xmlAttrs(attrs), newline))
+            while child is not None:
+                _write(child, depth + 1)
+                child = next(children, None)
+            write('%s</%s>%s' % (prefix, elname, newline))
+            return
+
+        if isinstance(el, core.VoidElement):
+            codec = void_codec
+            if codec.NAME != 'ignore':
+                attrs.append(('encoding', codec.NAME))
+        elif isinstance(el, core.BinaryElement):
+            codec = binary_codec
+            attrs.append(('encoding', codec.NAME))
+        else:
+            attrs.append(('value', el.value))
+            write('%s<%s%s/>%s' % (prefix, elname, _xmlAttrs(attrs), newline))
+            return
+
+        if codec.NAME == 'ignore':
+            write('%s<%s%s/>%s' % (prefix, elname, _xmlAttrs(attrs), newline))
+            return
+
+        # Binary data is encoded directly to the output stream. Codecs
+        # only produce text that does not require escaping.
+        write('%s<%s%s>' % (prefix, elname, _xmlAttrs(attrs)))
+        codec.encode(el.value, stream=stream, indent=prefix + indent,
+                     offset=el.offset)
+        write('</%s>%s' % (elname, newline))
+
+    try:
+        write('<?xml version="1.0" encoding="utf-8"?>\n')
+        _write(el, 0)
+    finally:
+        if stream is not out:
+            if isinstance(out, (str, Path)):
+                stream.close()
+            else:
+                stream.flush()
+                stream.detach()
+
+
 # ===========================================================================
 #
 # ===========================================================================
 
+def _getXmlElementType(xmlEl,
+                       schema: core.Schema,
+                       unknown: bool = True) -> Tuple[type, bytes]:
+    """ Helper function to get the EBML element class corresponding to an
+        XML element, and its encoded ID. See `xmlElement2ebml()`.
+    """
+    try:
+        cls = schema[xmlEl.tag]
+        encId = encoding.encodeId(cls.id)
+    except (KeyError, AttributeError):
+        # Element name not in schema. Go ahead if allowed (`unknown` is `True`)
+        # and the XML element specifies an ID,
+        if not unknown:
+            raise NameError("Unrecognized EBML element name: %s" % xmlEl.tag)
+
+        eid = xmlEl.get('id', None)
+        if eid is None:
+            raise NameError("Unrecognized EBML element name with no 'id' "
+                            "attribute in XML: %s" % xmlEl.tag)
+        cls = core.UnknownElement
+        encId = encoding.encodeId(int(eid, 16))
+        cls.id = int(eid, 16)
+
+    return cls, encId
+
+
+def _getXmlSizeLength(xmlEl, sizeLength: Optional[int] = None) -> int:
+    """ Helper function to get the length of a master element's size
+        descriptor, from the XML element's attributes or the default.
+        See `xmlElement2ebml()`.
+    """
+    sl = xmlEl.get('sizeLength', None)
+    if sl is not None:
+        return int(sl)
+    elif sizeLength is not None:
+        return sizeLength
+
+    s = xmlEl.get('size', None)
+    if s is not None:
+        return encoding.getLength(int(s))
+    return 4
+
+
 def xmlElement2ebml(xmlEl,
                     ebmlFile: BinaryIO,
                     schema: core.Schema,
@@ -236,39 +403,10 @@ def xmlElement2ebml(xmlEl,
         # (Probably) a comment; disregard.
         return 0
 
-    try:
-        cls = schema[xmlEl.tag]
-        encId = encoding.encodeId(cls.id)
-    except (KeyError, AttributeError):
-        # Element name not in schema. Go ahead if allowed (`unknown` is `True`)
-        # and the XML element specifies an ID,
-        if not unknown:
-            raise NameError("Unrecognized EBML element name: %s" % xmlEl.tag)
-
-        eid = xmlEl.get('id', None)
-        if eid is None:
-            raise NameError("Unrecognized EBML element name with no 'id' "
-                            "attribute in XML: %s" % xmlEl.tag)
-        cls = core.UnknownElement
-        encId = encoding.encodeId(int(eid, 16))
-        cls.id = int(eid, 16)
-
-    codec = xmlEl.get('encoding', 'base64')
-
-    if sizeLength is None:
-        sl = xmlEl.get('sizeLength', None)
-        if sl is None:
-            s = xmlEl.get('size', None)
-            if s is not None:
-                sl = encoding.getLength(int(s))
-            else:
-                sl = 4
-        else:
-            sl = int(sl)
-    else:
-        sl = xmlEl.get('sizeLength', sizeLength)
+    cls, encId = _getXmlElementType(xmlEl, schema, unknown)
 
     if issubclass(cls, core.MasterElement):
+        sl = _getXmlSizeLength(xmlEl, sizeLength)
         ebmlFile.write(encId)
         sizePos = ebmlFile.tell()
         ebmlFile.write(encoding.encodeSize(None, sl))
@@ -281,10 +419,14 @@ def xmlElement2ebml(xmlEl,
         ebmlFile.seek(endPos)
         return len(encId) + (endPos - sizePos)
 
-    elif issubclass(cls, core.BinaryElement):
-        val = xml_codecs.BINARY_CODECS[codec].decode(xmlEl.text)
+    codec = xmlEl.get('encoding', 'base64')
+
+    if issubclass(cls, core.BinaryElement):
+        from .xml_codecs import BINARY_CODECS
+        val = BINARY_CODECS[codec].decode(xmlEl.text)
     elif issubclass(cls, (core.IntegerElement, core.FloatElement)):
-        val = ast.literal_eval(xmlEl.get('value'))
+        from ast import literal_eval
+        val = literal_eval(xmlEl.get('value'))
     else:
         val = cls.dtype(xmlEl.get('value'))
 
@@ -300,16 +442,25 @@ def xmlElement2ebml(xmlEl,
     return len(encoded)
 
 
+def _iterXmlTree(xmlEl):
+    """ Generate ``start`` and ``end`` events for an already-parsed XML
+        element and its children, like `ElementTree.iterparse()`.
+    """
+    yield 'start', xmlEl
+    for chEl in xmlEl:
+        yield from _iterXmlTree(chEl)
+    yield 'end', xmlEl
+
+
 def xml2ebml(xmlFile,
              ebmlFile: BinaryIO,
              schema: Union[str, Path, core.Schema],
              sizeLength: Optional[int] = None,
              headers: bool = True,
              unknown: bool = True):
-    """ Convert an XML file to EBML.
-
-        :todo: Convert XML on the fly, rather than parsing it first, allowing
-            for the conversion of arbitrarily huge files.
+    """ Convert an XML file to EBML. XML files are converted as they are
+        parsed (using `ElementTree.iterparse()`), with processed XML elements
+        discarded, allowing the conversion of arbitrarily huge files.
 
         :param xmlFile: The XML source. Can be a filename, an open file-like
             stream, or a parsed XML document.
@@ -322,7 +473,7 @@ def xml2ebml(xmlFile,
             element. If an XML element has a ``sizeLength`` attribute, it will
             override this.
         :param headers: If `True`, generate the standard ``EBML`` EBML
-            element if the XML document does not contain one.
+            element if the XML document does not start with one.
         :param unknown: If `True`, unknown element names will be allowed,
             provided their XML elements include an ``id`` attribute with the
             EBML ID (in hexadecimal).
@@ -335,42 +486,102 @@ def xml2ebml(xmlFile,
     else:
         openedEbml = False
 
+    from xml.etree import ElementTree as ET
+
     if not isinstance(schema, core.Schema):
         schema = core.loadSchema(schema)
 
     if isinstance(xmlFile, ET.Element):
         # Already a parsed XML element
-        xmlRoot = xmlFile
+        events = _iterXmlTree(xmlFile)
+        parsed = True
     elif isinstance(xmlFile, ET.ElementTree):
         # Already a parsed XML document
-        xmlRoot = xmlFile.getroot()
+        events = _iterXmlTree(xmlFile.getroot())
+        parsed = True
     else:
-        xmlDoc = ET.parse(xmlFile)
-        xmlRoot = xmlDoc.getroot()
-
-    if xmlRoot.tag not in schema and xmlRoot.tag != schema.document.__name__:
-        raise NameError("XML element %s not an element or document in "
-                        "schema %s (wrong schema)" % (xmlRoot.tag, schema.name))
+        events = ET.iterparse(xmlFile, events=('start', 'end'))
+        parsed = False
 
+    docName = schema.document.__name__
     headers = headers and 'EBML' in schema
-    if headers and 'EBML' not in (el.tag for el in xmlRoot):
-        pos = ebmlFile.tell()
+    headerDepth = 0
+    startPos = ebmlFile.tell()
+
+    def _writeHeaders():
         cls = schema.document
         ebmlFile.write(cls.encodePayload(cls._createHeaders()))
-        numBytes = ebmlFile.tell() - pos
-    else:
-        numBytes = 0
 
-    if xmlRoot.tag == schema.document.__name__:
-        for el in xmlRoot:
-            numBytes += xmlElement2ebml(el, ebmlFile, schema, sizeLength,
-                                        unknown=unknown)
-    else:
-        numBytes += xmlElement2ebml(xmlRoot, ebmlFile, schema, sizeLength,
-                                    unknown=unknown)
+    # The XML elements being converted, each with the position and length of
+    # its EBML size (for master elements), and its EBML element type (`None`
+    # for anything inside a non-master element, which is ignored).
+    stack = []
+
+    try:
+        for event, xmlEl in events:
+            if not isinstance(xmlEl.tag, (str, bytes, bytearray)):
+                # (Probably) a comment; disregard.
+                continue
+
+            if event == 'start':
+                if not stack:
+                    if xmlEl.tag == docName:
+                        headerDepth = 1
+                        stack.append((xmlEl, None, sizeLength, schema.document))
+                        continue
+                    elif xmlEl.tag not in schema:
+                        raise NameError("XML element %s not an element or "
+                                        "document in schema %s (wrong schema)"
+                                        % (xmlEl.tag, schema.name))
+                    headerDepth = 0
+                    parentSl = sizeLength
+                else:
+                    _, _, parentSl, parentCls = stack[-1]
+                    if parentCls is None or not issubclass(parentCls, core.MasterElement):
+                        stack.append((xmlEl, None, None, None))
+                        continue
+
+                if headers and len(stack) == headerDepth:
+                    headers = False
+                    if xmlEl.tag != 'EBML':
+                        _writeHeaders()
+
+                cls, encId = _getXmlElementType(xmlEl, schema, unknown)
+                if issubclass(cls, core.MasterElement):
+                    sl = _getXmlSizeLength(xmlEl, parentSl)
+                    ebmlFile.write(encId)
+                    stack.append((xmlEl, ebmlFile.tell(), sl, cls))
+                    ebmlFile.write(encoding.encodeSize(None, sl))
+                else:
+                    stack.append((xmlEl, None, parentSl, cls))
+                continue
+
+            _, sizePos, sl, cls = stack.pop()
+
+            if sizePos is not None:
+                # End of a master element: write its actual size
+                endPos = ebmlFile.tell()
+                ebmlFile.seek(sizePos)
+                ebmlFile.write(encoding.encodeSize(endPos - sizePos - sl, sl))
+                ebmlFile.seek(endPos)
+            elif cls is not None and cls is not schema.document:
+                xmlElement2ebml(xmlEl, ebmlFile, schema, sl, unknown=unknown)
 
-    if openedEbml:
-        ebmlFile.close()
+            if not parsed:
+                # Discard the converted XML, keeping memory use flat.
+                xmlEl.clear()
+                if stack:
+                    stack[-1][0].remove(xmlEl)
+
+        if headers:
+            # Empty document
+            _writeHeaders()
+
+        numBytes = ebmlFile.tell() - startPos
+
+    finally:
+        if openedEbml:
+            ebmlFile.close()
 
     return numBytes
 
@@ -398,7 +609,9 @@ def loadXml(xmlFile,
         xml2ebml(xmlFile, ebmlFile, schema)
         ebmlFile.seek(0)
     else:
-        ebmlFile = tempfile.mktemp() if ebmlFile is None else ebmlFile
+        if ebmlFile is None:
+            import tempfile
+            ebmlFile = tempfile.mktemp()
         xml2ebml(xmlFile, ebmlFile, schema)
 
     return schema.load(ebmlFile)
@@ -431,10 +644,12 @@ def pprint(el: core.Element,
     """
     tab = indent * _depth
 
-    if isinstance(binary_codec, str):
-        binary_codec = xml_codecs.BINARY_CODECS[binary_codec]()
-    if isinstance(void_codec, str):
-        void_codec = xml_codecs.BINARY_CODECS[void_codec]()
+    if isinstance(binary_codec, str) or isinstance(void_codec, str):
+        from . import xml_codecs
+        if isinstance(binary_codec, str):
+            binary_codec = xml_codecs.BINARY_CODECS[binary_codec]()
+        if isinstance(void_codec, str):
+            void_codec = xml_codecs.BINARY_CODECS[void_codec]()
 
     if _depth == 0:
         if values:
@@ -533,3 +748,374 @@ def flatiter(element, depth=None):
 
     for child in _flatiter(element, depth, True):
         yield child
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+# Defaults for combining reads in `readRanges()` and `readMany()`: the
+# largest gap between two ranges read as one, and the largest single read.
+READ_MAX_GAP = 64 * 1024
+READ_MAX_SIZE = 1024 * 1024
+
+
+def readRanges(stream: BinaryIO,
+               ranges: List[Tuple[int, int]],
+               maxGap: int = READ_MAX_GAP,
+               maxSize: int = READ_MAX_SIZE) -> List[bytes]:
+    """ Read many ranges of bytes from a stream, with as few (and as
+        sequential) reads as possible. The ranges are sorted by offset, and
+        ranges that overlap or are close together are read at once.
+
+        :param stream: The stream from which to read.
+        :param ranges: A list of ranges to read, as (offset, size) tuples.
+        :param maxGap: The largest gap between two ranges that will be read
+            (and discarded) to combine them into one read.
+        :param maxSize: The largest read to make when combining ranges.
+            Ranges larger than this are still read in full.
+        :return: A list of the data in each range, in the order given.
+    """
+    results = [None] * len(ranges)
+
+    for start, data, indices in _iterReads(stream, ranges, maxGap, maxSize):
+        if len(indices) == 1:
+            results[indices[0]] = data
+        else:
+            for idx in indices:
+                offset, size = ranges[idx]
+                results[idx] = data[offset - start:offset - start + size]
+
+    return results
+
+
+def _iterReads(stream: BinaryIO,
+               ranges: List[Tuple[int, int]],
+               maxGap: int = READ_MAX_GAP,
+               maxSize: int = READ_MAX_SIZE) -> Iterator[Tuple[int, bytes, List[int]]]:
+    """ Read ranges of bytes from a stream, combining ranges that overlap
+        or are close together into one read. Used by `readRanges()`, and by
+        functions that process each range's data without keeping it all.
+
+        :param stream: The stream from which to read.
+        :param ranges: A list of ranges to read, as (offset, size) tuples.
+        :param maxGap: The largest gap between two ranges that will be read
+            (and discarded) to combine them into one read.
+        :param maxSize: The largest read to make when combining ranges.
+            Ranges larger than this are still read in full.
+        :return: A generator yielding, for each read, its offset, the data
+            read, and the indices (in `ranges`) of the ranges it contains,
+            in order of offset. Reads are made in order of offset.
+    """
+    order = sorted(range(len(ranges)), key=lambda idx: ranges[idx][0])
+
+    i = 0
+    while i < len(order):
+        start, size = ranges[order[i]]
+        end = start + size
+        j = i + 1
+        while j < len(order):
+            nextStart, nextSize = ranges[order[j]]
+            nextEnd = max(end, nextStart + nextSize)
+            if nextStart - end > maxGap or nextEnd - start > maxSize:
+                break
+            end = nextEnd
+            j += 1
+
+        stream.seek(start)
+        yield start, stream.read(end - start), order[i:j]
+        i = j
+
+
+def readMany(elements: List[core.Element],
+             raw: bool = False,
+             maxGap: int = READ_MAX_GAP,
+             maxSize: int = READ_MAX_SIZE) -> List[Any]:
+    """ Read the values of many elements, with as few (and as sequential)
+        reads as possible, rather than one seek and read per element (see
+        `readRanges()`). Parsed values are cached, as when getting an
+        element's `value`.
+
+        :param elements: The elements to read. They may be from different
+            documents.
+        :param raw: If `True`, get each element's raw binary value (like
+            `Element.getRawValue()`) rather than its parsed value.
+        :param maxGap: The largest gap between two elements' payloads that
+            will be read (and discarded) to combine them into one read.
+        :param maxSize: The largest read to make when combining payloads.
+        :return: A list of the elements' values, in the order given.
+    """
+    results = [None] * len(elements)
+
+    # Elements to read, grouped by stream: (stream, [(element index, ...)])
+    streams = {}
+    for idx, el in enumerate(elements):
+        if not raw:
+            if el._value is not None:
+                results[idx] = el._value
+                continue
+            elif isinstance(el, core.MasterElement):
+                results[idx] = el.value
+                continue
+        streams.setdefault(id(el.stream), (el.stream, []))[1].append(idx)
+
+    for stream, indices in streams.values():
+        data = readRanges(stream,
+                          [(elements[idx].payloadOffset, elements[idx].size)
+                           for idx in indices],
+                          maxGap=maxGap, maxSize=maxSize)
+        for idx, payload in zip(indices, data):
+            if raw:
+                results[idx] = payload
+            else:
+                el = elements[idx]
+                el._value = el.parse(BytesIO(payload), el.size)
+                results[idx] = el._value
+
+    return results
+
+
+# ==============================================================================
+#
+# ==============================================================================
+
+# Size of the chunks used when copying element data without OS support.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _copyRange(src: BinaryIO, dst: BinaryIO, offset: int, size: int,
+               chunkSize: int = COPY_CHUNK_SIZE) -> int:
+    """ Copy a range of bytes from one file to another, in the kernel if
+        possible (using `os.copy_file_range()` or `os.sendfile()`), falling
+        back to reading and writing chunks. Data is written at the
+        destination's current position, which is advanced.
+
+        :param src: The source file (or file-like stream).
+        :param dst: The destination file (or file-like stream).
+        :param offset: The position of the data in the source.
+        :param size: The number of bytes to copy.
+        :param chunkSize: The size of each read, if the data can't be
+            copied by the OS.
+        :return: The number of bytes copied.
+    """
+    import io
+    import os
+
+    copied = 0
+
+    try:
+        dst.flush()
+        srcFd = src.fileno()
+        dstFd = dst.fileno()
+        dstPos = dst.tell()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        srcFd = dstFd = None
+
+    if srcFd is not None:
+        # Note: both functions can refuse certain kinds of files (e.g., across
+        # filesystems, or special files); they fall back to the next method.
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while copied < size:
+                    n = os.copy_file_range(srcFd, dstFd, size - copied,
+                                           offset + copied, dstPos + copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+
+        if copied < size and hasattr(os, 'sendfile'):
+            try:
+                os.lseek(dstFd, dstPos + copied, os.SEEK_SET)
+                while copied < size:
+                    n = os.sendfile(dstFd, srcFd, offset + copied, size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+
+        dst.seek(dstPos + copied)
+
+    if copied < size:
+        src.seek(offset + copied)
+        while copied < size:
+            data = src.read(min(chunkSize, size - copied))
+            if not data:
+                break
+            dst.write(data)
+            copied += len(data)
+
+    if copied < size:
+        raise IOError("Could only copy %d of %d bytes at offset %d" %
+                      (copied, size, offset))
+
+    return copied
+
+
+class Writer(object):
+    """ Writes an EBML document to a file incrementally. Elements can be
+        encoded from values or copied verbatim (without being parsed) from
+        another document, and master elements can be written piecemeal,
+        their size being filled in when they are ended.
+    """
+
+    def __init__(self,
+                 out: Union[str, Path, BinaryIO],
+                 schema: Union[str, core.Schema, None] = None):
+        """ Constructor.
+
+            :param out: The file name or (seekable) stream to write.
+            :param schema: The `Schema` (or schema name) used to encode
+                elements written by name. Optional if only copying elements.
+        """
+        if isinstance(out, (str, Path)):
+            self.stream = open(out, 'wb')
+            self._ownsStream = True
+        else:
+            self.stream = out
+            self._ownsStream = False
+
+        if schema is not None and not isinstance(schema, core.Schema):
+            schema = core.loadSchema(schema)
+        self.schema = schema
+
+        # Unfinished master elements: (element type, size offset, payload offset)
+        self._masters = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ End any unfinished master elements, and close the output file
+            (if it was opened by the `Writer`).
+        """
+        while self._masters:
+            self.endMaster()
+        if self._ownsStream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def _getType(self, name: Union[str, int, type]) -> type:
+        """ Get an element type, by name or ID (or the type itself). """
+        if isinstance(name, type):
+            return name
+        if self.schema is None:
+            raise ValueError("Cannot write element %r by name: Writer has no "
+                             "schema" % name)
+        return self.schema[name]
+
+    def write(self, name: Union[str, int, type], value: Any) -> int:
+        """ Encode and write an element.
+
+            :param name: The element's name, ID, or `Element` subclass.
+            :param value: The element's value.
+            :return: The number of bytes written.
+        """
+        data = self._getType(name).encode(value)
+        self.stream.write(data)
+        return len(data)
+
+    def startMaster(self, name: Union[str, int, type]) -> int:
+        """ Start writing a master element. Subsequently written elements
+            will be its children until `endMaster()` is called.
+
+            :param name: The element's name, ID, or `Element` subclass.
+            :return: The number of bytes written (the element's header).
+        """
+        etype = self._getType(name)
+        header = encoding.encodeId(etype.id)
+        self.stream.write(header)
+        sizeOffset = self.stream.tell()
+        self.stream.write(encoding.encodeSize(0, 8))  # placeholder
+        self._masters.append((etype, sizeOffset, self.stream.tell()))
+        return len(header) + 8
+
+    def endMaster(self) -> int:
+        """ Finish writing the most recently started master element, writing
+            its actual size.
+
+            :return: The size of the element's payload.
+        """
+        _etype, sizeOffset, payloadOffset = self._masters.pop()
+        end = self.stream.tell()
+        size = end - payloadOffset
+        self.stream.seek(sizeOffset)
+        self.stream.write(encoding.encodeSize(size, 8))
+        self.stream.seek(end)
+        return size
+
+    def copyRaw(self, element: core.Element) -> int:
+        """ Copy an element verbatim from another document, including all its
+            children (if a master element). The data is not parsed, and is
+            copied by the operating system if possible.
+
+            :param element: The element to copy.
+            :return: The number of bytes written.
+        """
+        start = element.offset
+        size = element.payloadOffset + element.size - start
+        return _copyRange(element.stream, self.stream, start, size)
+
+
+def extract(doc: core.Document,
+            selector: Union[str, Callable[[core.Element], bool], List[str]],
+            out: Union[str, Path, BinaryIO, Writer],
+            containers: Union[List[str], Tuple[str]] = (),
+            headers: bool = True) -> int:
+    """ Copy selected elements from an EBML document into a new file. The
+        selected elements are copied verbatim (see `Writer.copyRaw()`), so
+        this is much faster than decoding and re-encoding them. Note that
+        any data referring to elements' positions in the file (e.g.,
+        indices) is copied as-is.
+
+        :param doc: The source `Document`.
+        :param selector: The elements to copy: an element name, a list of
+            names, or a function that takes an `Element` and returns `True`
+            if it should be copied.
+        :param out: The output file name, stream, or `Writer`.
+        :param containers: The names of master elements to recreate in the
+            output, and whose children should be selected from (rather than
+            being copied or dropped entirely). Their sizes are recomputed.
+        :param headers: If `True`, copy the source document's ``EBML``
+            header element.
+        :return: The number of bytes written.
+    """
+    if isinstance(selector, str):
+        selector = (selector,)
+    if not callable(selector):
+        names = frozenset(selector)
+        selector = lambda el: el.name in names  # noqa: E731
+
+    writer = out if isinstance(out, Writer) else Writer(out, doc.schema)
+    start = writer.stream.tell()
+
+    def _extract(parent):
+        for el in parent:
+            if el.name == 'EBML' and parent is doc:
+                continue
+            elif selector(el):
+                writer.copyRaw(el)
+            elif el.name in containers and isinstance(el, core.MasterElement):
+                writer.startMaster(type(el))
+                _extract(el)
+                writer.endMaster()
+
+    try:
+        if headers:
+            doc.stream.seek(doc.offset)
+            el, _ = doc.parseElement(doc.stream, nocache=True)
+            if el.name == 'EBML':
+                writer.copyRaw(el)
+        _extract(doc)
+        size = writer.stream.tell() - start
+    finally:
+        if writer is not out:
+            writer.close()
+
+    return size
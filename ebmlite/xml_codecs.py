@@ -4,8 +4,8 @@ Classes for various means of encoding/decoding binary data to/from XML.
 Note: the class docstrings will be shown in the `ebml2xml` help text.
 """
 
-import base64
-from io import BytesIO, StringIO
+from binascii import a2b_base64, b2a_base64
+import re
 from typing import BinaryIO, Optional, Union
 
 
@@ -113,37 +113,31 @@ class Base64Codec(BinaryCodec):
         if isinstance(data, str):
             data = data.encode('utf8')
 
-        result = base64.encodebytes(data).decode()
-        if stream is None:
-            out = StringIO()
+        cols = self.cols
+        if not cols:
+            result = b2a_base64(data, newline=False).decode()
         else:
-            out = stream
-
-        if self.cols == 76:
-            # Default width of a base64 line; use existing newlines
-            result = "\n" + result
-            if indent:
-                result = result.replace('\n', '\n' + indent)
-            if stream is not None:
-                return out.write(result)
-            return result
-
-        result = result.replace('\n', '')
-
-        if self.cols is None:
-            if stream is not None:
-                return out.write(result)
-            return result
-
-        numbytes = 0
-        for chunk in range(0, len(result), self.cols):
-            numbytes += out.write('\n')
-            numbytes += out.write(indent) + out.write(result[chunk:chunk+self.cols])
-
-        if stream is None:
-            return out.getvalue()
+            if cols % 4:
+                # Lines don't end on whole groups of bytes; split the text.
+                encoded = b2a_base64(data, newline=False)
+                lines = [encoded[i:i+cols] for i in range(0, len(encoded), cols)]
+            else:
+                step = cols // 4 * 3
+                view = memoryview(data)
+                lines = [b2a_base64(view[i:i+step], newline=False)
+                         for i in range(0, len(view), step)]
+
+            sep = ('\n' + indent).encode()
+            result = sep + sep.join(lines) if lines else b''
+            if cols == 76:
+                # At the default width (that of `base64.encodebytes()`),
+                # the text also ends with a newline.
+                result += sep
+            result = result.decode()
 
-        return numbytes
+        if stream is not None:
+            return stream.write(result)
+        return result
 
 
     @classmethod
@@ -166,7 +160,7 @@ class Base64Codec(BinaryCodec):
         if isinstance(data, str):
             data = data.encode('utf8')
 
-        result = base64.decodebytes(data)
+        result = a2b_base64(data)
 
         if stream is not None:
             return stream.write(result)
@@ -178,6 +172,10 @@ class Base64Codec(BinaryCodec):
 #
 # ==============================================================================
 
+# Offsets written at the start of each row of hex (i.e., ``[000123]``)
+_HEX_OFFSET = re.compile(rb'\[[^\]\s]*\]')
+
+
 class HexCodec(BinaryCodec):
     """ Encoder/decoder for binary data as hexadecimal format to/from text.
         Encoded text is multiple columns of bytes/words (default is 16 columns,
@@ -228,29 +226,41 @@ class HexCodec(BinaryCodec):
         if not isinstance(indent, str):
             indent = indent.decode()
 
-        if stream is None:
-            out = StringIO()
-        else:
-            out = stream
+        width = self.width
+        cols = self.cols
 
-        newline = bool(self.cols)
-        offsets = self.offsets and newline
+        if not data:
+            result = ''
+        elif not cols:
+            result = ' ' + self._hexRow(data, 0, width)
+        else:
+            view = memoryview(data)
+            rows = []
+            for i in range(0, len(view), cols):
+                if self.offsets:
+                    rows.append('\n%s[%06d] ' % (indent, i + offset))
+                else:
+                    rows.append('\n' + indent)
+                rows.append(self._hexRow(view[i:i+cols], i, width))
+            result = ''.join(rows)
 
-        numbytes = 0
-        for i, b in enumerate(data):
-            if newline and not i % self.cols:
-                numbytes += out.write('\n')
-                numbytes += out.write(indent)
-                if offsets:
-                    numbytes += out.write('[{:06d}] '.format(i + offset))
-            elif not i % self.width:
-                numbytes += out.write(' ')
-            numbytes += out.write('{:02x}'.format(b))
+        if stream is not None:
+            return stream.write(result)
+        return result
 
-        if stream is None:
-            return out.getvalue()
 
-        return numbytes
+    @staticmethod
+    def _hexRow(data: bytes, start: int, width: int) -> str:
+        """ Render a row of data in hexadecimal, with a space before each
+            column (except the first). Columns are aligned to multiples of
+            `width` bytes from the start of the data, not the row.
+        """
+        if not width:
+            return data.hex()
+        first = -start % width
+        if not first or first >= len(data):
+            return data.hex(' ', -width)
+        return data[:first].hex() + ' ' + data[first:].hex(' ', -width)
 
 
     @classmethod
@@ -267,12 +277,6 @@ class HexCodec(BinaryCodec):
             :returns: If no `stream`, the decoded binary data. If `stream`,
                 the number of bytes written.
         """
-        if stream is None:
-            out = BytesIO()
-        else:
-            out = stream
-        numbytes = 0
-
         if not data:
             if stream is None:
                 return b''
@@ -282,16 +286,20 @@ class HexCodec(BinaryCodec):
         if isinstance(data, str):
             data = data.encode('utf8')
 
-        for word in data.split():
-            if b'[' in word or b']' in word:
-                continue
-            for i in range(0, len(word), 2):
-                numbytes += out.write((int(word[i:i+2], 16).to_bytes(1, 'big')))
-
-        if stream is None:
-            return out.getvalue()
+        # Remove offsets (e.g., ``[000123]``), and decode everything at once.
+        try:
+            result = bytes.fromhex(_HEX_OFFSET.sub(b'', data).decode('ascii'))
+        except ValueError:
+            # Irregular data, e.g. words with an odd number of digits (which
+            # end with a single-digit byte). Decode one word at a time.
+            words = [w for w in data.split() if b'[' not in w and b']' not in w]
+            result = b''.join(bytes.fromhex((w[:-1] + b'0' + w[-1:]).decode())
+                              if len(w) % 2 else bytes.fromhex(w.decode())
+                              for w in words)
 
-        return numbytes
+        if stream is not None:
+            return stream.write(result)
+        return result
 
 
 # ==============================================================================
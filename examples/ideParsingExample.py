@@ -1,7 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
-from . import core
+from ebmlite import core, ide
 
 
 def getTypeMatch(el, elType):
@@ -43,24 +43,13 @@ schId = 0
 # Get the channel that we want to work with from the list of channels.
 schEl = next(sch for sch in chEl['SubChannel'] if sch['SubChannelID'] == schId)
 
-# Collect all the channelDataBlocks into a list.
-chDataType = schema[0xA1]
-dataBlocks = [x for x in ideRoot if type(x) == chDataType]
+# Read the channel's data into a structured array (one field per subchannel),
+# and convert it to a regular 2D array.
+rawData = ide.readChannelData(ideRoot, [chId])[chId]
+rawData = np.column_stack([rawData[name] for name in rawData.dtype.names])
 
-# Filter the dataBlocks to only include blocks for the channel we want.
-chIdType = schema[0xB0]
-dataBlocks = [block for block in dataBlocks if getTypeMatch(block, chIdType).value == chId]
-
-# Get the raw data from each ChannelDataBlock, and convert to an array.
-rawData = ''
-payloadType = schema[0xB2]
-for block in dataBlocks:
-    rawData += block.dump()['ChannelDataPayload']
-rawData = np.fromstring(str(rawData), dtype=chEl['ChannelFormat'][1])
-rawData.resize((len(rawData)//3, 3))
-
-# Calculate the time stamps of the data.
-times = np.arange(len(rawData))/5000.0
+# Calculate the time stamps of the data, in seconds, from the blocks' timecodes.
+times = ide.sampleTimes(ideRoot, [chId])[chId]
 
 # Plot the raw data from the IDE file.
 h = plt.plot(times, rawData[:, schId])
@@ -33,6 +33,11 @@ TEST_REQUIRES = [
     'pytest-console-scripts',
     'pytest-xdist[psutil]',
     'filelock',
+    'numpy',
+    ]
+
+NUMPY_REQUIRES = [
+    'numpy',
     ]
 
 setuptools.setup(
@@ -65,10 +70,13 @@ setuptools.setup(
             'ebml2xml=ebmlite.tools.ebml2xml:main',
             'xml2ebml=ebmlite.tools.xml2ebml:main',
             'list-schemata=ebmlite.tools.list_schemata:main',
+            'ebml-synth=ebmlite.tools.synth:main',
+            'mkv-cut=ebmlite.tools.mkv_cut:main',
         ]},
         test_suite='tests',
         install_requires=INSTALL_REQUIRES,
         extras_require={
             'test': INSTALL_REQUIRES + TEST_REQUIRES,
+            'numpy': INSTALL_REQUIRES + NUMPY_REQUIRES,
             },
 )
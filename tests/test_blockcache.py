@@ -0,0 +1,125 @@
+import os.path
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from io import BytesIO
+
+from ebmlite import core
+from ebmlite.blockcache import BlockCacheStream
+from ebmlite.threaded_file import ThreadAwareFile
+
+
+class testBlockCache(unittest.TestCase):
+    """ Tests for the block cache stream wrapper.
+    """
+
+    def setUp(self):
+        self.data = bytes(random.Random(0).getrandbits(8) for _ in range(10000))
+
+
+    def testRead(self):
+        """ Test reading at random positions, compared to the raw stream. """
+        raw = BytesIO(self.data)
+        cached = BlockCacheStream(BytesIO(self.data), blockSize=256, capacity=4)
+        rng = random.Random(1)
+        for _ in range(2000):
+            pos = rng.randrange(0, len(self.data) + 100)
+            size = rng.choice((1, 2, 4, 8, 300, 700))
+            self.assertEqual(cached.seek(pos), raw.seek(pos))
+            self.assertEqual(cached.read(size), raw.read(size))
+            self.assertEqual(cached.tell(), raw.tell())
+            self.assertLessEqual(len(cached._blocks), 4)
+
+        self.assertEqual(cached.seek(-10, 2), raw.seek(-10, 2))
+        self.assertEqual(cached.read(), raw.read())
+        cached.seek(5)
+        cached.seek(5, 1)
+        self.assertEqual(cached.tell(), 10)
+        buf = bytearray(20)
+        self.assertEqual(cached.readinto(buf), 20)
+        self.assertEqual(buf, self.data[10:30])
+        self.assertGreater(cached.hits, 0)
+
+
+    def testReadAhead(self):
+        """ Test reading several blocks at once when reading sequentially. """
+        cached = BlockCacheStream(BytesIO(self.data), blockSize=100, readAhead=10)
+        result = bytearray()
+        while True:
+            data = cached.read(10)
+            if not data:
+                break
+            result.extend(data)
+        self.assertEqual(result, self.data)
+        # First block, second block (starting read-ahead), then groups of 10
+        self.assertLessEqual(cached.misses, 13)
+
+
+    def testWrite(self):
+        """ Test that writing discards the affected cached blocks. """
+        cached = BlockCacheStream(BytesIO(self.data), blockSize=256)
+        cached.seek(1000)
+        cached.read(10)
+        cached.seek(1005)
+        cached.write(b'abc')
+        cached.seek(1000)
+        self.assertEqual(cached.read(10), self.data[1000:1005] + b'abc' + self.data[1008:1010])
+
+        cached.seek(0, 2)
+        cached.write(b'xyz')
+        cached.seek(-6, 2)
+        self.assertEqual(cached.read(), self.data[-3:] + b'xyz')
+
+        cached.truncate(500)
+        cached.seek(490)
+        self.assertEqual(cached.read(20), self.data[490:500])
+
+
+    def testThreads(self):
+        """ Test that each thread has its own stream position. """
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir, ignore_errors=True)
+        filename = os.path.join(tempdir, 'data.bin')
+        with open(filename, 'wb') as f:
+            f.write(self.data)
+
+        cached = BlockCacheStream(ThreadAwareFile(filename, 'rb'), blockSize=128, capacity=8)
+        errors = []
+
+        def reader(seed):
+            rng = random.Random(seed)
+            for _ in range(500):
+                pos = rng.randrange(0, len(self.data))
+                cached.seek(pos)
+                if cached.read(16) != self.data[pos:pos + 16]:
+                    errors.append(pos)
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        cached._stream.closeAll()
+        self.assertEqual(errors, [])
+
+
+    def testDocument(self):
+        """ Test loading a document through a block cache. """
+        schema = core.loadSchema('matroska.xml')
+        expected = schema.load('./tests/video-1.mkv').dump()
+
+        doc = schema.load(ThreadAwareFile('./tests/video-1.mkv'), blockCache=True)
+        self.assertIsInstance(doc.stream, BlockCacheStream)
+        self.assertEqual(doc.dump(), expected)
+        self.assertGreater(doc.stream.hits, doc.stream.misses)
+        doc.stream.closeAll()
+
+        with schema.load('./tests/video-1.mkv', blockCache={'blockSize': 4096, 'readAhead': 4}) as doc:
+            self.assertEqual(doc.stream.blockSize, 4096)
+            self.assertEqual(doc.dump(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
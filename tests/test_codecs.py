@@ -1,6 +1,6 @@
 import random
 import unittest
-from io import BytesIO
+from io import BytesIO, StringIO
 
 from ebmlite import core, util, xml_codecs
 
@@ -33,6 +33,43 @@ class testCodecs(unittest.TestCase):
              "IgnoreCodec.decode() returned content, should have returned b''")
 
 
+    def test_formatting(self):
+        """ Test the layout of encoded data with different arguments. """
+        data = bytes(range(10))
+
+        hexCodec = xml_codecs.HexCodec
+        self.assertEqual(hexCodec(width=2, cols=4).encode(data, indent='\t', offset=100),
+                         '\n\t[000100] 0001 0203\n\t[000104] 0405 0607\n\t[000108] 0809')
+        # Columns are aligned to the start of the data, not the row
+        self.assertEqual(hexCodec(width=3, cols=5, offsets=False).encode(data),
+                         '\n000102 0304\n05 060708 09')
+        self.assertEqual(hexCodec(cols=None).encode(data),
+                         ' 0001 0203 0405 0607 0809')
+        self.assertEqual(hexCodec().encode(b''), '')
+
+        b64Codec = xml_codecs.Base64Codec
+        self.assertEqual(b64Codec().encode(bytes(60), indent='  '),
+                         '\n  ' + 'A' * 76 + '\n  AAAA\n  ')
+        self.assertEqual(b64Codec(cols=10).encode(bytes(10)), '\nAAAAAAAAAA\nAAAA==')
+        self.assertEqual(b64Codec(cols=None).encode(bytes(10)), 'AAAAAAAAAAAAAA==')
+
+        # Writing to a stream
+        out = StringIO()
+        self.assertEqual(hexCodec().encode(data, stream=out), len(out.getvalue()))
+        self.assertEqual(out.getvalue(), hexCodec().encode(data))
+
+
+    def test_hex_decode(self):
+        """ Test decoding hex text with irregular formatting. """
+        decode = xml_codecs.HexCodec.decode
+        self.assertEqual(decode('[000000] 0001 02\n\t[000003] 0304'), bytes(range(5)))
+        self.assertEqual(decode('a b c1 ff'), b'\x0a\x0b\xc1\xff')
+        self.assertEqual(decode('abc 01'), b'\xab\x0c\x01')
+        out = BytesIO()
+        self.assertEqual(decode('0001 02', stream=out), 3)
+        self.assertEqual(out.getvalue(), b'\x00\x01\x02')
+
+
     def test_xml(self):
         """ Test converting to/from XML with different codecs. Note: this
             only tests whether the product using different codecs is valid.
@@ -1,10 +1,13 @@
 import collections
 import datetime
 import os.path
+import shutil
 import sys
+import tempfile
 import types
 import unittest
 from io import BytesIO
+from unittest import mock
 
 from ebmlite.core import listSchemata, loadSchema, parseSchema, \
     BinaryElement, DateElement, Element, FloatElement, IntegerElement, \
@@ -687,6 +690,132 @@ class testDocument(unittest.TestCase):
 
 
 
+    def testPatch(self):
+        """ Test patching element values in place. """
+
+        schema = loadSchema('./ebmlite/schemata/matroska.xml')
+        with open('./tests/video-1.mkv', 'rb') as f:
+            original = f.read()
+        stream = BytesIO(original)
+        doc = schema.load(stream)
+
+        def getInfo():
+            info = [el for el in doc[0] if el.name == 'Info'][0]
+            return {el.name: el for el in info}, [el.name for el in info]
+
+        info, names = getInfo()
+        infoSize = [el for el in doc[0] if el.name == 'Info'][0].size
+
+        # Fixed width and padded types
+        info['TimecodeScale'].patch(1000)
+        info['Duration'].patch(1.5)
+        info['MuxingApp'].patch('test')
+        with self.assertRaises(ValueError):
+            info['MuxingApp'].patch('much too long for the space')
+        with self.assertRaises(ValueError):
+            info['TimecodeScale'].patch(2 ** 32)
+
+        # Binary: smaller values are followed by a Void
+        info['SegmentUID'].patch(b'0123456789')
+        info['WritingApp'].patch('test')
+
+        self.assertEqual(len(stream.getvalue()), len(original))
+        newInfo, newNames = getInfo()
+        self.assertEqual(newNames, names[:4] + ['Void'] + names[4:])
+        self.assertEqual(newInfo['TimecodeScale'].value, 1000)
+        self.assertEqual(newInfo['Duration'].value, 1.5)
+        self.assertEqual(newInfo['MuxingApp'].value, 'test')
+        self.assertEqual(newInfo['WritingApp'].value, 'test')
+        self.assertEqual(newInfo['SegmentUID'].value, b'0123456789')
+        self.assertEqual(info['SegmentUID'].value, b'0123456789')
+        self.assertEqual([el for el in doc[0] if el.name == 'Info'][0].size,
+                         infoSize)
+
+        # Space too small for a Void: size descriptor is lengthened instead
+        stream = BytesIO(original)
+        doc = schema.load(stream)
+        info, _ = getInfo()
+        info['SegmentUID'].patch(b'0123456789abcde')
+        newInfo, newNames = getInfo()
+        self.assertEqual(newNames, names)
+        self.assertEqual(newInfo['SegmentUID'].value, b'0123456789abcde')
+        self.assertEqual(stream.getvalue()[len(original) // 2:],
+                         original[len(original) // 2:])
+
+        with self.assertRaises(TypeError):
+            doc[0].patch({})
+
+        # Read-only documents can't be patched
+        el = self.doc[0][0][0]
+        with self.assertRaises(IOError):
+            el.patch(el.value)
+
+        # Documents opened by name can be opened for writing
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, 'test.mkv')
+            with open(filename, 'wb') as f:
+                f.write(original)
+            with schema.load(filename, mode='r+b') as doc:
+                info = [el for el in doc[0] if el.name == 'Info'][0]
+                info[0].patch(1234)
+            with schema.load(filename) as doc:
+                info = [el for el in doc[0] if el.name == 'Info'][0]
+                self.assertEqual(info[0].value, 1234)
+
+
+
+    def testAppend(self):
+        """ Test appending root elements to a file. """
+
+        block = {'ChannelIDRef': 8, 'StartTimeCodeAbs': 1234,
+                 'ChannelDataPayload': b'\x01\x02\x03\x04\x05\x06'}
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            # New file: created, with header
+            filename = os.path.join(tempdir, 'new.ide')
+            with self.schema.openForAppend(filename) as doc:
+                self.assertEqual(doc.type, 'mide')
+                self.assertEqual(len(doc), 1)
+                el = doc.append('ChannelDataBlock', block)
+                self.assertEqual(el.dump(), block)
+                self.assertEqual(len(doc), 2)
+                self.assertEqual(doc.size, os.path.getsize(filename))
+
+                els = doc.append('ChannelDataBlock', [block, block])
+                self.assertEqual(len(els), 2)
+                self.assertEqual(len(doc), 4)
+
+                with self.assertRaises(ValueError):
+                    doc.append('ChannelIDRef', 1)  # not a root element
+
+            with self.schema.openForAppend(filename) as doc:
+                self.assertEqual([el.name for el in doc],
+                                 ['EBML'] + ['ChannelDataBlock'] * 3)
+                self.assertEqual(doc[3].dump(), block)
+
+            # Existing file: original content unchanged
+            filename = os.path.join(tempdir, 'existing.ide')
+            shutil.copy('./tests/SSX46714-doesnot.IDE', filename)
+            with open(filename, 'rb') as f:
+                original = f.read()
+            with self.schema.openForAppend(filename, headers=False) as doc:
+                length = len(doc)
+                doc.append('ChannelDataBlock', block)
+                self.assertEqual(len(doc), length + 1)
+            with open(filename, 'rb') as f:
+                self.assertTrue(f.read().startswith(original))
+
+            # Partial element at the end
+            with open(filename, 'ab') as f:
+                f.write(self.schema.encodes({'ChannelDataBlock': block})[:-3])
+            with self.assertRaises(IOError):
+                self.schema.openForAppend(filename)
+            with self.schema.openForAppend(filename, truncate=True, headers=False) as doc:
+                self.assertEqual(len(doc), length + 1)
+                self.assertEqual(doc[length].dump(), block)
+
+
+
 class testSchema(unittest.TestCase):
     """ Unit tests for ebmlite.core.Schema """
 
@@ -816,6 +945,99 @@ class testSchema(unittest.TestCase):
         SCHEMATA.update(schemata)
 
 
+    def testLoadSchemaCache(self):
+        """ Test loading schemata from the pre-parsed schema cache. """
+        from ebmlite import core
+
+        cachePath = core.CACHE_PATH
+        with tempfile.TemporaryDirectory() as tempdir:
+            try:
+                core.CACHE_PATH = os.path.join(tempdir, 'cache')
+                schemaFile = os.path.join(tempdir, 'mide_ide.xml')
+                shutil.copy('./ebmlite/schemata/mide_ide.xml', schemaFile)
+
+                schema1 = loadSchema(schemaFile, reload=True)
+                self.assertEqual(len(os.listdir(core.CACHE_PATH)), 1,
+                                 "loadSchema() did not write schema cache")
+
+                # Loading from the cache must not parse the XML
+                with mock.patch.object(core.Schema, '__init__',
+                                       side_effect=AssertionError):
+                    schema2 = loadSchema(schemaFile, reload=True)
+
+                self.assertIsNot(schema1, schema2)
+                self.assertEqual(schema1, schema2,
+                                 "Cached schema did not match loaded schema")
+                self.assertEqual(schema1.name, schema2.name)
+                self.assertEqual(schema1.children, schema2.children)
+                self.assertEqual(set(schema1.globals), set(schema2.globals))
+                for name, el in schema1.elementsByName.items():
+                    el2 = schema2[name]
+                    self.assertEqual(el.__bases__, el2.__bases__)
+                    self.assertEqual(el.children, el2.children)
+                    self.assertEqual(el.precache, el2.precache)
+
+                ide = schema2.load('./tests/SSX46714-doesnot.IDE')
+                self.assertEqual(ide.type, 'mide')
+
+                # Modifying the schema file invalidates the cache
+                with open(schemaFile, 'a') as f:
+                    f.write('\n')
+                with mock.patch.object(core.Schema, '__init__',
+                                       side_effect=AssertionError):
+                    with self.assertRaises(AssertionError):
+                        loadSchema(schemaFile, reload=True)
+
+            finally:
+                core.CACHE_PATH = cachePath
+
+
+    def testLazySchema(self):
+        """ Test lazy creation of a schema's element classes. """
+        from ebmlite import core
+
+        # Restore the schemata afterwards, so later tests don't get the
+        # reloaded (lazy) schema. Cleanups run in reverse order. Note:
+        # `setUp()` replaces `core.SCHEMATA`, so the imported name isn't used.
+        schemata = core.SCHEMATA.copy()
+        self.addCleanup(core.SCHEMATA.update, schemata)
+        self.addCleanup(core.SCHEMATA.clear)
+
+        eager = loadSchema('./ebmlite/schemata/matroska.xml', reload=True)
+        lazy = loadSchema('./ebmlite/schemata/matroska.xml', reload=True,
+                          lazy=True)
+
+        self.assertTrue(lazy.lazy)
+        self.assertEqual(eager, lazy)
+        self.assertLess(dict.__len__(lazy.elements), len(eager.elements),
+                        "Lazy schema created all its elements up front")
+        self.assertEqual(set(lazy.globals), set(eager.globals))
+        self.assertIn('Cluster', lazy)
+        self.assertIn(0x1F43B675, lazy)  # Cluster
+        self.assertNotIn('NotAnElement', lazy)
+        self.assertIsNone(lazy.elements.get(0x81))
+        self.assertTrue(issubclass(lazy['Void'], core.VoidElement))
+
+        # Retrieving by ID or name gets the same class
+        cluster = lazy.elementsByName['Cluster']
+        self.assertIs(lazy.elements[cluster.id], cluster)
+        self.assertEqual(cluster.children, eager['Cluster'].children)
+
+        # Parsing produces the same results
+        mkv1 = eager.load('./tests/video-1.mkv')
+        mkv2 = lazy.load('./tests/video-1.mkv')
+        for el1, el2 in zip(mkv1[0], mkv2[0]):
+            self.assertEqual(el1.name, el2.name)
+            self.assertEqual(el1.value, el2.value)
+
+        # Bulk operations create everything
+        self.assertEqual(sorted(lazy.elementsByName), sorted(eager.elementsByName))
+        self.assertEqual(dict.__len__(lazy.elements), len(eager.elements))
+        for eid, el in lazy.elements.items():
+            self.assertEqual(el.name, eager.elements[eid].name)
+            self.assertEqual(el.__bases__, eager.elements[eid].__bases__)
+
+
     def testParseSchema(self):
         """ Test parsing a schema from a string. """
 
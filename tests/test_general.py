@@ -4,8 +4,13 @@ Created on Aug 14, 2017
 @author: dstokes
 """
 
+from io import BytesIO, StringIO
 from itertools import zip_longest
 import os.path
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
 from xml.dom.minidom import parseString
 from xml.etree import ElementTree as ET
@@ -16,6 +21,7 @@ from ebmlite import core
 from ebmlite import schemata
 from ebmlite import util
 from ebmlite import threaded_file
+from ebmlite.xml_codecs import HexCodec
 
 
 MKV_LOCK_FILE = './tests/testMkv.lock'
@@ -122,6 +128,83 @@ class Test(unittest.TestCase):
                                  'Element {!r} was not converted properly'.format(el1))
 
 
+    def testToXmlFile(self):
+        """ Test writing XML directly to a file, comparing the results to
+            those of `toXml()`.
+        """
+        doc = core.loadSchema('mide_ide.xml').load('./tests/SSX46714-doesnot.IDE', headers=True)
+        expected = list(util.toXml(doc, binary_codec='hex').iter())
+
+        # Text output, pretty and single-line; binary output
+        for out, codec, indent, newline in ((StringIO(), HexCodec(), '\t', '\n'),
+                                            (StringIO(), HexCodec(cols=None), '', ''),
+                                            (BytesIO(), HexCodec(), '  ', '\r\n')):
+            util.toXmlFile(doc, out, binary_codec=codec, indent=indent,
+                           newline=newline)
+            xml = out.getvalue()
+            if isinstance(xml, bytes):
+                self.assertFalse(out.closed)
+                xml = xml.decode('utf-8')
+            if not newline:
+                self.assertEqual(len(xml.splitlines()), 2)
+
+            for el1, el2 in zip_longest(ET.fromstring(xml).iter(), expected):
+                # Note: `toXml()` values have non-ASCII characters replaced by
+                # XML character references before being escaped by ElementTree.
+                attrib = {k: v.encode('ascii', 'xmlcharrefreplace').decode()
+                          for k, v in el1.attrib.items()}
+                self.assertEqual(el1.tag, el2.tag)
+                self.assertEqual(attrib, el2.attrib)
+                self.assertEqual(HexCodec.decode(el1.text), HexCodec.decode(el2.text))
+
+        # Escaping of attribute values
+        schema = core.loadSchema('matroska.xml')
+        out = StringIO()
+        util.toXmlFile(schema.loads(schema.encodes({'Segment': {'Info': {'Title': '<"&é\n">'}}})),
+                       out)
+        self.assertIn(' value="&lt;&quot;&amp;&#233;&#10;&quot;&gt;"/>',
+                      out.getvalue())
+        self.assertEqual(ET.fromstring(out.getvalue()).find('./Segment/Info/Title').get('value'),
+                         '<"&é\n">')
+
+
+    def testXml2EbmlStreaming(self):
+        """ Test converting XML to EBML while parsing, comparing the results
+            to converting an already-parsed XML document.
+        """
+        schema = core.loadSchema('mide_ide.xml')
+        doc = schema.load('./tests/SSX46714-doesnot.IDE', headers=True)
+        xmlRoot = util.toXml(doc)
+        xmlString = ET.tostring(xmlRoot)
+
+        expected = BytesIO()
+        util.xml2ebml(ET.ElementTree(xmlRoot), expected, schema)
+        out = BytesIO()
+        size = util.xml2ebml(BytesIO(xmlString), out, schema)
+        self.assertEqual(out.getvalue(), expected.getvalue())
+        self.assertEqual(size, len(out.getvalue()))
+        self.assertEqual(ET.tostring(xmlRoot), xmlString,
+                         "xml2ebml() modified an already-parsed XML document")
+
+        # Headers are generated if the XML has none; elements inside
+        # non-master elements are ignored.
+        xml = (b'<MideDocument><!-- comment -->'
+               b'<RecordingProperties sizeLength="8"><RecorderInfo>'
+               b'<RecorderName value="test"><Ignored/></RecorderName>'
+               b'</RecorderInfo></RecordingProperties></MideDocument>')
+        out = BytesIO()
+        util.xml2ebml(BytesIO(xml), out, schema)
+        out.seek(0)
+        newDoc = schema.load(out, headers=True)
+        self.assertEqual(newDoc[0].name, 'EBML')
+        self.assertEqual(newDoc[1][0][0].value, 'test')
+        idLength = len(util.encoding.encodeId(newDoc[1].id))
+        self.assertEqual(newDoc[1].payloadOffset - newDoc[1].offset, idLength + 8)
+
+        with self.assertRaises(NameError):
+            util.xml2ebml(BytesIO(b'<Bogus/>'), BytesIO(), schema)
+
+
     def testPPrint(self):
         """ Test pretty-printing EBML files. """
         schemaFile = './ebmlite/schemata/mide_ide.xml'
@@ -242,6 +325,121 @@ class Test(unittest.TestCase):
                 pass
 
 
+    def testLazyImports(self):
+        """ Test that importing the library does not import modules that
+            are only needed by specific features.
+        """
+        deferred = ('ast', 'datetime', 'hashlib', 'importlib.resources',
+                    'tempfile', 'xml.etree.ElementTree', 'ebmlite.schemata',
+                    'ebmlite.xml_codecs')
+        code = ("import sys, ebmlite, ebmlite.util; "
+                "print(' '.join(m for m in %r if m in sys.modules))" % (deferred,))
+        env = dict(os.environ,
+                   PYTHONPATH=os.pathsep.join(filter(None, (os.getcwd(), os.environ.get('PYTHONPATH')))))
+        result = subprocess.run([sys.executable, '-c', code], env=env,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '',
+                         "Modules imported by `import ebmlite`: %s" % result.stdout)
+
+
+    def testExtract(self):
+        """ Test copying selected elements verbatim into a new file. """
+        schema = core.loadSchema('matroska.xml')
+        doc = schema.load('./tests/video-1.mkv', headers=True)
+        segment = doc[1]
+        expected = [el for el in segment if el.name in ('Info', 'Tracks')]
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, 'extracted.mkv')
+            size = util.extract(doc, ['Info', 'Tracks'], filename,
+                                containers=('Segment',))
+            self.assertEqual(size, os.path.getsize(filename))
+
+            with schema.load(filename, headers=True) as newDoc:
+                self.assertEqual(newDoc[0].getRaw(), doc[0].getRaw())
+                self.assertEqual(newDoc[1].name, 'Segment')
+                self.assertEqual([el.getRaw() for el in newDoc[1]],
+                                 [el.getRaw() for el in expected])
+                self.assertEqual(newDoc[1].dump(), {'Info': [expected[0].dump()],
+                                                    'Tracks': [expected[1].dump()]})
+
+        # Non-file output (no OS-level copying), selection by function
+        out = BytesIO()
+        util.extract(doc, lambda el: el.name == 'Tracks', out,
+                     containers=('Segment',), headers=False)
+        out.seek(0)
+        newDoc = schema.load(out)
+        self.assertEqual(newDoc[0][0].getRaw(), expected[1].getRaw())
+
+
+    def testWriter(self):
+        """ Test writing a document incrementally. """
+        schema = core.loadSchema('matroska.xml')
+        out = BytesIO()
+        with util.Writer(out, schema) as writer:
+            writer.write('EBML', {'DocType': 'matroska'})
+            writer.startMaster('Segment')
+            writer.write('Info', {'Title': 'Test'})
+            writer.startMaster('Tracks')
+            writer.write('TrackEntry', {'TrackNumber': 1})
+            # Unfinished masters are ended by `close()`
+
+        out.seek(0)
+        doc = schema.load(out, headers=True)
+        self.assertEqual(doc.dump(), {'EBML': [{'DocType': 'matroska'}],
+                                      'Segment': [{'Info': [{'Title': 'Test'}],
+                                                   'Tracks': [{'TrackEntry': [{'TrackNumber': 1}]}]}]})
+
+        with self.assertRaises(ValueError):
+            util.Writer(BytesIO()).write('EBML', {})
+
+
+    def testReadMany(self):
+        """ Test reading many elements' values with combined reads. """
+        data = bytes(range(256)) * 4
+        ranges = [(900, 10), (0, 4), (2, 4), (10, 0), (500, 100), (1020, 10)]
+        stream = BytesIO(data)
+        self.assertEqual(util.readRanges(stream, ranges, maxGap=100),
+                         [data[o:o + n] for o, n in ranges])
+        self.assertEqual(util.readRanges(stream, ranges, maxGap=0, maxSize=4),
+                         [data[o:o + n] for o, n in ranges])
+        # The combined reads, in order of offset (the data ends at 1024)
+        reads = [(start, len(read), indices) for start, read, indices
+                 in util._iterReads(stream, ranges, maxGap=120)]
+        self.assertEqual(reads, [(0, 10, [1, 2, 3]), (500, 100, [4]), (900, 124, [0, 5])])
+
+        schema = core.loadSchema('mide_ide.xml')
+        doc = schema.load('./tests/SSX46714-doesnot.IDE')
+        elements = list(util.flatiter(doc))
+        random.Random(0).shuffle(elements)
+        expectedRaw = [el.getRawValue() for el in elements]
+
+        self.assertEqual(util.readMany(elements, raw=True, maxGap=1024), expectedRaw)
+
+        fresh = list(util.flatiter(schema.load('./tests/SSX46714-doesnot.IDE')))
+        random.Random(0).shuffle(fresh)
+        values = util.readMany(fresh)
+        self.assertEqual(values, [el.value for el in elements])
+        self.assertTrue(all(el._value is not None for el in fresh))
+
+        # Reading the values of children
+        block = next(el for el in doc if el.name == 'ChannelDataBlock')
+        self.assertEqual(block.readMany(), [el.value for el in block])
+        self.assertEqual(block.readMany('ChannelDataPayload', raw=True),
+                         [block[-1].getRawValue()])
+        self.assertEqual(doc.readMany('ChannelDataBlock'),
+                         [el.value for el in doc if el.name == 'ChannelDataBlock'])
+
+        # Payloads of interleaved blocks are read at once
+        with doc.trackStats() as stats:
+            payloads = [el for block in doc if block.name == 'ChannelDataBlock'
+                        for el in block if el.name == 'ChannelDataPayload']
+            stats.reset()
+            raw = util.readMany(payloads, raw=True)
+            self.assertEqual(stats.reads, 1)
+        self.assertEqual(raw, [el.getRawValue() for el in payloads])
+
+
 class TestThreadedFile(unittest.TestCase):
 
     def testMkv(self):
@@ -0,0 +1,203 @@
+import struct
+import unittest
+from io import BytesIO
+
+from ebmlite import core, ide
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class testIde(unittest.TestCase):
+    """ Tests for reading IDE channel data.
+    """
+
+    def setUp(self):
+        self.schema = core.loadSchema('mide_ide.xml')
+        self.doc = self.schema.load('./tests/SSX46714-doesnot.IDE')
+        self.channels = ide.getChannels(self.doc)
+
+        # Each channel's data, read the slow way
+        self.payloads = {}
+        for el in self.doc:
+            if el.name == 'ChannelDataBlock':
+                data = el.dump()
+                self.payloads.setdefault(data['ChannelIDRef'], []).append(data['ChannelDataPayload'])
+        self.payloads = {k: b''.join(v) for k, v in self.payloads.items()}
+
+
+    def tearDown(self):
+        self.doc.close()
+
+
+    def testGetChannels(self):
+        """ Test reading the channel descriptions. """
+        self.assertEqual(sorted(self.channels), [8, 32, 36, 59])
+        self.assertEqual(self.channels[8]['ChannelFormat'], '<HHH')
+        self.assertEqual(ide.getChannels('./tests/SSX46714-doesnot.IDE'), self.channels)
+
+
+    def testScanBlocks(self):
+        """ Test finding the data blocks' payloads. """
+        blocks = ide.scanBlocks(self.doc)
+        self.assertEqual(len(blocks), sum(1 for el in self.doc if el.name == 'ChannelDataBlock'))
+        for chId, data in self.payloads.items():
+            raw = b''
+            for channel, offset, size in zip(blocks.channels, blocks.offsets, blocks.sizes):
+                if channel == chId:
+                    self.doc.stream.seek(offset)
+                    raw += self.doc.stream.read(size)
+            self.assertEqual(raw, data)
+        self.assertEqual(blocks.totals(), {k: len(v) for k, v in self.payloads.items()})
+
+        # A small window (so blocks span multiple reads)
+        small = ide.scanBlocks(self.doc, window=64)
+        self.assertEqual(list(small.offsets), list(blocks.offsets))
+
+        # SimpleChannelDataBlocks: 2 byte timecode, 1 byte channel, data
+        data = (self.schema['SimpleChannelDataBlock'].encode(b'\x00\x10\x05abcd')
+                + self.schema['ChannelDataBlock'].encode({'ChannelIDRef': 6,
+                                                          'ChannelDataPayload': b'efgh'}))
+        blocks = ide.scanBlocks(self.schema.load(BytesIO(data)))
+        self.assertEqual(list(blocks.channels), [5, 6])
+        self.assertEqual(list(blocks.sizes), [4, 4])
+        self.assertEqual([data[o:o + 4] for o in blocks.offsets], [b'abcd', b'efgh'])
+        self.assertEqual(list(blocks.starts), [16, -1])
+        self.assertEqual(list(blocks.timeTypes), [ide.TIME_SIMPLE, ide.TIME_ABS])
+
+        # Block timecodes: absolute, modulo, and none
+        data = b''.join(self.schema['ChannelDataBlock'].encode(block) for block in (
+            {'ChannelIDRef': 1, 'ChannelDataPayload': b'ab',
+             'StartTimeCodeAbs': 100, 'EndTimeCodeAbs': 200},
+            {'ChannelIDRef': 1, 'ChannelDataPayload': b'cd',
+             'StartTimeCodeAbsMod': 300, 'EndTimeCodeAbsMod': 5},
+            {'ChannelIDRef': 1, 'ChannelDataPayload': b'ef'}))
+        blocks = ide.scanBlocks(self.schema.load(BytesIO(data)))
+        self.assertEqual(list(blocks.starts), [100, 300, -1])
+        self.assertEqual(list(blocks.ends), [200, 5, -1])
+        self.assertEqual(list(blocks.timeTypes), [ide.TIME_ABS, ide.TIME_MOD, ide.TIME_ABS])
+
+
+    @unittest.skipIf(numpy is None, "requires NumPy")
+    def testChannelDtype(self):
+        """ Test creating NumPy types from channel formats. """
+        dtype = ide.channelDtype(self.channels[8])
+        self.assertEqual(dtype.names, ('X', 'Y', 'Z'))
+        self.assertEqual(dtype.itemsize, 6)
+
+        # No subchannel names; big-endian
+        dtype = ide.channelDtype({'ChannelFormat': '>lh'})
+        self.assertEqual(dtype.names, ('sc0', 'sc1'))
+        self.assertEqual(dtype['sc0'], numpy.dtype('>i4'))
+
+        # Counts, padding, and native alignment
+        for fmt in ('<2hxf', '@bxi', 'bQ', '=Bd', '<3s?'):
+            dtype = ide.channelDtype({'ChannelFormat': fmt})
+            self.assertEqual(dtype.itemsize, struct.calcsize(fmt), fmt)
+            values = struct.unpack(fmt, bytes(range(1, struct.calcsize(fmt) + 1)))
+            arr = numpy.frombuffer(bytes(range(1, struct.calcsize(fmt) + 1)), dtype=dtype)
+            self.assertEqual(arr[0].tolist(), values, fmt)
+
+        with self.assertRaises(ValueError):
+            ide.channelDtype({'ChannelID': 1})
+        with self.assertRaises(ValueError):
+            ide.channelDtype({'ChannelFormat': '<hz'})
+
+
+    @unittest.skipIf(numpy is None, "requires NumPy")
+    def testReadChannelData(self):
+        """ Test reading channel data into structured arrays. """
+        results = ide.readChannelData('./tests/SSX46714-doesnot.IDE')
+        self.assertEqual(sorted(results), [8, 32, 36, 59])
+        for chId, arr in results.items():
+            fmt = self.channels[chId]['ChannelFormat']
+            self.assertEqual(arr.tolist(), list(struct.iter_unpack(fmt, self.payloads[chId])))
+
+        # No combined reads
+        results = ide.readChannelData(self.doc, [32], maxGap=0, maxSize=1)
+        self.assertEqual(list(results), [32])
+        self.assertEqual(results[32].tobytes(), self.payloads[32])
+
+        with self.assertRaises(KeyError):
+            ide.readChannelData(self.doc, [1])
+
+        # A truncated recording: the last, incomplete block is ignored
+        with open('./tests/SSX46714-doesnot.IDE', 'rb') as f:
+            data = f.read()
+        lastBlock = [el for el in self.doc if el.name == 'ChannelDataBlock'][-1]
+        lastChannel = lastBlock.dump()['ChannelIDRef']
+        full = ide.readChannelData(self.doc)
+        for cut in range(lastBlock.offset + 1, lastBlock.offset + 4):
+            results = ide.readChannelData(BytesIO(data[:cut]))
+            self.assertEqual(len(results[lastChannel]),
+                             len(full[lastChannel]) - len(lastBlock.dump()['ChannelDataPayload'])
+                             // full[lastChannel].dtype.itemsize)
+
+
+    @unittest.skipIf(numpy is None, "requires NumPy")
+    def testUnwrapTimes(self):
+        """ Test removing rollovers from modulo timecodes. """
+        self.assertEqual(ide.unwrapTimes([5, 9, 2, 7, 1], 10).tolist(), [5, 9, 12, 17, 21])
+        self.assertEqual(ide.unwrapTimes([3], 10).tolist(), [3])
+        self.assertEqual(len(ide.unwrapTimes([], 10)), 0)
+
+
+    @unittest.skipIf(numpy is None, "requires NumPy")
+    def testSampleTimes(self):
+        """ Test computing block and sample times. """
+        blocks = ide.scanBlocks(self.doc)
+        results = ide.sampleTimes(self.doc, blocks=blocks)
+        data = ide.readChannelData(self.doc, blocks=blocks)
+        self.assertEqual(sorted(results), sorted(data))
+
+        # Compare to the times calculated block by block
+        scale = 1.0 / 32768
+        for chId, times in results.items():
+            self.assertEqual(len(times), len(data[chId]))
+            itemsize = data[chId].dtype.itemsize
+            expected = []
+            for el in self.doc:
+                if el.name != 'ChannelDataBlock':
+                    continue
+                block = el.dump()
+                if block['ChannelIDRef'] != chId:
+                    continue
+                count = len(block['ChannelDataPayload']) // itemsize
+                start = block['StartTimeCodeAbs'] * scale
+                end = block['EndTimeCodeAbs'] * scale
+                for i in range(count):
+                    expected.append(start + (end - start) * i / max(count - 1, 1))
+            numpy.testing.assert_allclose(times, expected)
+
+        # Modulo timecodes, with rollovers and without end times
+        channel = {'ChannelID': 1, 'ChannelFormat': '<h', 'TimeCodeScale': '1/10',
+                   'TimeCodeModulus': 100}
+        blocks = ide.DataBlocks()
+        blocks._add(1, 0, 4, 90, 98, ide.TIME_MOD)
+        blocks._add(2, 0, 4, 10, 20, ide.TIME_ABS)
+        blocks._add(1, 0, 6, 99, 3, ide.TIME_MOD)
+        blocks._add(1, 0, 4, 20, -1, ide.TIME_MOD)
+        blocks._add(1, 0, 4, 30, -1, ide.TIME_MOD)
+        starts, ends = ide.blockTimes(blocks, channel)
+        numpy.testing.assert_allclose(starts, [9.0, 9.9, 12.0, 13.0])
+        numpy.testing.assert_allclose(ends, [9.8, 10.3, numpy.nan, numpy.nan])
+
+        doc = self.schema.load(BytesIO(self.schema['RecordingProperties'].encode(
+            {'ChannelList': {'Channel': channel}})))
+        times = ide.sampleTimes(doc, blocks=blocks)
+        self.assertEqual(list(times), [1])
+        numpy.testing.assert_allclose(times[1], [9.0, 9.8, 9.9, 10.1, 10.3,
+                                                 12.0, 12.5, 13.0, 13.5])
+
+        # SimpleChannelDataBlocks' 16 bit timecodes
+        blocks = ide.DataBlocks()
+        blocks._add(1, 0, 2, 65000, -1, ide.TIME_SIMPLE)
+        blocks._add(1, 0, 2, 464, -1, ide.TIME_SIMPLE)
+        starts, _ends = ide.blockTimes(blocks, channel)
+        numpy.testing.assert_allclose(starts, [6500.0, 6600.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,291 @@
+import os.path
+import tempfile
+import unittest
+from io import BytesIO
+
+from ebmlite import core, encoding, matroska
+
+
+# Encode an element from its ID and already-encoded payload, for building
+# test data.
+element = matroska._encodeElement
+
+
+class testClusterIndex(unittest.TestCase):
+    """ Tests for the Matroska cluster index.
+    """
+
+    def setUp(self):
+        self.schema = core.loadSchema('matroska.xml')
+        self.doc = self.schema.load('./tests/video-1.mkv', headers=True)
+        self.segment = self.doc[1]
+        self.clusters = [(matroska.ClusterIndex.clusterTime(el), el.offset)
+                         for el in self.segment if el.name == 'Cluster']
+
+
+    def tearDown(self):
+        self.doc.close()
+
+
+    def makeFile(self, exclude=(), infinite=False):
+        """ Copy the test file's Segment, excluding some elements, and
+            optionally making the Segment's size unknown.
+        """
+        payload = b''.join(el.getRaw() for el in self.segment if el.name not in exclude)
+        size = encoding.encodeSize(None) if infinite else encoding.encodeSize(len(payload), 8)
+        data = self.doc[0].getRaw() + encoding.encodeId(self.segment.id) + size + payload
+        return self.schema.load(BytesIO(data), headers=True)
+
+
+    def checkIndex(self, index, clusters):
+        """ Check seeking with an index against a list of the (time, offset)
+            of all clusters.
+        """
+        for t in (-1, 0, clusters[0][0], 100, 5000, 5525, 5526, clusters[-1][0], 10**9):
+            before = [offset for time, offset in clusters if time <= t]
+            expected = before[-1] if before else clusters[0][1]
+            self.assertEqual(index.seek(t).offset, expected, "seek(%d)" % t)
+
+        for t0, t1 in ((0, 0), (100, 10000), (4927, 15466), (-10, -1), (50000, 10**9)):
+            expected = [offset for time, offset in clusters if t0 < time <= t1]
+            before = [offset for time, offset in clusters if time <= t0]
+            if before:
+                expected.insert(0, before[-1])
+            self.assertEqual([c.offset for c in index.clustersBetween(t0, t1)],
+                             expected, "clustersBetween(%d, %d)" % (t0, t1))
+
+
+    def testCues(self):
+        """ Test building the index from the segment's Cues. """
+        with matroska.ClusterIndex('./tests/video-1.mkv') as index:
+            self.assertEqual(index.source, 'cues')
+            self.assertLess(len(index), len(self.clusters))
+            self.assertEqual(index.timecodeScale, 1000000)
+            self.assertEqual(index.firstCluster, self.clusters[0][1])
+            self.assertEqual(index.getElement('Tracks').dump(),
+                             [el for el in self.segment if el.name == 'Tracks'][0].dump())
+            self.checkIndex(index, self.clusters)
+
+        index = matroska.ClusterIndex(self.doc, useCues=False)
+        self.assertEqual(index.source, 'clusters')
+        self.assertEqual(list(zip(index.times, index.offsets)), self.clusters)
+        self.checkIndex(index, self.clusters)
+
+
+    def testNoCues(self):
+        """ Test indexing segments without Cues or SeekHead, and with an
+            unknown size.
+        """
+        for infinite in (False, True):
+            doc = self.makeFile(('Cues', 'SeekHead'), infinite=infinite)
+            clusters = [(matroska.ClusterIndex.clusterTime(el), el.offset)
+                        for el in doc[1] if el.name == 'Cluster']
+            self.assertEqual([t for t, _o in clusters], [t for t, _o in self.clusters])
+            index = matroska.ClusterIndex(doc)
+            self.assertEqual(index.source, 'clusters')
+            self.assertEqual(index.segmentEnd, doc.size)
+            self.assertNotIn('Cues', index.positions)
+            self.assertEqual(list(zip(index.times, index.offsets)), clusters)
+            self.checkIndex(index, clusters)
+            # The size of an 'infinite' Segment is never calculated
+            self.assertEqual(hasattr(index.segment, '_size'), not infinite)
+
+        doc = self.schema.load(BytesIO(self.doc[0].getRaw()))
+        with self.assertRaises(ValueError):
+            matroska.ClusterIndex(doc)
+
+
+    def testBlockHeaders(self):
+        """ Test decoding SimpleBlock headers in bulk. """
+        expected = []
+        for cluster in self.segment:
+            if cluster.name != 'Cluster':
+                continue
+            clusterTime = matroska.ClusterIndex.clusterTime(cluster)
+            for el in cluster:
+                if el.name == 'SimpleBlock':
+                    raw = el.getRawValue()
+                    expected.append((el.offset, raw[0] & 0x7F,
+                                     clusterTime + int.from_bytes(raw[1:3], 'big', signed=True),
+                                     raw[3], el.payloadOffset + 4, el.size - 4, cluster.offset))
+
+        with matroska.ClusterIndex('./tests/video-1.mkv') as index:
+            headers = index.readBlockHeaders()
+            self.assertEqual(len(headers), len(expected))
+            self.assertEqual(list(zip(headers.offsets, headers.tracks, headers.times,
+                                      headers.flags, headers.dataOffsets,
+                                      headers.dataSizes, headers.clusters)),
+                             expected)
+            self.assertEqual(list(headers.keyframes), [b[3] >> 7 for b in expected])
+            self.assertEqual(set(headers.lacing), {0})
+
+            headers = index.readBlockHeaders(tracks=[2])
+            self.assertEqual(list(headers.offsets), [b[0] for b in expected if b[1] == 2])
+
+            # Only the clusters overlapping the time range are read
+            clusters = [c.offset for c in index.clustersBetween(5000, 6000)]
+            headers = index.readBlockHeaders(5000, 6000)
+            self.assertEqual(list(headers.offsets), [b[0] for b in expected if b[6] in clusters])
+
+
+    def testBlockGroups(self):
+        """ Test decoding the headers of Blocks in BlockGroups, and of blocks
+            with multi-byte track numbers.
+        """
+        blocks = [
+            element(0xA3, b'\x81\x00\x05\x80' + b'a' * 10),
+            element(0xA0, element(0xA1, b'\x40\xC8\xFF\xFB\x00' + b'b' * 20)
+                    + element(0xFB, b'\xFF')),
+            element(0xA0, element(0xA1, b'\x82\x00\x10\x06' + b'c' * 30)),
+            element(0xEC, b'\x00' * 4),
+        ]
+        cluster = element(0x1F43B675, element(0xE7, b'\x03\xE8') + b''.join(blocks))
+        segment = element(0x18538067, cluster)
+        doc = self.schema.load(BytesIO(self.doc[0].getRaw() + segment), headers=True)
+
+        with matroska.ClusterIndex(doc) as index:
+            headers = index.readBlockHeaders()
+            self.assertEqual(list(headers.tracks), [1, 200, 2])
+            self.assertEqual(list(headers.times), [1005, 995, 1016])
+            self.assertEqual(list(headers.keyframes), [1, 0, 1])
+            self.assertEqual(list(headers.lacing), [0, 0, 3])
+            self.assertEqual(list(headers.dataSizes), [10, 20, 30])
+            for offset, size, data in zip(headers.dataOffsets, headers.dataSizes, b'abc'):
+                doc.stream.seek(offset)
+                self.assertEqual(doc.stream.read(size), bytes([data]) * size)
+
+            self.assertEqual(list(index.readBlockHeaders(tracks=[200, 2]).tracks), [200, 2])
+
+
+    def testSplitLaces(self):
+        """ Test splitting laced blocks into frames (using the examples in
+            the Matroska specification: frames of 800, 500, and 1000 bytes).
+        """
+        frames = [bytes([i]) * size for i, size in enumerate((800, 500, 1000))]
+        data = b''.join(frames)
+
+        self.assertEqual(matroska.splitLaces(data, 0), [data])
+
+        xiph = b'\x02' + b'\xFF\xFF\xFF\x23' + b'\xFF\xF5' + data
+        self.assertEqual(matroska.splitLaces(xiph, 1), frames)
+
+        ebml = b'\x02' + b'\x43\x20' + b'\x5E\xD3' + data
+        self.assertEqual(matroska.splitLaces(ebml, 3), frames)
+
+        fixed = b'\x02' + b'\x00' * 2400
+        self.assertEqual([len(f) for f in matroska.splitLaces(fixed, 2)], [800] * 3)
+
+        # Frames are views of the data
+        self.assertIsInstance(matroska.splitLaces(xiph, 1)[0], memoryview)
+
+        with self.assertRaises(ValueError):
+            matroska.splitLaces(fixed[:-1], 2)
+        with self.assertRaises(ValueError):
+            matroska.splitLaces(xiph[:1000], 1)
+
+
+    def testFrames(self):
+        """ Test iterating over frames. """
+        with matroska.ClusterIndex('./tests/video-1.mkv') as index:
+            headers = index.readBlockHeaders()
+            frames = list(index.iterFrames())
+            self.assertEqual([f[:3] for f in frames],
+                             list(zip(headers.tracks, headers.times,
+                                      map(bool, headers.keyframes))))
+            for frame, offset, size in zip(frames[:100], headers.dataOffsets, headers.dataSizes):
+                self.doc.stream.seek(offset)
+                self.assertEqual(frame[3], self.doc.stream.read(size))
+
+            self.assertEqual(list(index.iterFrames(5000, 6000, tracks=[1])),
+                             list(matroska.iterFrames(index.clustersBetween(5000, 6000), [1])))
+
+        # A laced block in a BlockGroup
+        block = element(0xA0, element(0xA1, b'\x83\x00\x02\x04\x01ab') + element(0xFB, b'\x01'))
+        cluster = element(0x1F43B675, element(0xE7, b'\x64') + block)
+        doc = self.schema.load(BytesIO(cluster))
+        self.assertEqual([(t, tc, k, bytes(f)) for t, tc, k, f in matroska.iterFrames(doc)],
+                         [(3, 102, False, b'a'), (3, 102, False, b'b')])
+
+
+    def testDemux(self):
+        """ Test extracting a track's frames. """
+        for track in (1, 2):
+            with matroska.ClusterIndex(self.doc) as index:
+                expected = b''.join(f[3] for f in index.iterFrames(tracks=[track]))
+                partial = b''.join(f[3] for f in index.iterFrames(5000, 6000, tracks=[track]))
+
+            out = BytesIO()
+            self.assertEqual(matroska.demux('./tests/video-1.mkv', track, out), len(expected))
+            self.assertEqual(out.getvalue(), expected)
+
+            # No combined reads
+            out = BytesIO()
+            matroska.demux(self.doc, track, out, maxGap=0, maxSize=1)
+            self.assertEqual(out.getvalue(), expected)
+
+            out = BytesIO()
+            matroska.demux(self.doc, track, out, 5000, 6000)
+            self.assertEqual(out.getvalue(), partial)
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, 'track.raw')
+            matroska.demux(self.doc, 2, filename)
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+        # Laced blocks
+        blocks = (element(0xA3, b'\x81\x00\x00\x80abc')
+                  + element(0xA3, b'\x82\x00\x00\x80xyz')
+                  + element(0xA3, b'\x81\x00\x01\x82\x01\x01def'))
+        segment = element(0x18538067, element(0x1F43B675, element(0xE7, b'\x00') + blocks))
+        doc = self.schema.load(BytesIO(self.doc[0].getRaw() + segment), headers=True)
+        out = BytesIO()
+        self.assertEqual(matroska.demux(doc, 1, out), 6)
+        self.assertEqual(out.getvalue(), b'abcdef')
+
+
+    def testCut(self):
+        """ Test copying a time range to a new file. """
+        schema = self.schema
+        with matroska.ClusterIndex(self.doc) as index:
+            frames = [f[:3] + (bytes(f[3]),) for f in index.iterFrames(5000, 15000)]
+            clusters = [c.getRaw() for c in index.clustersBetween(5000, 15000)]
+
+        for exclude in ((), ('Cues',), ('Cues', 'SeekHead')):
+            out = BytesIO()
+            size = matroska.cut(self.makeFile(exclude), out, 5000, 15000)
+            self.assertEqual(size, len(out.getvalue()))
+
+            out.seek(0)
+            doc = schema.load(out, headers=True)
+            segment = doc[1]
+            self.assertEqual(segment.size, len(out.getvalue()) - segment.payloadOffset)
+            names = [el.name for el in segment]
+            self.assertEqual([n for n in names if n != 'Cluster'],
+                             ['SeekHead', 'Info', 'Tracks', 'Tags', 'Cues'])
+            self.assertNotIn('Void', names)
+            self.assertEqual([el.getRaw() for el in segment if el.name == 'Cluster'], clusters)
+
+            # The new SeekHead and Cues point to the right places
+            with matroska.ClusterIndex(doc) as index:
+                for name in ('Info', 'Tracks', 'Tags', 'Cues'):
+                    self.assertEqual(index.getElement(name).name, name)
+                self.assertEqual(index.source, 'cues')
+                for time, offset in zip(index.times, index.offsets):
+                    cluster = index.parseElementAt(offset)
+                    self.assertEqual(cluster.name, 'Cluster')
+                    # Cue times are those of blocks, not necessarily the first
+                    self.assertLessEqual(index.clusterTime(cluster), time)
+                self.assertEqual([f[:3] + (bytes(f[3]),) for f in index.iterFrames()], frames)
+
+        # Whole file
+        out = BytesIO()
+        matroska.cut('./tests/video-1.mkv', out)
+        out.seek(0)
+        with matroska.ClusterIndex(out) as index:
+            self.assertEqual([index.clusterTime(c) for c in index.iterClusters()],
+                             [t for t, _o in self.clusters])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import os.path
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from unittest import mock
+
+import ebmlite
+from ebmlite import core, encoding, registry
+
+
+class testRegistry(unittest.TestCase):
+    """ Tests for the schema registry and opening files by DocType.
+    """
+
+    def setUp(self):
+        self.cachePath = core.CACHE_PATH
+        self.tempdir = tempfile.mkdtemp()
+        core.CACHE_PATH = os.path.join(self.tempdir, 'cache')
+
+
+    def tearDown(self):
+        core.CACHE_PATH = self.cachePath
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+
+    def testReadHeader(self):
+        """ Test reading the identifying values from an EBML header. """
+        with open('./tests/SSX46714-doesnot.IDE', 'rb') as f:
+            header, rootId = registry.readHeader(f)
+        self.assertEqual(header['DocType'], 'mide')
+        self.assertEqual(header['DocTypeVersion'], 2)
+        self.assertEqual(rootId, core.loadSchema('mide_ide.xml')['RecordingProperties'].id)
+
+        header, rootId = registry.readHeader(BytesIO(b'not EBML'))
+        self.assertEqual(header, {})
+        self.assertIsNone(rootId)
+
+        header, rootId = registry.readHeader(BytesIO(b''))
+        self.assertEqual(header, {})
+        self.assertIsNone(rootId)
+
+
+    def testOpen(self):
+        """ Test opening files without specifying a schema. """
+        ide = core.loadSchema('mide_ide.xml')
+        mkv = core.loadSchema('matroska.xml')
+
+        with ebmlite.open('./tests/SSX46714-doesnot.IDE') as doc:
+            # `mide_manifest.xml` has the same DocType and version; the
+            # first element after the header is used to pick the schema.
+            self.assertIs(doc.schema, ide)
+            self.assertEqual(doc[0].name, 'RecordingProperties')
+
+        with ebmlite.open('./tests/video-1.mkv') as doc:
+            self.assertIs(doc.schema, mkv)
+            self.assertEqual(doc[0].name, 'Segment')
+
+        # Streams are left at their original position
+        with open('./tests/video-4.ebml', 'rb') as f:
+            doc = ebmlite.open(f, headers=True)
+            self.assertIs(doc.schema, mkv)
+            self.assertEqual(doc[0].name, 'EBML')
+
+        # Aliases: WebM files use the Matroska schema
+        data = mkv.encodes({'EBML': {'DocType': 'webm', 'DocTypeVersion': 4},
+                            'Segment': {}})
+        self.assertIs(ebmlite.open(BytesIO(data)).schema, mkv)
+
+        with self.assertRaises(IOError):
+            ebmlite.open(BytesIO(b'\x1a\x45\xdf\xa3\x80'))  # No DocType
+        with self.assertRaises(IOError):
+            ebmlite.open(BytesIO(data.replace(b'webm', b'xxxx')))
+
+
+    def testRegister(self):
+        """ Test explicitly registering schemata. """
+        reg = registry.SchemaRegistry()
+        mkv = core.loadSchema('matroska.xml')
+        ide = core.loadSchema('mide_ide.xml')
+
+        self.assertIsNone(reg.find('test'))
+        reg.register('test', mkv)
+        reg.register('test', 'mide_ide.xml', version=2)
+        self.assertIs(reg.load('test'), mkv)
+        self.assertIs(reg.load('test', 2), ide)
+        self.assertIs(reg.load('matroska'), mkv)
+
+
+    def testIndexCache(self):
+        """ Test the caching and invalidation of the registry index. """
+        schemaDir = os.path.join(self.tempdir, 'schemata')
+        os.mkdir(schemaDir)
+        schemaFile = os.path.join(schemaDir, 'test.xml')
+        shutil.copy('./ebmlite/schemata/matroska.xml', schemaFile)
+
+        reg = registry.SchemaRegistry(paths=[schemaDir])
+        self.assertTrue(str(reg.find('matroska')).endswith('test.xml'))
+        self.assertTrue(os.path.exists(os.path.join(core.CACHE_PATH, 'schemata.index')))
+
+        # A new registry uses the cached index
+        reg = registry.SchemaRegistry(paths=[schemaDir])
+        with mock.patch.object(registry, '_readSchemaInfo',
+                                        side_effect=AssertionError):
+            self.assertTrue(str(reg.find('matroska')).endswith('test.xml'))
+
+        # Changing the file updates its entry
+        with open(schemaFile, 'r') as f:
+            xml = f.read()
+        with open(schemaFile, 'w') as f:
+            f.write(xml.replace('default="matroska"', 'default="other"'))
+        reg.refresh()
+        self.assertIsNone(reg.find('matroska'))
+        self.assertTrue(str(reg.find('other')).endswith('test.xml'))
+
+        # listSchemata() gets the same results
+        self.assertEqual(list(core.listSchemata(schemaDir)), ['test.xml'])
+
+
+class _ReadTracker(BytesIO):
+    """ A stream that records the furthest position read. """
+
+    furthest = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.furthest = max(self.furthest, self.tell())
+        return data
+
+
+class testProbe(unittest.TestCase):
+    """ Tests for reading metadata without reading data.
+    """
+
+    def testDataElements(self):
+        """ Test the schema attribute identifying data elements. """
+        mkv = core.loadSchema('matroska.xml')
+        ide = core.loadSchema('mide_ide.xml')
+        self.assertEqual(set(mkv.dataElements), {mkv['Cluster'].id})
+        self.assertEqual(set(ide.dataElements),
+                         {ide['ChannelDataBlock'].id, ide['SimpleChannelDataBlock'].id})
+        self.assertEqual(core.loadSchema('mide_manifest.xml').dataElements, {})
+
+
+    def testProbeMatroska(self):
+        """ Test probing a Matroska file. """
+        mkv = core.loadSchema('matroska.xml')
+        doc = mkv.load('./tests/video-1.mkv', headers=True)
+        segment = doc[1]
+        expected = {}
+        for el in segment:
+            if el.name not in ('Cluster', 'Void', 'SeekHead'):
+                expected.setdefault(el.name, []).append(el.dump())
+        expected['Cues'] = expected['Cues'][0]
+
+        result = ebmlite.probe('./tests/video-1.mkv')
+        self.assertEqual(result['EBML'], [doc[0].dump()])
+        # Tags (before the clusters) and Cues (after, found via the SeekHead)
+        self.assertEqual(result['Segment'], expected)
+
+        result = ebmlite.probe('./tests/video-1.mkv', schema='matroska.xml', maxSize=200)
+        # Tracks is larger than `maxSize`
+        self.assertEqual(sorted(result['Segment']), ['Cues', 'Info', 'Tags'])
+
+        # An 'infinite' Segment, without SeekHead: nothing after the first
+        # Cluster is read.
+        payload = b''.join(el.getRaw() for el in segment if el.name not in ('SeekHead', 'Cues'))
+        firstCluster = [el for el in segment if el.name == 'Cluster'][0]
+        data = doc[0].getRaw() + encoding.encodeId(segment.id) + encoding.encodeSize(None) + payload
+        stream = _ReadTracker(data)
+        result = ebmlite.probe(stream)
+        self.assertNotIn('Cues', result['Segment'])
+        self.assertEqual(result['Segment']['Tracks'], expected['Tracks'])
+        self.assertLess(stream.furthest, firstCluster.offset)
+        doc.close()
+
+        # A stale SeekHead: the Cues position points to an element inside
+        # the Cues, which is ignored.
+        result = ebmlite.probe('./tests/video-2.mkv')
+        self.assertEqual(sorted(result['Segment']), ['Info', 'Tags', 'Tracks'])
+
+
+    def testProbeIde(self):
+        """ Test probing an IDE file. """
+        doc = core.loadSchema('mide_ide.xml').load('./tests/SSX46714-doesnot.IDE')
+        result = ebmlite.probe('./tests/SSX46714-doesnot.IDE')
+        self.assertEqual(result['EBML']['DocType'], 'mide')
+        self.assertEqual(result['RecordingProperties'], doc[0].dump())
+        self.assertNotIn('ChannelDataBlock', result)
+        self.assertNotIn('SimpleChannelDataBlock', result)
+        doc.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
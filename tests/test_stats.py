@@ -0,0 +1,101 @@
+import unittest
+from io import BytesIO
+
+import ebmlite
+from ebmlite import core, stats
+
+
+class testStats(unittest.TestCase):
+    """ Tests for the I/O instrumentation.
+    """
+
+    def setUp(self):
+        self.schema = core.loadSchema('matroska.xml')
+        with open('./tests/video-1.mkv', 'rb') as f:
+            self.data = f.read()
+
+
+    def testTrackStats(self):
+        """ Test collecting statistics within a scope. """
+        doc = self.schema.load(BytesIO(self.data))
+        stream = doc.stream
+
+        with doc.trackStats() as outer:
+            self.assertIsInstance(doc.stream, stats.StatsStream)
+            cluster = [el for el in doc if el.name == 'Segment'][0]
+            with doc.trackStats() as inner:
+                children = cluster.value
+                cluster.value
+            self.assertEqual(inner.cacheHits, 1)
+
+        # Children of an unknown-size element are parsed twice: once to
+        # find the element's size, and once to read them.
+        self.assertIn(inner.elementsParsed, (len(children), 2 * len(children)))
+        self.assertGreater(outer.elementsParsed, inner.elementsParsed)
+        self.assertGreater(outer.reads, inner.reads)
+        self.assertGreater(outer.seeks, 0)
+        self.assertLessEqual(outer.bytesRead, len(self.data))
+        self.assertEqual(outer.elements['Segment'], 1)
+
+        # Instrumentation is removed at the end of the scope
+        self.assertIs(doc.stream, stream)
+        self.assertIs(core.MasterElement.parseElement, stats._originalParseElement)
+        self.assertIs(core.Element.value, stats._originalValue)
+
+
+    def testStats(self):
+        """ Test collecting statistics for the life of a document. """
+        doc = self.schema.load(BytesIO(self.data))
+        totals = doc.stats()
+        self.addCleanup(stats.disable, doc)
+        self.assertIs(doc.stats(), totals)
+        self.assertIs(stats.getStats(doc), totals)
+
+        dump = doc.dump()
+        self.assertEqual(dump, self.schema.load(BytesIO(self.data)).dump())
+        self.assertEqual(totals.elements['Segment'], 1)
+        self.assertGreater(totals.elements['SimpleBlock'], 0)
+        self.assertGreater(totals.bytesRead, 0)
+        self.assertGreater(totals.decodeTime, 0)
+        self.assertEqual(totals.asDict()['reads'], totals.reads)
+
+        with doc.trackStats() as scoped:
+            list(doc)
+        self.assertGreater(scoped.reads, 0)
+        self.assertIsInstance(doc.stream, stats.StatsStream)
+
+        self.assertIs(stats.disable(doc), totals)
+        self.assertNotIsInstance(doc.stream, stats.StatsStream)
+        self.assertIsNone(stats.getStats(doc))
+        self.assertIsNone(stats.disable(doc))
+        self.assertIs(core.MasterElement.value, stats._originalMasterValue)
+
+
+    def testProfile(self):
+        """ Test profiling element types. """
+        doc = self.schema.load(BytesIO(self.data))
+        with ebmlite.profile(doc) as prof:
+            doc.dump()
+        self.assertIsInstance(prof, stats.Profile)
+        self.assertIs(core.MasterElement.parseElement, stats._originalParseElement)
+
+        byName = prof.byName()
+        blocks = byName['SimpleBlock']
+        self.assertEqual(blocks['count'], prof.counts['SimpleBlock'])
+        self.assertGreater(blocks['bytes'], blocks['count'])
+        self.assertAlmostEqual(blocks['time'], blocks['cumulative'])
+        self.assertGreaterEqual(byName['Cluster']['cumulative'], blocks['cumulative'])
+        self.assertAlmostEqual(byName['Segment']['cumulative'],
+                               sum(prof.pathTimes.values()))
+
+        table = prof.table(limit=3).splitlines()
+        self.assertEqual(len(table), 4)
+        self.assertTrue(table[1].startswith('Segment '))
+
+        folded = dict(line.rsplit(' ', 1) for line in prof.folded().splitlines())
+        self.assertIn('Segment;Cluster;SimpleBlock', folded)
+        self.assertTrue(all(int(v) > 0 for v in folded.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -170,3 +170,136 @@ def test_list_schemata(script_runner):
             os.remove(path_out)
         except FileNotFoundError:
             pass
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_batch(tmp_path, monkeypatch, jobs):
+    from ebmlite.tools import ebml2xml, xml2ebml
+
+    path_in = os.path.join(".", "tests", "SSX46714-doesnot.IDE")
+    inputs = []
+    for name in ('a', 'b', 'c'):
+        inputs.append(str(tmp_path / (name + '.ide')))
+        with open(path_in, 'rb') as f_in, open(inputs[-1], 'wb') as f_out:
+            f_out.write(f_in.read())
+
+    xml_dir = tmp_path / 'xml'
+    monkeypatch.setattr('sys.argv', ['ebml2xml', *inputs, 'mide_ide',
+                                     '-o', str(xml_dir) + os.sep, '-m',
+                                     '--jobs', jobs])
+    with pytest.raises(SystemExit) as exit_info:
+        ebml2xml.main()
+    assert exit_info.value.code == 0
+    assert sorted(os.listdir(xml_dir)) == ['a.xml', 'b.xml', 'c.xml']
+
+    # Existing files are not overwritten without --clobber
+    with pytest.raises(SystemExit) as exit_info:
+        ebml2xml.main()
+    assert exit_info.value.code == 1
+
+    ebml_dir = tmp_path / 'ebml'
+    monkeypatch.setattr('sys.argv', ['xml2ebml', *(str(xml_dir / name) for name in os.listdir(xml_dir)),
+                                     'mide_ide', '-o', str(ebml_dir), '--jobs', jobs])
+    with pytest.raises(SystemExit) as exit_info:
+        xml2ebml.main()
+    assert exit_info.value.code == 0
+    schema = core.loadSchema('mide_ide.xml')
+    expected = schema.load(path_in).dump()
+    for name in ('a', 'b', 'c'):
+        assert schema.load(str(ebml_dir / (name + '.ebml'))).dump() == expected
+
+    # Inputs with the same name in different directories: the second is
+    # reported as failed instead of overwriting the first's output.
+    other_dir = tmp_path / 'other'
+    other_dir.mkdir()
+    other = str(other_dir / 'a.ide')
+    with open(path_in, 'rb') as f_in, open(other, 'wb') as f_out:
+        f_out.write(f_in.read())
+    dup_dir = tmp_path / 'dup'
+    monkeypatch.setattr('sys.argv', ['ebml2xml', inputs[0], other, 'mide_ide',
+                                     '-o', str(dup_dir) + os.sep, '--jobs', jobs])
+    with pytest.raises(SystemExit) as exit_info:
+        ebml2xml.main()
+    assert exit_info.value.code == 1
+    assert os.listdir(dup_dir) == ['a.xml']
+
+
+@pytest.mark.parametrize('options', [{}, {'unknown_size': 0.5, 'void': 0.2}],
+                         ids=['plain', 'unknown-void'])
+@pytest.mark.parametrize('schema_name', ['matroska.xml', 'mide_ide.xml'])
+def test_synth(tmp_path, schema_name, options):
+    from ebmlite.tools import synth
+
+    schema = core.loadSchema(schema_name)
+    path_a = str(tmp_path / 'a.ebml')
+    path_b = str(tmp_path / 'b.ebml')
+
+    result = synth.generate(schema, path_a, 20000, seed=42, **options)
+    synth.generate(schema, path_b, 20000, seed=42, **options)
+    assert filecmp.cmp(path_a, path_b, shallow=False)
+    assert result['size'] == os.path.getsize(path_a) >= 20000
+
+    # The whole document is valid and parses completely
+    def walk(el):
+        count = 0
+        for child in el:
+            assert not isinstance(child, core.UnknownElement)
+            count += 1
+            if isinstance(child, core.MasterElement):
+                count += walk(child)
+            else:
+                child.value
+        return count
+
+    doc = schema.load(path_a)
+    assert walk(doc) == result['elements']
+    doc.close()
+
+    synth.generate(schema, path_b, 20000, seed=43, **options)
+    assert not filecmp.cmp(path_a, path_b, shallow=False)
+
+
+def test_synth_corrupt(tmp_path):
+    from ebmlite.tools import synth
+
+    schema = core.loadSchema('matroska.xml')
+    path_a = str(tmp_path / 'a.mkv')
+    path_b = str(tmp_path / 'b.mkv')
+
+    synth.generate(schema, path_a, 10000, seed=1)
+    result = synth.generate(schema, path_b, 10000, seed=1, corrupt=5, truncate=True)
+    assert len(result['corrupted']) == 5
+    assert result['truncated'] == os.path.getsize(path_b) < os.path.getsize(path_a)
+    with open(path_a, 'rb') as f_a, open(path_b, 'rb') as f_b:
+        data_a, data_b = f_a.read(), f_b.read()
+    for offset in result['corrupted']:
+        assert offset < len(data_b)
+        assert data_a[offset] != data_b[offset]
+
+    assert synth.parse_size('5GB') == 5 * 1024**3
+    assert synth.parse_size('1.5k') == 1536
+    assert synth.default_binary_size(20000) == synth.MIN_BINARY_SIZE
+    assert synth.default_binary_size(20 * 1024**2) == 20 * 1024
+    assert synth.default_binary_size(5 * 1024**3) == synth.MAX_BINARY_SIZE
+    assert synth.parse_mix('Cluster=10,Tags=0') == {'Cluster': 10, 'Tags': 0}
+
+
+def test_mkv_cut(tmp_path, monkeypatch):
+    from ebmlite import matroska
+    from ebmlite.tools import mkv_cut
+
+    path_in = os.path.join(".", "tests", "video-1.mkv")
+    path_out = str(tmp_path / 'cut.mkv')
+
+    monkeypatch.setattr('sys.argv', ['mkv-cut', path_in, '-o', path_out, '-s', '5', '-e', '15'])
+    mkv_cut.main()
+
+    with matroska.ClusterIndex(path_in) as original, matroska.ClusterIndex(path_out) as result:
+        expected = [original.clusterTime(c) for c in original.clustersBetween(5000, 15000)]
+        assert [result.clusterTime(c) for c in result.iterClusters()] == expected
+        assert result.source == 'cues'
+
+    # Existing files are not overwritten without --clobber
+    with pytest.raises(SystemExit) as exit_info:
+        mkv_cut.main()
+    assert exit_info.value.code == 1